@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'workflow.middleware.StaticFilesMiddleware',  # Collected static files, see STATIC_SERVING
+    'workflow.middleware.CompressionMiddleware',  # gzip/brotli, see RESPONSE_COMPRESSION
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware (must be before CommonMiddleware)
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +60,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'workflow.middleware.UserRoleMiddleware',  # Custom middleware for user roles
+    'workflow.middleware.QueryProfilingMiddleware',  # SQL profiling, enabled via QUERY_PROFILING
+    'workflow.middleware.MetricsMiddleware',  # Per-viewset latency metrics for /metrics/
 ]
 
 ROOT_URLCONF = 'university_workflow.urls'
@@ -103,6 +108,45 @@ DATABASES = {
 # }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Compiled workflow schedules, notification counts, Gantt layouts and HTML
+# fragments are invalidated by signal handlers and management commands, so the
+# cache must be shared by every process (web workers, run_workflow_scheduler,
+# imports). A per-process LocMemCache would keep stale entries in all the
+# other processes; workflow/checks.py rejects it. Set REDIS_URL to use Redis,
+# otherwise the database cache table is used. Create it when deploying, after
+# migrate:
+#
+#     python manage.py migrate
+#     python manage.py createcachetable
+#
+# Layouts and fragments get a new key on every change and old keys only
+# expire, so the table is sized for a medium dataset (about one entry per
+# enrolled student and course, plus one per card, step and fragment stamp).
+# Culling removes a tenth of the entries, including fragment stamps, which
+# then re-render; use Redis for larger deployments.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'workflow_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 200000,
+                'CULL_FREQUENCY': 10,
+            },
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -143,6 +187,27 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Content-hashed file names plus .gz/.br copies written by collectstatic
+    # (see workflow/assets.py). With DEBUG off, run collectstatic before
+    # rendering templates that use {% static %}.
+    'staticfiles': {
+        'BACKEND': 'workflow.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Serving of collected static files by workflow.middleware.StaticFilesMiddleware.
+# Hashed files are cached for IMMUTABLE_MAX_AGE seconds, others for MAX_AGE.
+STATIC_SERVING = {
+    'ENABLED': True,
+    'MAX_AGE': 60,
+    'IMMUTABLE_MAX_AGE': 60 * 60 * 24 * 365,
+    'AUTOREFRESH': DEBUG,  # Pick up new files without a restart while developing
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -169,10 +234,78 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'workflow.renderers.FastJSONRenderer',  # orjson when installed, stdlib otherwise
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'workflow.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
 
+# gzip/brotli response compression (see workflow/compression.py); brotli is
+# used when the Brotli package is installed, the client accepts it and
+# MAX_RANDOM_BYTES is 0
+RESPONSE_COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,  # Bytes; smaller responses are sent uncompressed
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    # Random gzip header padding against BREACH; 0 disables it (and allows brotli)
+    'MAX_RANDOM_BYTES': 100,
+}
+
+# Per-request SQL profiling (see workflow/profiling.py)
+QUERY_PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.05,  # Fraction of requests profiled
+    'BUFFER_SIZE': 1000,  # Request profiles kept in memory for /api/profiling/queries/
+    'SLOW_QUERY_MS': 100,  # Statements slower than this are logged
+    'TOP_QUERIES': 5,
+}
+
+# Metrics exposed at /metrics/ (see workflow/metrics.py). Set MULTIPROCESS_DIR
+# (or the WORKFLOW_METRICS_DIR environment variable) to a directory shared by
+# all gunicorn workers so the endpoint reports totals across processes.
+# Admins can always read the endpoint; scrapers need AUTH_TOKEN (from
+# WORKFLOW_METRICS_TOKEN) as a bearer token and an address in ALLOWED_IPS.
+WORKFLOW_METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': os.environ.get('WORKFLOW_METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'AUTH_TOKEN': os.environ.get('WORKFLOW_METRICS_TOKEN'),
+}
+
+# In-app notifications (see workflow/notifications.py). Announcements to courses
+# with more students than FANOUT_THRESHOLD are read from the course stream
+# instead of being written to every student's inbox.
+NOTIFICATIONS = {
+    'FANOUT_THRESHOLD': 200,
+    'HISTORY_DAYS': 30,
+    'UNREAD_CACHE_TIMEOUT': 300,
+}
+
+# Cached fragments of the HTML course, Kanban and announcement pages (see
+# workflow/fragments.py). Fragments are keyed by version stamps that change
+# with the rows they show; hits and misses are counted per fragment in
+# workflow_cache_requests_total on /metrics/. CACHE_ALIAS must name a cache
+# shared by all processes, so bumps from imports and other workers are seen.
+FRAGMENT_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+}
+
+# Email (deadline reminders, see workflow/reminders.py). The console backend
+# prints messages in development; use the SMTP backend in production.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'University Workflow <noreply@university.edu>'
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Next.js default dev server
@@ -1,15 +1,103 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import (
-    User, Course, CalendarEvent, Announcement, KanbanBoard, 
+    User, Term, Course, Enrollment, CalendarEvent, Announcement, KanbanBoard, 
     KanbanColumn, KanbanCard, Assignment, Submission, 
     Timeline, TimelineEvent, WorkflowTemplate, WorkflowStep, 
-    WorkflowInstance, ReportTemplate, Report
+    WorkflowInstance, ReportTemplate, Report, ArchivedRecord, InvalidWorkflowStateException
 )
+from .schedule import apply_template
+
+# Changelist performance
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large changelists. Unfiltered lists on PostgreSQL use the
+    planner's row estimate (pg_class.reltuples) instead of COUNT(*) once the
+    table is past ``estimate_threshold`` rows, and each page first reads its
+    primary keys with a narrow query, then loads only those rows, so deep
+    pages do not build the wide rows they skip.
+    """
+    estimate_threshold = 100000
+
+    def _estimate(self):
+        queryset = self.object_list
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        # reltuples is -1 until the table is first analyzed
+        return row[0] if row else -1
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql' and not queryset.query.where:
+            estimate = self._estimate()
+            if estimate >= self.estimate_threshold:
+                return estimate
+        return queryset.count()
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        # The changelist queryset is always ordered, filtering by pk keeps that order
+        pks = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=pks), number, self)
+
+
+class FastChangelistMixin:
+    """
+    Changelist defaults for large tables: the estimated-count paginator, no
+    unfiltered COUNT(*) next to filtered results, and select_related for
+    exactly the foreign keys shown in list_display. Django's own default
+    follows every non-null foreign key instead, skipping nullable ones such
+    as CalendarEvent.course and joining tables no column shows. Admins whose
+    columns render a relation of a relation set list_select_related.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.get_list_display(request):
+            try:
+                field = self.model._meta.get_field(name)
+            except (FieldDoesNotExist, TypeError):
+                continue
+            if field.many_to_one or field.one_to_one:
+                related.append(name)
+        return related
+
+
+class SelectRelatedListFilter(admin.RelatedFieldListFilter):
+    """Related filter whose choices are loaded with select_related, for models whose __str__ follows a relation"""
+
+    def field_choices(self, field, request, model_admin):
+        queryset = field.related_model._default_manager.complex_filter(field.get_limit_choices_to())
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return [(obj.pk, str(obj)) for obj in queryset.select_related()]
+
+
+class BaseModelAdmin(FastChangelistMixin, admin.ModelAdmin):
+    pass
 
 # User Admin
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(FastChangelistMixin, UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'is_staff')
     list_filter = ('role', 'is_staff', 'is_superuser', 'is_active')
     fieldsets = UserAdmin.fieldsets + (
@@ -22,106 +110,192 @@ class CustomUserAdmin(UserAdmin):
     ordering = ('username',)
 
 # Course Admin
+class ApplyWorkflowForm(forms.Form):
+    template = forms.ModelChoiceField(queryset=WorkflowTemplate.objects.order_by('name'))
+    start_date = forms.DateField(initial=timezone.localdate)
+    skip_existing = forms.BooleanField(
+        required=False, initial=True,
+        help_text="Leave courses that already run this template untouched",
+    )
+
+
+@admin.register(Term)
+class TermAdmin(BaseModelAdmin):
+    list_display = ('code', 'name', 'start_date', 'end_date', 'archived_at')
+    search_fields = ('code', 'name')
+    readonly_fields = ('archived_at',)
+
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
-    list_display = ('code', 'name', 'teacher', 'created_at')
-    list_filter = ('created_at',)
+class CourseAdmin(BaseModelAdmin):
+    list_display = ('code', 'name', 'teacher', 'term', 'created_at')
+    list_filter = ('term', 'created_at')
     search_fields = ('name', 'code', 'description')
-    filter_horizontal = ('students',)
+    # Autocomplete widgets load matching users on demand instead of every user;
+    # students are managed through Enrollment, which a course form cannot edit
+    autocomplete_fields = ('teacher', 'term')
+    actions = ['apply_workflow']
+
+    @admin.action(description="Start a workflow template on selected courses")
+    def apply_workflow(self, request, queryset):
+        form = ApplyWorkflowForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            template = form.cleaned_data['template']
+            try:
+                result = apply_template(
+                    template.pk, queryset.values_list('pk', flat=True), form.cleaned_data['start_date'],
+                    skip_existing=form.cleaned_data['skip_existing'],
+                )
+            except InvalidWorkflowStateException as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return None
+            self.message_user(
+                request,
+                f"Started '{template}' on {result.created} course(s), skipped {result.skipped} already running it.",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(request, 'admin/workflow/course/apply_workflow.html', {
+            **self.admin_site.each_context(request),
+            'title': "Start a workflow template",
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+        })
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(BaseModelAdmin):
+    list_display = ('user', 'course', 'status', 'section', 'enrolled_at', 'updated_at')
+    list_filter = ('status', 'enrolled_at')
+    search_fields = ('user__username', 'user__email', 'course__code', 'section')
+    autocomplete_fields = ('course', 'user')
 
 # Calendar Event Admin
 @admin.register(CalendarEvent)
-class CalendarEventAdmin(admin.ModelAdmin):
+class CalendarEventAdmin(BaseModelAdmin):
     list_display = ('title', 'event_type', 'start_date', 'end_date', 'course', 'created_by')
     list_filter = ('event_type', 'start_date', 'is_recurring')
     search_fields = ('title', 'description')
     date_hierarchy = 'start_date'
+    autocomplete_fields = ('course', 'created_by')
 
 # Announcement Admin
 @admin.register(Announcement)
-class AnnouncementAdmin(admin.ModelAdmin):
+class AnnouncementAdmin(BaseModelAdmin):
     list_display = ('title', 'course', 'author', 'important', 'created_at')
     list_filter = ('important', 'created_at', 'course')
     search_fields = ('title', 'content')
+    autocomplete_fields = ('course', 'author')
 
 # Kanban Board Admin
 @admin.register(KanbanBoard)
-class KanbanBoardAdmin(admin.ModelAdmin):
+class KanbanBoardAdmin(BaseModelAdmin):
     list_display = ('name', 'course', 'owner', 'is_template')
     list_filter = ('is_template', 'created_at')
     search_fields = ('name', 'description')
+    autocomplete_fields = ('course', 'owner')
 
 @admin.register(KanbanColumn)
-class KanbanColumnAdmin(admin.ModelAdmin):
+class KanbanColumnAdmin(BaseModelAdmin):
     list_display = ('title', 'board', 'order')
     list_filter = ('board',)
     search_fields = ('title',)
     ordering = ('order',)
+    autocomplete_fields = ('board',)
 
 @admin.register(KanbanCard)
-class KanbanCardAdmin(admin.ModelAdmin):
+class KanbanCardAdmin(BaseModelAdmin):
     list_display = ('title', 'column', 'due_date', 'order')
     list_filter = ('column__board', 'due_date')
     search_fields = ('title', 'description')
-    filter_horizontal = ('assignees',)
+    # KanbanColumn.__str__ shows its board
+    list_select_related = ('column__board',)
+    autocomplete_fields = ('column', 'assignees')
 
 # Assignment Admin
 @admin.register(Assignment)
-class AssignmentAdmin(admin.ModelAdmin):
+class AssignmentAdmin(BaseModelAdmin):
     list_display = ('title', 'course', 'due_date', 'max_score')
     list_filter = ('course', 'due_date')
     search_fields = ('title', 'description')
+    autocomplete_fields = ('course',)
 
 @admin.register(Submission)
-class SubmissionAdmin(admin.ModelAdmin):
+class SubmissionAdmin(BaseModelAdmin):
     list_display = ('student', 'assignment', 'submitted_at', 'status', 'score')
-    list_filter = ('status', 'submitted_at', 'assignment')
+    list_filter = ('status', 'submitted_at', ('assignment', SelectRelatedListFilter))
     search_fields = ('student__username', 'assignment__title', 'comments', 'feedback')
     readonly_fields = ('submitted_at',)
+    # Assignment.__str__ shows its course
+    list_select_related = ('student', 'assignment__course')
+    autocomplete_fields = ('student', 'assignment')
 
 # Timeline Admin
 @admin.register(Timeline)
-class TimelineAdmin(admin.ModelAdmin):
+class TimelineAdmin(BaseModelAdmin):
     list_display = ('title', 'course', 'start_date', 'end_date')
     list_filter = ('course', 'start_date')
     search_fields = ('title', 'description')
+    autocomplete_fields = ('course',)
 
 @admin.register(TimelineEvent)
-class TimelineEventAdmin(admin.ModelAdmin):
+class TimelineEventAdmin(BaseModelAdmin):
     list_display = ('title', 'timeline', 'date')
     list_filter = ('timeline', 'date')
     search_fields = ('title', 'description')
+    autocomplete_fields = ('timeline',)
 
 # Workflow Admin
 @admin.register(WorkflowTemplate)
-class WorkflowTemplateAdmin(admin.ModelAdmin):
+class WorkflowTemplateAdmin(BaseModelAdmin):
     list_display = ('name', 'created_by', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'description')
+    autocomplete_fields = ('created_by',)
 
 @admin.register(WorkflowStep)
-class WorkflowStepAdmin(admin.ModelAdmin):
+class WorkflowStepAdmin(BaseModelAdmin):
     list_display = ('name', 'template', 'order', 'duration_days')
     list_filter = ('template',)
     search_fields = ('name', 'description')
     ordering = ('template', 'order')
+    autocomplete_fields = ('template',)
 
 @admin.register(WorkflowInstance)
-class WorkflowInstanceAdmin(admin.ModelAdmin):
+class WorkflowInstanceAdmin(BaseModelAdmin):
     list_display = ('template', 'course', 'current_step', 'start_date')
     list_filter = ('template', 'course', 'start_date')
     search_fields = ('template__name', 'course__name')
+    # WorkflowStep.__str__ shows its template
+    list_select_related = ('template', 'course', 'current_step__template')
+    autocomplete_fields = ('template', 'course', 'current_step')
 
 # Report Admin
 @admin.register(ReportTemplate)
-class ReportTemplateAdmin(admin.ModelAdmin):
+class ReportTemplateAdmin(BaseModelAdmin):
     list_display = ('name', 'created_by', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'description', 'query')
+    autocomplete_fields = ('created_by',)
 
 @admin.register(Report)
-class ReportAdmin(admin.ModelAdmin):
+class ReportAdmin(BaseModelAdmin):
     list_display = ('name', 'template', 'course', 'created_by', 'generated_at')
     list_filter = ('template', 'course', 'generated_at')
     search_fields = ('name', 'template__name')
     readonly_fields = ('generated_at',)
+    autocomplete_fields = ('template', 'course', 'created_by')
+
+# Archive Admin
+@admin.register(ArchivedRecord)
+class ArchivedRecordAdmin(BaseModelAdmin):
+    """Archived rows are written by the archive_term command only"""
+    list_display = ('title', 'kind', 'course', 'term', 'owner', 'created_at', 'archived_at')
+    list_filter = ('kind', 'term')
+    search_fields = ('title', 'object_id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
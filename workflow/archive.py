@@ -0,0 +1,116 @@
+from django.core import serializers
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    Announcement, ArchivedRecord, CalendarEvent, InvalidWorkflowStateException, KanbanCard, Submission,
+)
+from . import metrics
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Source:
+    """Where the rows of one archived kind live: their model and the paths to their course, owner and title"""
+
+    def __init__(self, model, course, owner, title, prefetch=()):
+        self.model = model
+        self.course = course
+        self.owner = owner
+        self.title = title
+        self.prefetch = prefetch
+
+    def queryset(self, term):
+        return (self.model.objects.filter(**{f'{self.course}__term': term})
+                .annotate(archive_course=F(self.course), archive_owner=F(self.owner),
+                          archive_title=F(self.title))
+                .prefetch_related(*self.prefetch))
+
+
+SOURCES = {
+    ArchivedRecord.Kind.SUBMISSION: Source(Submission, 'assignment__course', 'student', 'assignment__title'),
+    ArchivedRecord.Kind.CALENDAR_EVENT: Source(CalendarEvent, 'course', 'created_by', 'title'),
+    ArchivedRecord.Kind.ANNOUNCEMENT: Source(Announcement, 'course', 'author', 'title'),
+    ArchivedRecord.Kind.CARD: Source(KanbanCard, 'column__board__course', 'column__board__owner', 'title',
+                                     prefetch=['assignees']),
+}
+
+
+class ArchiveResult:
+    """Rows moved to the archive per kind"""
+
+    def __init__(self, term, dry_run=False):
+        self.term = term
+        self.dry_run = dry_run
+        self.counts = {kind: 0 for kind in SOURCES}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def as_dict(self):
+        return {
+            'term': self.term.code,
+            'dry_run': self.dry_run,
+            'archived': {kind.lower(): count for kind, count in self.counts.items()},
+            'total': self.total,
+        }
+
+
+def _record(kind, instance, term, max_title):
+    # The same field layout as dumpdata, so archived rows can be restored with the serializers
+    fields = serializers.serialize('python', [instance])[0]['fields']
+    return ArchivedRecord(
+        kind=kind, object_id=instance.pk, term=term,
+        course_id=instance.archive_course, owner_id=instance.archive_owner,
+        title=(instance.archive_title or '')[:max_title],
+        created_at=instance.created_at, data=fields,
+    )
+
+
+def archive_kind(term, kind, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move the rows of one kind in ``term``'s courses to the archive, one
+    transaction per batch: the batch is copied with one bulk_create and deleted
+    from the live table, so an interrupted run leaves every row in exactly one
+    place and can simply be restarted. Returns the number of rows moved.
+    """
+    source = SOURCES[kind]
+    max_title = ArchivedRecord._meta.get_field('title').max_length
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Archived rows are gone from the live table, so each batch is again the first one
+            batch = list(source.queryset(term).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            ArchivedRecord.objects.bulk_create([_record(kind, instance, term, max_title) for instance in batch])
+            # A queryset delete, so cascades and post_delete handlers (search entries) still run
+            source.model.objects.filter(pk__in=[instance.pk for instance in batch]).delete()
+        moved += len(batch)
+        metrics.ARCHIVED_RECORDS.inc(len(batch), kind=kind)
+    return moved
+
+
+def archive_term(term, kinds=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Move the submissions, calendar events, announcements and Kanban cards of a
+    closed term's courses out of the live tables into ArchivedRecord, so
+    role-filtered queries only scan current terms. Courses, assignments and
+    boards stay live. With ``dry_run`` the rows are only counted.
+    """
+    if not term.is_closed():
+        raise InvalidWorkflowStateException(f"Term {term.code} has not ended yet")
+
+    result = ArchiveResult(term, dry_run=dry_run)
+    for kind in kinds or SOURCES:
+        if dry_run:
+            result.counts[kind] = SOURCES[kind].queryset(term).count()
+        else:
+            result.counts[kind] = archive_kind(term, kind, batch_size=batch_size)
+
+    if not dry_run:
+        term.archived_at = timezone.now()
+        term.save(update_fields=['archived_at'])
+    return result
@@ -0,0 +1,178 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import compression
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Hashed names change with their content, so browsers and proxies may keep them for a year
+    'IMMUTABLE_MAX_AGE': 60 * 60 * 24 * 365,
+    'MAX_AGE': 60,
+    # Look files up on disk for every request instead of indexing STATIC_ROOT at startup
+    'AUTOREFRESH': False,
+    # Variants are compressed once at collectstatic time, so the slowest, smallest settings are used
+    'GZIP_LEVEL': 9,
+    'BROTLI_QUALITY': 11,
+}
+
+# Precompressed variants, most preferred first, stored next to the file with these suffixes
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def get_setting(name):
+    return getattr(settings, 'STATIC_SERVING', {}).get(name, DEFAULTS[name])
+
+
+def _level(encoding):
+    return get_setting('BROTLI_QUALITY' if encoding == 'br' else 'GZIP_LEVEL')
+
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    return content_type or 'application/octet-stream'
+
+
+# Collecting
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage (content-hashed file names) that also writes .gz and,
+    when Brotli is installed, .br copies of text assets during collectstatic,
+    for StaticFilesMiddleware to serve without compressing per request.
+    Copies that would not be smaller than the original are skipped.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            for compressed_name in self.compress_file(name):
+                yield name, compressed_name, True
+
+    def compress_file(self, name):
+        """Write the compressed variants of ``name``; returns their names"""
+        if name.endswith(tuple(SUFFIXES.values())) or not compression.is_compressible(_content_type(name)):
+            return []
+        # Variants left by an earlier collectstatic would be served for the new content
+        for suffix in SUFFIXES.values():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < compression.get_setting('MIN_SIZE'):
+            return []
+
+        written = []
+        for encoding in compression.available_encodings():
+            compressed = compression.compress(data, encoding, level=_level(encoding))
+            if len(compressed) < len(data):
+                written.append(self._save(name + SUFFIXES[encoding], ContentFile(compressed)))
+        return written
+
+
+# Serving
+
+class StaticFile:
+    """A file under STATIC_ROOT with its precompressed variants and validators"""
+
+    def __init__(self, path, immutable=False):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = _content_type(path)
+        self.last_modified = int(stat.st_mtime)
+        self.etag = f'"{self.last_modified:x}-{stat.st_size:x}"'
+        max_age = get_setting('IMMUTABLE_MAX_AGE') if immutable else get_setting('MAX_AGE')
+        self.cache_control = f'public, max-age={max_age}' + (', immutable' if immutable else '')
+        self.variants = {
+            encoding: path + suffix for encoding, suffix in SUFFIXES.items()
+            if os.path.isfile(path + suffix)
+        }
+
+
+class StaticFileIndex:
+    """
+    The files under ``root``, by their path below the static URL. The
+    directory is walked once at startup unless AUTOREFRESH is set; files named
+    in the staticfiles manifest carry a content hash and are cached as immutable.
+    """
+
+    def __init__(self, root, prefix):
+        self.root = str(root)
+        self.prefix = prefix
+        self.autorefresh = get_setting('AUTOREFRESH')
+        self.files = {} if self.autorefresh else self._scan()
+
+    def _hashed_names(self):
+        if not isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            return set()
+        hashed_files, _ = staticfiles_storage.load_manifest()
+        return set(hashed_files.values())
+
+    def _scan(self):
+        hashed = self._hashed_names()
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for filename in names:
+                if filename.endswith(tuple(SUFFIXES.values())):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[name] = StaticFile(path, immutable=name in hashed)
+        return files
+
+    def find(self, path):
+        """The StaticFile served at URL path ``path``, or None"""
+        if not path.startswith(self.prefix):
+            return None
+        name = path[len(self.prefix):]
+        if not self.autorefresh:
+            return self.files.get(name)
+        try:
+            full_path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(full_path) or full_path.endswith(tuple(SUFFIXES.values())):
+            return None
+        return StaticFile(full_path, immutable=name in self._hashed_names())
+
+
+def serve(request, static_file):
+    """
+    Respond with ``static_file``: a 304 when the client's copy is current,
+    else the best precompressed variant the client accepts, streamed with
+    FileResponse so WSGI servers can use their file wrapper (sendfile).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), list(static_file.variants))
+    response = get_conditional_response(request, etag=static_file.etag, last_modified=static_file.last_modified)
+    if response is None:
+        path = static_file.variants.get(encoding, static_file.path)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=static_file.content_type)
+            response['Content-Length'] = str(os.path.getsize(path))
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            # FileResponse names the file it streams, which would be the .gz/.br variant
+            del response['Content-Disposition']
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+
+    response['Cache-Control'] = static_file.cache_control
+    response['Last-Modified'] = http_date(static_file.last_modified)
+    # Same representation rule as CompressionMiddleware: encoded bytes only get a weak ETag
+    response['ETag'] = f'W/{static_file.etag}' if encoding is not None else static_file.etag
+    if static_file.variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,76 @@
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Lower
+
+from .models import Enrollment, User
+
+# Fields matched by prefix; each has a lower() index (see User.Meta.indexes)
+PREFIX_FIELDS = ['username', 'first_name', 'last_name', 'email', 'department']
+MAX_TERMS = 4
+MAX_LIMIT = 50
+# Upper bound for a prefix range: sorts after every string starting with the
+# prefix in code point order, which is how SQLite's default BINARY collation compares
+_PREFIX_END = '\U0010ffff'
+
+
+def _prefix_q(term, vendor):
+    """
+    Match users with any field starting with ``term``. Postgres collations
+    need not sort by code point, so there LIKE 'term%' is served by the
+    text_pattern_ops indexes of migration 0012; SQLite cannot use an index
+    for Django's LIKE ... ESCAPE, so it gets a range scan instead.
+    """
+    condition = Q()
+    for field in PREFIX_FIELDS:
+        key = f'_{field}_lower'
+        if vendor == 'postgresql':
+            condition |= Q(**{f'{key}__startswith': term})
+        else:
+            condition |= Q(**{f'{key}__gte': term, f'{key}__lt': term + _PREFIX_END})
+    return condition
+
+
+def search_users(queryset, query='', role=None, course=None, exclude_course=None, after=None, limit=20):
+    """
+    Prefix search over users for pickers, keyset paginated by username.
+    Every whitespace separated term must be a prefix of some field, so
+    "ada lov" finds Ada Lovelace. Returns (users, next_cursor).
+    """
+    limit = min(max(limit, 1), MAX_LIMIT)
+    terms = query.lower().split()[:MAX_TERMS]
+
+    vendor = connections[queryset.db].vendor
+    users = queryset.annotate(**{f'_{field}_lower': Lower(field) for field in PREFIX_FIELDS})
+    for term in terms:
+        users = users.filter(_prefix_q(term, vendor))
+
+    if role:
+        users = users.filter(role=role)
+    if course is not None:
+        # Members of a course: its students and its teacher
+        enrolled = Enrollment.objects.active().filter(course=course, user_id=OuterRef('pk'))
+        users = users.filter(Q(Exists(enrolled)) | Q(pk=course.teacher_id))
+    if exclude_course is not None:
+        # Dropped students can be enrolled again, so only active enrollments exclude
+        enrolled = Enrollment.objects.active().filter(course=exclude_course, user_id=OuterRef('pk'))
+        users = users.exclude(Exists(enrolled))
+    if after:
+        users = users.filter(username__gt=after)
+
+    page = list(
+        users.filter(is_active=True).order_by('username')
+        .only('id', 'username', 'first_name', 'last_name', 'email', 'department', 'role')[:limit + 1]
+    )
+    next_cursor = page[limit - 1].username if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def as_option(user):
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'email': user.email,
+        'department': user.department,
+        'role': user.role,
+    }
@@ -0,0 +1,97 @@
+from django.db import transaction
+
+from .models import KanbanBoard, KanbanColumn, KanbanCard
+from . import search
+
+DEFAULT_BATCH_SIZE = 500
+
+DEFAULT_COLUMNS = ["To Do", "In Progress", "Done"]
+
+
+class CloneResult:
+    """Summary of a board clone run"""
+
+    def __init__(self):
+        self.boards = []
+        self.columns = 0
+        self.cards = 0
+        self.assignments = 0
+
+    def as_dict(self):
+        return {
+            'boards': [str(board.pk) for board in self.boards],
+            'created': len(self.boards),
+            'columns': self.columns,
+            'cards': self.cards,
+            'assignments': self.assignments,
+        }
+
+
+def create_default_columns(board):
+    """Add the default To Do / In Progress / Done columns to a board with one insert"""
+    return KanbanColumn.objects.bulk_create([
+        KanbanColumn(board=board, title=title, order=order) for order, title in enumerate(DEFAULT_COLUMNS)
+    ])
+
+
+def clone_board(board, targets, owner, include_cards=True, include_assignees=False,
+                batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Deep-copy ``board`` once per ``(course, name)`` target (course may be
+    None), owned by ``owner``. The source columns, cards and assignees are
+    read with one query each and every level of the copies is written with
+    one bulk_create, mapping source column ids to the new ones, so the cost
+    does not grow with the number of boards in queries. Attachments are
+    shared with the source cards rather than copied.
+    """
+    columns = list(board.columns.order_by('order', 'pk'))
+    cards = list(KanbanCard.objects.filter(column__board=board).order_by('order', 'pk')) if include_cards else []
+    assignees = {}
+    if cards and include_assignees:
+        for card_id, user_id in KanbanCard.assignees.through.objects.filter(
+            kanbancard__column__board=board
+        ).values_list('kanbancard_id', 'user_id'):
+            assignees.setdefault(card_id, []).append(user_id)
+
+    result = CloneResult()
+    with transaction.atomic():
+        copies = KanbanBoard.objects.bulk_create([
+            KanbanBoard(name=name or board.name, description=board.description,
+                        course=course, owner=owner, is_template=False)
+            for course, name in targets
+        ], batch_size=batch_size)
+
+        new_columns = KanbanColumn.objects.bulk_create([
+            KanbanColumn(board=copy, title=column.title, order=column.order)
+            for copy in copies for column in columns
+        ], batch_size=batch_size)
+        # Columns come back in insertion order, one run of len(columns) per copy
+        column_map = {}
+        boards_by_column = {}
+        for index, copy in enumerate(copies):
+            for column, new_column in zip(columns, new_columns[index * len(columns):(index + 1) * len(columns)]):
+                column_map[copy.pk, column.pk] = new_column.pk
+                boards_by_column[new_column.pk] = copy
+
+        new_cards, new_assignments = [], []
+        for copy in copies:
+            for card in cards:
+                new_card = KanbanCard(
+                    title=card.title, description=card.description, due_date=card.due_date,
+                    order=card.order, color=card.color, attachment=card.attachment.name or None,
+                    column_id=column_map[copy.pk, card.column_id],
+                )
+                new_cards.append(new_card)
+                new_assignments.extend(
+                    KanbanCard.assignees.through(kanbancard_id=new_card.pk, user_id=user_id)
+                    for user_id in assignees.get(card.pk, ())
+                )
+        KanbanCard.objects.bulk_create(new_cards, batch_size=batch_size)
+        KanbanCard.assignees.through.objects.bulk_create(new_assignments, batch_size=batch_size)
+        search.index_cards(new_cards, boards_by_column, batch_size=batch_size)
+
+    result.boards = copies
+    result.columns = len(new_columns)
+    result.cards = len(new_cards)
+    result.assignments = len(new_assignments)
+    return result
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from . import fragments
+
+# Backends that keep entries inside one process
+PER_PROCESS_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def _cache_uses():
+    """{cache alias: [what workflow keeps there]}; every entry is invalidated from other processes"""
+    uses = {'default': ['compiled workflow schedules', 'unread notification counts', 'Gantt layouts']}
+    uses.setdefault(fragments.get_setting('CACHE_ALIAS'), []).append('page fragment version stamps')
+    return uses
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Signal handlers and management commands (imports, archive_term, the
+    scheduler) invalidate cached entries, which only reaches the web workers
+    when every process uses the same cache.
+    """
+    errors = []
+    for alias, uses in _cache_uses().items():
+        config = settings.CACHES.get(alias)
+        if config is None:
+            errors.append(Error(
+                f"Cache '{alias}' is not configured.",
+                hint="Add it to CACHES or change FRAGMENT_CACHE['CACHE_ALIAS'].",
+                id='workflow.E001',
+            ))
+        elif config.get('BACKEND') in PER_PROCESS_BACKENDS:
+            errors.append(Error(
+                f"Cache '{alias}' uses {config['BACKEND']}, which is not shared between processes, "
+                f"so invalidations of {', '.join(uses)} would not reach the other workers.",
+                hint='Use a shared backend such as DatabaseCache or RedisCache.',
+                id='workflow.E002',
+            ))
+    return errors
@@ -0,0 +1,82 @@
+import gzip
+import secrets
+
+from django.conf import settings
+from django.utils.crypto import get_random_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Responses smaller than this are sent as is; compressing them costs more than it saves
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    # BREACH mitigation, as in Django's GZipMiddleware: dynamic responses get up to
+    # this many random bytes in the gzip header so their length doesn't leak secrets.
+    # Brotli has no room for padding, so with this set dynamic responses use gzip only.
+    'MAX_RANDOM_BYTES': 100,
+    'CONTENT_TYPES': [
+        'application/json', 'application/javascript', 'application/xml',
+        'image/svg+xml', 'text/',
+    ],
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def available_encodings():
+    """Supported content codings, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate(accept_encoding, encodings=None):
+    """
+    Pick the best encoding allowed by an Accept-Encoding header, or None.
+    ``encodings`` (most preferred first) defaults to the supported ones.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in available_encodings() if encodings is None else encodings:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None, max_random_bytes=0):
+    """
+    ``level`` overrides the configured gzip level or brotli quality. With
+    ``max_random_bytes`` a random-length file name is added to the gzip header
+    (the "Heal the Breach" padding of django.utils.text.compress_string).
+    """
+    if encoding == 'br':
+        if max_random_bytes:
+            raise ValueError("Brotli output cannot be padded")
+        return brotli.compress(data, quality=get_setting('BROTLI_QUALITY') if level is None else level)
+    # mtime=0 keeps the output deterministic for identical content
+    compressed = gzip.compress(data, compresslevel=get_setting('GZIP_LEVEL') if level is None else level, mtime=0)
+    if not max_random_bytes:
+        return compressed
+    header = bytearray(compressed[:10])
+    header[3] |= gzip.FNAME
+    filename = get_random_string(secrets.randbelow(max_random_bytes) + 1).encode() + b'\x00'
+    return bytes(header) + filename + compressed[10:]
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return any(content_type.startswith(prefix) for prefix in get_setting('CONTENT_TYPES'))
@@ -0,0 +1,227 @@
+import csv
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import User, Course, Enrollment
+from . import fragments
+from . import metrics
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class EnrollmentResult:
+    """Summary of a bulk enrollment run, including per-row errors"""
+
+    def __init__(self):
+        self.processed = 0
+        self.enrolled = 0
+        self.already_enrolled = 0
+        self.errors = []
+
+    def add_error(self, row, value, message):
+        self.errors.append({'row': row, 'value': value, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'enrolled': self.enrolled,
+            'already_enrolled': self.already_enrolled,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _classify(value):
+    """
+    The kind of a student identifier and its lookup key: all-digit values are
+    user ids, values with an '@' are emails (matched case-insensitively) and
+    anything else is a username. Returns None for an empty value.
+    """
+    if not value:
+        return None
+    if value.isdigit():
+        return 'id', int(value)
+    if '@' in value:
+        return 'email', value.lower()
+    return 'username', value
+
+
+def _resolve_users(identifiers):
+    """
+    Resolve student identifiers (id, username or email) in a single query.
+    Returns a dict with one map per identifier kind (see ``_classify``), each
+    mapping a lookup key to a (id, role) tuple, so a value is only ever
+    matched against the field it was classified as.
+    """
+    ids, emails, usernames = set(), set(), set()
+    for value in identifiers:
+        kind = _classify(value)
+        if kind is None:
+            continue
+        if kind[0] == 'id':
+            ids.add(kind[1])
+        elif kind[0] == 'email':
+            emails.add(kind[1])
+        else:
+            usernames.add(value)
+
+    resolved = {'id': {}, 'email': {}, 'username': {}}
+    if not (ids or emails or usernames):
+        return resolved
+    query = Q(pk__in=ids) | Q(email_lower__in=emails) | Q(username__in=usernames)
+    users = User.objects.annotate(email_lower=Lower('email')).filter(query)
+    for pk, username, email, role in users.values_list('pk', 'username', 'email', 'role'):
+        resolved['id'][pk] = (pk, role)
+        resolved['username'][username] = (pk, role)
+        if email:
+            resolved['email'][email.lower()] = (pk, role)
+    return resolved
+
+
+def _lookup_user(users, value):
+    """The (id, role) of ``value`` in the maps returned by ``_resolve_users``, or None"""
+    kind = _classify(value)
+    if kind is None:
+        return None
+    return users[kind[0]].get(kind[1])
+
+
+def _resolve_courses(keys, cache):
+    """Resolve course codes not yet in ``cache`` with a single query"""
+    missing = {key for key in keys if not isinstance(key, Course) and key not in cache}
+    if missing:
+        for course in Course.objects.filter(code__in=missing).only('pk', 'code'):
+            cache[course.code] = course.pk
+    for key in keys:
+        if isinstance(key, Course):
+            cache[key] = key.pk
+
+
+def enroll_rows(rows, batch_size=DEFAULT_BATCH_SIZE, allowed_course_ids=None):
+    """
+    Enroll students from an iterable of ``(row_number, course, student)`` tuples.
+
+    ``course`` is a Course instance or course code and ``student`` is a user id,
+    username or email. Rows are processed in chunks: users and courses are
+    resolved with one query per chunk, roles are validated in memory, new
+    enrollment rows are inserted with a single ``bulk_create`` and dropped
+    enrollments are reactivated with a single ``update``.
+    Rows for courses outside ``allowed_course_ids`` (when given) are rejected.
+    """
+    result = EnrollmentResult()
+    course_cache = {}
+
+    for chunk in _chunks(rows, batch_size):
+        result.processed += len(chunk)
+        _resolve_courses({course for _, course, _ in chunk}, course_cache)
+        users = _resolve_users({str(student).strip() for _, _, student in chunk})
+
+        pairs = {}
+        for row, course, student in chunk:
+            value = str(student).strip()
+            course_id = course_cache.get(course)
+            if course_id is None:
+                result.add_error(row, value, f"Course '{course}' not found")
+                continue
+            if allowed_course_ids is not None and course_id not in allowed_course_ids:
+                result.add_error(row, value, f"Course '{course}' is not part of this import")
+                continue
+            user = _lookup_user(users, value)
+            if user is None:
+                result.add_error(row, value, "Student not found")
+                continue
+            user_id, role = user
+            if role != User.Role.STUDENT:
+                result.add_error(row, value, "User is not a student")
+                continue
+            pairs.setdefault((course_id, user_id), row)
+
+        if not pairs:
+            continue
+
+        course_ids = {course_id for course_id, _ in pairs}
+        user_ids = {user_id for _, user_id in pairs}
+        with transaction.atomic():
+            existing = {
+                (course_id, user_id): (pk, enrollment_status)
+                for course_id, user_id, pk, enrollment_status in
+                Enrollment.objects.filter(course_id__in=course_ids, user_id__in=user_ids)
+                .values_list('course_id', 'user_id', 'pk', 'status')
+            }
+            new_rows = [
+                Enrollment(course_id=course_id, user_id=user_id)
+                for course_id, user_id in pairs
+                if (course_id, user_id) not in existing
+            ]
+            Enrollment.objects.bulk_create(new_rows, ignore_conflicts=True)
+            reactivated = [pk for key, (pk, enrollment_status) in existing.items()
+                           if key in pairs and enrollment_status != Enrollment.Status.ACTIVE]
+            if reactivated:
+                Enrollment.objects.filter(pk__in=reactivated).update(
+                    status=Enrollment.Status.ACTIVE, updated_at=timezone.now(),
+                )
+        metrics.ENROLLMENT_BATCH_SIZE.observe(len(new_rows) + len(reactivated))
+        # bulk_create and update skip the signal handlers
+        fragments.bump(fragments.COURSE, course_ids)
+
+        result.enrolled += len(new_rows) + len(reactivated)
+        result.already_enrolled += len(pairs) - len(new_rows) - len(reactivated)
+
+    return result
+
+
+def enroll_students(course, students, batch_size=DEFAULT_BATCH_SIZE):
+    """Enroll a sequence of student identifiers into a single course"""
+    rows = ((index, course, student) for index, student in enumerate(students, start=1))
+    return enroll_rows(rows, batch_size=batch_size)
+
+
+def set_students(course, student_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Make ``student_ids`` the active roster of ``course``: they are enrolled
+    (dropped enrollments reactivated) with ``enroll_rows`` and any other
+    active student is dropped. Returns the EnrollmentResult of the enrollment.
+    """
+    result = enroll_students(course, student_ids, batch_size=batch_size)
+    keep = {int(pk) for pk in student_ids}
+    active = Enrollment.objects.active().filter(course=course).values_list('user_id', flat=True)
+    course.drop_students([user_id for user_id in active if user_id not in keep])
+    return result
+
+
+def read_roster_csv(stream, default_course=None):
+    """
+    Stream ``(row_number, course, student)`` tuples from a text-mode roster CSV.
+
+    The CSV needs a ``student`` column (``username``, ``email`` and
+    ``student_id`` are accepted aliases) and a ``course`` / ``course_code``
+    column unless ``default_course`` is given.
+    """
+    reader = csv.DictReader(stream)
+    fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    reader.fieldnames = fieldnames
+
+    student_column = next((c for c in ('student', 'username', 'email', 'student_id') if c in fieldnames), None)
+    course_column = next((c for c in ('course', 'course_code') if c in fieldnames), None)
+    if student_column is None:
+        raise ValueError("Roster CSV must have a 'student', 'username', 'email' or 'student_id' column")
+    if course_column is None and default_course is None:
+        raise ValueError("Roster CSV must have a 'course' column when no course is given")
+
+    # Row 1 is the header, so data rows start at 2 to match spreadsheet line numbers
+    for row_number, row in enumerate(reader, start=2):
+        course = (row.get(course_column) or '').strip() if course_column else ''
+        yield row_number, course or default_course, (row.get(student_column) or '').strip()
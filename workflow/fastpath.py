@@ -0,0 +1,111 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Case, CharField, Count, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat, Trim
+from rest_framework import serializers
+
+# DRF fields whose JSON form differs from the value the database returns
+CONVERTED_FIELDS = (
+    serializers.DateTimeField, serializers.DateField, serializers.TimeField,
+    serializers.DurationField, serializers.DecimalField,
+)
+
+
+class Computed:
+    """
+    A field computed in Python from SQL expressions of the same row: the
+    serializer method ``method`` is called with one keyword argument per
+    expression.
+    """
+
+    def __init__(self, method, **expressions):
+        self.method = method
+        self.expressions = expressions
+
+
+# SQL helpers for Meta.values_fields
+
+def full_name(relation):
+    """User.get_full_name() of a foreign key in SQL, None when the key is unset"""
+    return Case(
+        When(**{f'{relation}__isnull': True}, then=Value(None)),
+        default=Trim(Concat(f'{relation}__first_name', Value(' '), f'{relation}__last_name')),
+        output_field=CharField(),
+    )
+
+
+def related_count(model, field, outer='pk', **filters):
+    """Number of ``model`` rows whose ``field`` equals the outer row's ``outer``, as a subquery"""
+    rows = (model.objects.filter(**{field: OuterRef(outer)}, **filters)
+            .order_by().values(field).annotate(total=Count('*')).values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+# Building responses
+
+def _converter(field, model_field):
+    if isinstance(field, serializers.FileField):
+        # DRF builds the URL from a FieldFile; .values() only returns its name
+        return lambda name: field.to_representation(model_field.attr_class(None, model_field, name))
+    if isinstance(field, CONVERTED_FIELDS):
+        return field.to_representation
+    return None
+
+
+def plan(serializer, queryset):
+    """
+    A .values() queryset reading every field ``serializer`` renders, and the
+    columns that turn its rows into the serializer's dicts. Returns None when
+    the serializer declares no ``Meta.values_fields`` or some remaining field
+    (nested serializers, to-many relations, undeclared method fields) needs a
+    model instance.
+    """
+    declared = getattr(getattr(serializer, 'Meta', None), 'values_fields', None)
+    if declared is None:
+        return None
+
+    model = queryset.model
+    keys, expressions, columns = [], {}, []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        spec = declared.get(name)
+        if isinstance(spec, Computed):
+            arguments = {}
+            for argument, expression in spec.expressions.items():
+                expressions[f'_{name}_{argument}'] = expression
+                arguments[argument] = f'_{name}_{argument}'
+            columns.append((name, arguments, getattr(serializer, spec.method)))
+        elif spec is not None:
+            expressions[f'_{name}'] = spec
+            columns.append((name, f'_{name}', None))
+        elif isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField,
+                                serializers.SerializerMethodField)) or '.' in field.source:
+            return None
+        else:
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete:
+                return None
+            keys.append(field.source)
+            columns.append((name, field.source, _converter(field, model_field)))
+
+    # .values() drops select_related and deferred fields itself; prefetching has nothing to attach to
+    return queryset.prefetch_related(None).values(*keys, **expressions), columns
+
+
+def represent(rows, columns):
+    """The serializer-shaped dicts of ``rows`` from a plan()'s values queryset"""
+    data = []
+    for row in rows:
+        item = {}
+        for name, source, convert in columns:
+            if isinstance(source, dict):
+                item[name] = convert(**{argument: row[key] for argument, key in source.items()})
+            else:
+                value = row[source]
+                # Like Serializer.to_representation, None is never converted
+                item[name] = value if convert is None or value is None else convert(value)
+        data.append(item)
+    return data
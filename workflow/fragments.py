@@ -0,0 +1,92 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Must be shared by every process (see workflow/checks.py): stamps are bumped by
+    # signal handlers in any web worker and by management commands
+    'CACHE_ALIAS': 'default',
+    # Fragments are keyed by version, so the timeout only bounds how long unused ones stay around
+    'TIMEOUT': 60 * 60,
+}
+
+# Scopes of version stamps
+COURSE = 'course'
+BOARD = 'board'
+# Pass as ``courses`` / ``boards`` when a page lists every row of the scope (admins)
+ALL = '*'
+
+
+def get_setting(name):
+    return getattr(settings, 'FRAGMENT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def _stamp_key(scope, pk):
+    return f'fragment:stamp:{scope}:{pk}'
+
+
+# Version stamps
+
+def stamps(scope, ids):
+    """
+    Current stamps of ``ids`` in ``scope``, with one cache round trip. Ids
+    without a stamp get a fresh random one rather than a counter, so a stamp
+    evicted after a bump can never come back as a value an old fragment used.
+    """
+    keys = {_stamp_key(scope, pk): pk for pk in ids}
+    found = _cache().get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        _cache().set_many(missing, None)
+    found.update(missing)
+    return {keys[key]: stamp for key, stamp in found.items()}
+
+
+def bump(scope, ids):
+    """Give ``ids`` (and the scope-wide ALL stamp) new stamps, so fragments showing them are re-rendered"""
+    ids = {pk for pk in ids if pk is not None}
+    if ids:
+        _cache().set_many({_stamp_key(scope, pk): uuid.uuid4().hex for pk in ids | {ALL}}, None)
+
+
+def version(user, *parts, courses=(), boards=()):
+    """
+    Version of a fragment rendered for ``user`` from the given courses and
+    boards (lists of ids, or ALL), plus any other ``parts`` it varies on such
+    as query parameters. It changes when one of the rows is bumped and when
+    rows join or leave the lists.
+    """
+    values = [user.pk, user.role, *parts]
+    for scope, ids in ((COURSE, courses), (BOARD, boards)):
+        ids = [ALL] if ids == ALL else sorted(set(ids))
+        current = stamps(scope, ids)
+        values.extend(f'{scope}:{pk}:{current[pk]}' for pk in ids)
+    return hashlib.md5('|'.join(map(str, values)).encode(), usedforsecurity=False).hexdigest()
+
+
+# Fragments
+
+def render(name, fragment_version, render_fragment):
+    """
+    The fragment ``name`` at ``fragment_version``, rendered with
+    ``render_fragment()`` on a miss. Lookups are counted per fragment in the
+    workflow_cache_requests_total metric.
+    """
+    if not get_setting('ENABLED'):
+        return render_fragment()
+    key = f'fragment:{name}:{fragment_version}'
+    content = _cache().get(key)
+    metrics.record_cache_lookup(f'fragment:{name}', content is not None)
+    if content is None:
+        content = render_fragment()
+        _cache().set(key, content, get_setting('TIMEOUT'))
+    return content
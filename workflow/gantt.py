@@ -0,0 +1,246 @@
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Value
+from django.utils.dateparse import parse_date
+
+from .models import Timeline, TimelineEvent, WorkflowInstance, WorkflowTemplate
+from .schedule import get_schedules
+from . import metrics
+
+CACHE_PREFIX = 'gantt'
+# Keys change with the data, the timeout only bounds how long unused layouts stay around
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Versioning
+
+def _stats(kind, queryset, group):
+    return (queryset.order_by().values(group)
+            .annotate(kind=Value(kind), latest=Max('updated_at'), total=Count('pk'))
+            .values_list('kind', 'latest', 'total'))
+
+
+def _fingerprint(course_id):
+    """
+    Version of a course's chart and the workflow templates it uses, in two
+    queries: the max updated_at and row count of its timelines, events and
+    workflow instances (counts catch deletions), and the instances' templates
+    with their names, which label the workflow rows. Step changes are covered
+    by the schedules, which are invalidated when steps are saved or deleted.
+    """
+    stats = _stats('timelines', Timeline.objects.filter(course_id=course_id), 'course_id').union(
+        _stats('events', TimelineEvent.objects.filter(timeline__course_id=course_id), 'timeline__course_id'),
+        _stats('workflows', WorkflowInstance.objects.filter(course_id=course_id), 'course_id'),
+        all=True,
+    )
+    templates = dict(
+        WorkflowTemplate.objects.filter(instances__course_id=course_id).distinct().values_list('pk', 'name')
+    )
+    schedules = get_schedules(templates)
+
+    parts = [str(course_id), *sorted(f'{kind}:{latest}:{total}' for kind, latest, total in stats)]
+    for template_id in sorted(schedules, key=str):
+        steps = [step.__getstate__() for step in schedules[template_id].steps]
+        parts.append(f'{template_id}:{templates[template_id]}:{steps}')
+    return hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest(), schedules
+
+
+# Layout
+
+def _bar(bar_id, label, start, end, origin, **extra):
+    """A bar covering the days [start, end), positioned in days from the chart origin"""
+    return {
+        'id': bar_id, 'label': label, 'start': start, 'end': end,
+        'offset': (start - origin).days, 'span': (end - start).days, **extra,
+    }
+
+
+def _overlaps(rows):
+    """
+    Day ranges in which bars of different rows run at the same time, found
+    with one sweep over the bar edges: [{'start', 'end', 'rows'}].
+    """
+    edges = []
+    for index, row in enumerate(rows):
+        for number, bar in enumerate(row['bars']):
+            if bar['span'] > 0:
+                edges.append((bar['start'], 1, index, number))
+                edges.append((bar['end'], 0, index, number))
+    # Ends sort before starts on the same day, so touching bars do not overlap
+    edges.sort(key=lambda edge: (edge[0], edge[1]))
+
+    overlaps, active = [], {}
+    for position, (day, is_start, index, number) in enumerate(edges):
+        if is_start:
+            active[index, number] = index
+        else:
+            del active[index, number]
+        next_day = edges[position + 1][0] if position + 1 < len(edges) else day
+        running = sorted(set(active.values()))
+        if next_day > day and len(running) > 1:
+            row_ids = [rows[index]['id'] for index in running]
+            if overlaps and overlaps[-1]['end'] == day and overlaps[-1]['rows'] == row_ids:
+                overlaps[-1]['end'] = next_day
+            else:
+                overlaps.append({'start': day, 'end': next_day, 'rows': row_ids})
+    return overlaps
+
+
+def build_layout(course_id, schedules):
+    """
+    Gantt layout of a course: one row per timeline (its span as a bar, its
+    events as milestones) and one per workflow instance (a bar per step),
+    sorted by start date, plus the ranges where rows overlap. Bars cover
+    [start, end) and carry their offset and span in days from the chart start.
+    """
+    timelines = list(
+        Timeline.objects.filter(course_id=course_id)
+        .prefetch_related(Prefetch('events', queryset=TimelineEvent.objects.order_by('date', 'title')))
+        .order_by('start_date', 'title')
+    )
+    instances = list(
+        WorkflowInstance.objects.filter(course_id=course_id).select_related('template').order_by('start_date', 'pk')
+    )
+
+    spans = [(timeline.start_date, timeline.end_date + timedelta(days=1)) for timeline in timelines]
+    for instance in instances:
+        schedule = schedules[instance.template_id]
+        spans.append((instance.start_date, instance.start_date + timedelta(days=schedule.total_days)))
+    if not spans:
+        return {'course': course_id, 'start': None, 'end': None, 'days': 0, 'rows': [], 'overlaps': []}
+    origin = min(start for start, _ in spans)
+    last = max(end for _, end in spans)
+
+    rows = []
+    for timeline in timelines:
+        rows.append({
+            'id': f'timeline:{timeline.pk}', 'kind': 'timeline', 'label': timeline.title,
+            'start': timeline.start_date,
+            'bars': [_bar(timeline.pk, timeline.title, timeline.start_date,
+                          timeline.end_date + timedelta(days=1), origin)],
+            'milestones': [{
+                'id': event.pk, 'label': event.title, 'date': event.date,
+                'offset': (event.date - origin).days, 'color': event.color, 'icon': event.icon,
+            } for event in timeline.events.all()],
+        })
+    for instance in instances:
+        start = instance.start_date
+        rows.append({
+            'id': f'workflow:{instance.pk}', 'kind': 'workflow', 'label': instance.template.name,
+            'start': start,
+            'bars': [_bar(step.id, step.name, step.start_date(start), step.end_date(start), origin,
+                          current=step.id == instance.current_step_id)
+                     for step in schedules[instance.template_id].steps],
+            'milestones': [],
+        })
+    rows.sort(key=lambda row: row['start'])
+
+    return {
+        'course': course_id,
+        'start': origin,
+        'end': last,
+        'days': (last - origin).days,
+        'rows': rows,
+        'overlaps': _overlaps(rows),
+    }
+
+
+def get_layout(course_id):
+    """
+    The course's Gantt layout and its version. Layouts are cached under the
+    version, so any change to the charted rows is picked up on the next request.
+    """
+    version, schedules = _fingerprint(course_id)
+    key = f'{CACHE_PREFIX}:{course_id}:{version}'
+    layout = cache.get(key)
+    metrics.record_cache_lookup(CACHE_PREFIX, layout is not None)
+    if layout is None:
+        layout = build_layout(course_id, schedules)
+        cache.set(key, layout, CACHE_TIMEOUT)
+    return layout, version
+
+
+# Bulk event import
+
+class TimelineImportResult:
+    """Summary of a bulk timeline event import, including per-row errors"""
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.errors.append({'row': row, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+def _text(row, name, max_length, required=False):
+    value = str(row.get(name) or '').strip()
+    if required and not value:
+        raise ValueError(f"'{name}' is required")
+    if max_length and len(value) > max_length:
+        raise ValueError(f"'{name}' is longer than {max_length} characters")
+    return value
+
+
+def import_timeline_events(course, rows):
+    """
+    Create timeline events for a course's timelines from a list of dicts with
+    ``timeline``, ``title``, ``date`` and optional ``description``, ``color``
+    and ``icon``. The course's timelines are loaded once, so the date bounds of
+    TimelineEvent.clean() are checked in memory, and valid rows are inserted
+    with one bulk_create. Nothing is created if any row is invalid.
+    """
+    result = TimelineImportResult()
+    timelines = {str(timeline.pk): timeline for timeline in Timeline.objects.filter(course=course)}
+    max_length = {field.name: field.max_length for field in TimelineEvent._meta.fields}
+    events = []
+
+    for number, row in enumerate(rows, start=1):
+        result.processed += 1
+        if not isinstance(row, dict):
+            result.add_error(number, "Expected an object")
+            continue
+        timeline = timelines.get(str(row.get('timeline')))
+        if timeline is None:
+            result.add_error(number, "Timeline not found in this course")
+            continue
+        try:
+            day = parse_date(str(row.get('date') or ''))
+        except ValueError:
+            day = None
+        if day is None:
+            result.add_error(number, "'date' must be a YYYY-MM-DD date")
+            continue
+        if day < timeline.start_date or day > timeline.end_date:
+            result.add_error(number, "Event date must be within timeline start and end dates")
+            continue
+        try:
+            event = TimelineEvent(
+                timeline=timeline, date=day,
+                title=_text(row, 'title', max_length['title'], required=True),
+                description=_text(row, 'description', None),
+                color=_text(row, 'color', max_length['color']) or 'blue',
+                icon=_text(row, 'icon', max_length['icon']),
+            )
+        except ValueError as e:
+            result.add_error(number, str(e))
+            continue
+        events.append(event)
+
+    if not result.errors:
+        with transaction.atomic():
+            TimelineEvent.objects.bulk_create(events)
+        result.created = len(events)
+    return result
@@ -0,0 +1,308 @@
+import hashlib
+import re
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CalendarEvent
+from . import fragments
+from . import metrics
+
+DEFAULT_BATCH_SIZE = 500
+
+_DURATION = re.compile(
+    r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$'
+)
+_TEXT_ESCAPES = re.compile(r'\\([\\;,nN])')
+
+# Fields compared between imports, in hash order
+HASHED_FIELDS = ['title', 'description', 'start_date', 'end_date', 'event_type', 'is_recurring', 'recurrence_pattern']
+
+
+class ImportResult:
+    """Summary of a calendar import run, including per-event errors"""
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    def add_error(self, line, uid, message):
+        self.errors.append({'line': line, 'uid': uid, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+# Parsing
+
+def _unfold(stream):
+    """Yield (line_number, logical_line), joining folded continuation lines"""
+    current, start = None, 0
+    for number, raw in enumerate(stream, start=1):
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        current, start = line, number
+    if current:
+        yield start, current
+
+
+def _split_property(line):
+    """'DTSTART;TZID="A:B":2026...' -> ('DTSTART', {'TZID': 'A:B'}, '2026...')"""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        raise ValueError(f"Malformed line: {line[:60]}")
+
+    name, *raw_params = re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', head)
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def read_events(stream):
+    """
+    Stream VEVENTs from a text-mode iCalendar file as (line_number, properties)
+    where properties maps each property name to its (params, value) pair.
+    Nested components such as VALARM and VTIMEZONE are skipped, as are
+    malformed lines; a stream that does not start with BEGIN:VCALENDAR
+    raises ValueError.
+    """
+    properties, start, depth = None, 0, 0
+    first = True
+    for number, line in _unfold(stream):
+        try:
+            name, params, value = _split_property(line)
+        except ValueError:
+            name, params, value = None, {}, ''
+        if first:
+            if (name, value.upper()) != ('BEGIN', 'VCALENDAR'):
+                raise ValueError("Not an iCalendar file")
+            first = False
+        if name is None:
+            continue
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and properties is None:
+                properties, start, depth = {}, number, 0
+            elif properties is not None:
+                depth += 1
+        elif name == 'END' and properties is not None:
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                yield start, properties
+                properties = None
+        elif properties is not None and not depth:
+            properties.setdefault(name, (params, value))
+
+
+def _text(value):
+    return _TEXT_ESCAPES.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def _zone(params, default_zone):
+    tzid = params.get('TZID')
+    if not tzid:
+        return default_zone
+    try:
+        return ZoneInfo(tzid.lstrip('/'))
+    except (ZoneInfoNotFoundError, ValueError):
+        # Custom VTIMEZONE names (e.g. Outlook's "Eastern Standard Time") are not resolved
+        return default_zone
+
+
+def parse_datetime(params, value, default_zone):
+    """A DATE or DATE-TIME property as (aware datetime, is_all_day)"""
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        day = datetime.strptime(value, '%Y%m%d').date()
+        return timezone.make_aware(datetime.combine(day, time.min), default_zone), True
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=ZoneInfo('UTC')), False
+    return timezone.make_aware(datetime.strptime(value, '%Y%m%dT%H%M%S'), _zone(params, default_zone)), False
+
+
+def parse_duration(value):
+    match = _DURATION.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid DURATION '{value}'")
+    parts = {key: int(amount or 0) for key, amount in match.groupdict().items() if key != 'sign'}
+    duration = timedelta(**parts)
+    return -duration if match.group('sign') == '-' else duration
+
+
+def recurrence_pattern(rule):
+    """
+    Map an RRULE onto recurrence_pattern: the bare frequency ("WEEKLY") for
+    simple rules, matching events created in the app, otherwise the rule
+    itself, cut back to its frequency if it does not fit the column.
+    """
+    parts = dict(part.partition('=')[::2] for part in rule.upper().split(';') if part)
+    frequency = parts.get('FREQ', '')
+    if set(parts) - {'FREQ', 'INTERVAL'} or parts.get('INTERVAL', '1') != '1':
+        normalized = ';'.join(f'{key}={value}' for key, value in parts.items())
+        if len(normalized) <= CalendarEvent._meta.get_field('recurrence_pattern').max_length:
+            return normalized
+    return frequency
+
+
+def _event_type(properties, default):
+    categories = properties.get('CATEGORIES', ({}, ''))[1]
+    for category in _text(categories).upper().split(','):
+        if category.strip() in CalendarEvent.EventType.values:
+            return category.strip()
+    return default
+
+
+def to_fields(properties, default_zone, event_type=CalendarEvent.EventType.OTHER):
+    """CalendarEvent field values for one parsed VEVENT; raises ValueError when it is unusable"""
+    if 'DTSTART' not in properties:
+        raise ValueError("Event has no DTSTART")
+    title = _text(properties.get('SUMMARY', ({}, ''))[1]).strip()
+    if not title:
+        raise ValueError("Event has no SUMMARY")
+
+    start, all_day = parse_datetime(*properties['DTSTART'], default_zone)
+    if 'DTEND' in properties:
+        end, _ = parse_datetime(*properties['DTEND'], default_zone)
+    elif 'DURATION' in properties:
+        end = start + parse_duration(properties['DURATION'][1])
+    else:
+        # RFC 5545: an all-day event without an end lasts one day, a timed one is instantaneous
+        end = start + timedelta(days=1) if all_day else start
+    # Same rule as CalendarEvent.clean(), checked here because bulk_create skips save()
+    if end < start:
+        raise ValueError("End date cannot be before start date")
+
+    rule = properties.get('RRULE', ({}, ''))[1]
+    max_title = CalendarEvent._meta.get_field('title').max_length
+    return {
+        'title': title[:max_title],
+        'description': _text(properties.get('DESCRIPTION', ({}, ''))[1]),
+        'start_date': start,
+        'end_date': end,
+        'event_type': _event_type(properties, event_type),
+        'is_recurring': bool(rule),
+        'recurrence_pattern': recurrence_pattern(rule) if rule else '',
+    }
+
+
+def _external_uid(properties):
+    uid = properties.get('UID', ({}, ''))[1].strip()
+    if not uid:
+        return ''
+    recurrence_id = properties.get('RECURRENCE-ID')
+    # Overridden occurrences of a recurring event share its UID
+    return f'{uid}/{recurrence_id[1].strip()}' if recurrence_id else uid
+
+
+def content_hash(fields):
+    values = [fields[name].isoformat() if isinstance(fields[name], (date, datetime)) else str(fields[name])
+              for name in HASHED_FIELDS]
+    return hashlib.sha256('\x1f'.join(values).encode()).hexdigest()
+
+
+# Importing
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_events(stream, user, course=None, event_type=CalendarEvent.EventType.OTHER,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import the VEVENTs of an iCalendar stream into ``course`` (or as the
+    user's personal events). Events are validated in memory and written in
+    batches: new UIDs with one bulk_create, changed ones with one
+    bulk_update, and events whose content hash matches the stored one are
+    left untouched. Events without a UID are always created.
+    """
+    result = ImportResult()
+    default_zone = timezone.get_default_timezone()
+    scope = {'course': course} if course is not None else {'course__isnull': True, 'created_by': user}
+    max_uid = CalendarEvent._meta.get_field('external_uid').max_length
+
+    for chunk in _chunks(read_events(stream), batch_size):
+        result.processed += len(chunk)
+        parsed = {}
+        anonymous = []
+        for line, properties in chunk:
+            uid = _external_uid(properties)
+            try:
+                fields = to_fields(properties, default_zone, event_type)
+            except ValueError as e:
+                result.add_error(line, uid, str(e))
+                continue
+            if len(uid) > max_uid:
+                result.add_error(line, uid[:60], f"UID is longer than {max_uid} characters")
+                continue
+            fields['external_hash'] = content_hash(fields)
+            if uid:
+                # A UID repeated within the file: the last definition wins
+                parsed[uid] = fields
+            else:
+                anonymous.append(fields)
+
+        with transaction.atomic():
+            existing = {
+                event.external_uid: event
+                for event in CalendarEvent.objects.filter(**scope, external_uid__in=list(parsed))
+                .only('pk', 'external_uid', 'external_hash')
+            }
+            new_events, changed = [], []
+            now = timezone.now()
+            for uid, fields in parsed.items():
+                event = existing.get(uid)
+                if event is None:
+                    new_events.append(CalendarEvent(external_uid=uid, course=course, created_by=user, **fields))
+                elif event.external_hash != fields['external_hash']:
+                    for name, value in fields.items():
+                        setattr(event, name, value)
+                    # bulk_update does not apply auto_now
+                    event.updated_at = now
+                    changed.append(event)
+            new_events.extend(CalendarEvent(course=course, created_by=user, **fields) for fields in anonymous)
+
+            CalendarEvent.objects.bulk_create(new_events, batch_size=batch_size)
+            CalendarEvent.objects.bulk_update(
+                changed, HASHED_FIELDS + ['external_hash', 'updated_at'], batch_size=batch_size
+            )
+
+        if course is not None and (new_events or changed):
+            fragments.bump(fragments.COURSE, [course.pk])
+        unchanged = len(parsed) - len(changed) - (len(new_events) - len(anonymous))
+        result.created += len(new_events)
+        result.updated += len(changed)
+        result.unchanged += unchanged
+        metrics.CALENDAR_IMPORT_EVENTS.inc(len(new_events), result='created')
+        metrics.CALENDAR_IMPORT_EVENTS.inc(len(changed), result='updated')
+        metrics.CALENDAR_IMPORT_EVENTS.inc(unchanged, result='unchanged')
+
+    metrics.CALENDAR_IMPORT_EVENTS.inc(len(result.errors), result='failed')
+    return result
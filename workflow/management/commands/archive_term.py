@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from workflow.models import ArchivedRecord, InvalidWorkflowStateException, Term
+from workflow.archive import DEFAULT_BATCH_SIZE, archive_term
+
+
+class Command(BaseCommand):
+    help = 'Moves the submissions, events, announcements and Kanban cards of an ended term into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', help='Code of the term to archive')
+        parser.add_argument(
+            '--kind', action='append', choices=[kind.lower() for kind in ArchivedRecord.Kind.values],
+            help='Only archive this kind of row (repeatable); defaults to all kinds'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Rows moved per transaction'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+
+    def handle(self, *args, **options):
+        try:
+            term = Term.objects.get(code=options['term'])
+        except Term.DoesNotExist:
+            raise CommandError(f"Term '{options['term']}' not found")
+
+        kinds = [kind.upper() for kind in options['kind'] or []]
+        try:
+            result = archive_term(term, kinds=kinds, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        except InvalidWorkflowStateException as e:
+            raise CommandError(str(e))
+
+        for kind, count in result.counts.items():
+            if not kinds or kind in kinds:
+                self.stdout.write(f'{kind.lower()}: {count}')
+        verb = 'would be archived' if result.dry_run else 'archived'
+        self.stdout.write(self.style.SUCCESS(f'{result.total} row(s) of {term.code} {verb}'))
@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand, CommandError
+from pathlib import Path
+from rest_framework.renderers import JSONRenderer
+import json
+import time
+
+from workflow import compression, fastpath
+from workflow.models import Announcement, CalendarEvent, Course, Enrollment, KanbanBoard, KanbanCard, Report
+from workflow.renderers import FastJSONRenderer, orjson
+from workflow.serializers import (
+    AnnouncementSerializer, CalendarEventSerializer, CourseSerializer,
+    KanbanBoardSerializer, KanbanCardSerializer, ReportSerializer,
+)
+
+# (name, queryset, serializer) for the heaviest list payloads of the API
+TARGETS = [
+    ('announcements', lambda: Announcement.objects.select_related('course', 'author', 'read_state').annotate(
+        audience_size=fastpath.related_count(
+            Enrollment, 'course_id', 'course_id', status=Enrollment.Status.ACTIVE)),
+     AnnouncementSerializer),
+    ('calendar-events', lambda: CalendarEvent.objects.select_related('course', 'created_by'),
+     CalendarEventSerializer),
+    ('courses', lambda: Course.objects.select_related('teacher').prefetch_related('enrollments'),
+     CourseSerializer),
+    ('kanban-boards', lambda: KanbanBoard.objects.select_related('course', 'owner').prefetch_related(
+        'columns__cards__assignees'), KanbanBoardSerializer),
+    ('kanban-cards', lambda: KanbanCard.objects.prefetch_related('assignees'), KanbanCardSerializer),
+    ('reports', lambda: Report.objects.select_related('template', 'created_by', 'course'), ReportSerializer),
+]
+
+
+def cpu_ms(func, iterations):
+    """Average CPU time of ``func`` in milliseconds, and its last result"""
+    started = time.process_time()
+    for _ in range(iterations):
+        result = func()
+    return (time.process_time() - started) * 1000 / iterations, result
+
+
+def rows_per_second(func, iterations):
+    """Rows per wall-clock second of ``func`` (which queries and returns the rows), and its last result"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    elapsed = time.perf_counter() - started
+    return len(result) * iterations / elapsed if elapsed else 0.0, result
+
+
+class Command(BaseCommand):
+    help = ('Measures bytes and CPU time per response for each JSON renderer and compression on the API '
+            'serializers, and rows/second of the .values() fast path against the serializers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Objects per serialized response')
+        parser.add_argument('--iterations', type=int, default=20, help='Repetitions per measurement')
+        parser.add_argument('--filter', default='', help='Only benchmark targets whose name contains this text')
+        parser.add_argument('--output', help='Write the raw results to this JSON file')
+
+    def handle(self, *args, **options):
+        iterations = max(1, options['iterations'])
+        renderers = [('stdlib', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', FastJSONRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('orjson is not installed, only the stdlib renderer is measured'))
+
+        results = []
+        for name, queryset, serializer_class in TARGETS:
+            if options['filter'] not in name:
+                continue
+            objects = list(queryset()[:options['rows']])
+            if not objects:
+                self.stdout.write(self.style.WARNING(f'{name}: no rows, skipping (run generate_load_data)'))
+                continue
+
+            serialize_ms, data = cpu_ms(lambda: serializer_class(objects, many=True).data, iterations)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {len(objects)} rows, serializer {serialize_ms:.2f}ms CPU'
+            ))
+            throughput = self.compare_values(name, queryset, serializer_class, len(objects), iterations)
+            for renderer_name, renderer in renderers:
+                render_ms, body = cpu_ms(lambda: renderer.render(data), iterations)
+                result = {
+                    'target': name, 'rows': len(objects), 'renderer': renderer_name,
+                    'serialize_ms': round(serialize_ms, 3), 'render_ms': round(render_ms, 3),
+                    'bytes': len(body), **throughput,
+                }
+                for encoding in compression.available_encodings():
+                    encode_ms, compressed = cpu_ms(lambda: compression.compress(body, encoding), iterations)
+                    result[f'{encoding}_ms'] = round(encode_ms, 3)
+                    result[f'{encoding}_bytes'] = len(compressed)
+                results.append(result)
+                self.report(result)
+
+        if not results:
+            raise CommandError('Nothing to benchmark')
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+    def compare_values(self, name, queryset, serializer_class, rows, iterations):
+        """Rows/second including the query, for the serializer and for the .values() fast path"""
+        serializer_rate, data = rows_per_second(
+            lambda: serializer_class(list(queryset()[:rows]), many=True).data, iterations
+        )
+        throughput = {'serializer_rows_per_sec': round(serializer_rate)}
+        planned = fastpath.plan(serializer_class(), queryset())
+        if planned is None:
+            self.stdout.write(f'  values fast path: not available, serializer {serializer_rate:,.0f} rows/s')
+            return throughput
+
+        values, columns = planned
+        values_rate, fast_data = rows_per_second(lambda: fastpath.represent(values[:rows], columns), iterations)
+        throughput['values_rows_per_sec'] = round(values_rate)
+        self.stdout.write(
+            f'  values fast path {values_rate:,.0f} rows/s, serializer {serializer_rate:,.0f} rows/s '
+            f'({values_rate / serializer_rate if serializer_rate else 0:.1f}x)'
+        )
+        if JSONRenderer().render(fast_data) != JSONRenderer().render(data):
+            self.stdout.write(self.style.ERROR(f'  {name}: the fast path output differs from the serializer'))
+        return throughput
+
+    def report(self, result):
+        line = f"  {result['renderer']:<7} render {result['render_ms']:>8.3f}ms  {result['bytes']:>9} bytes"
+        for encoding in compression.available_encodings():
+            line += (f"  {encoding} {result[f'{encoding}_bytes']:>8} bytes "
+                     f"({result[f'{encoding}_ms']:.3f}ms)")
+        self.stdout.write(line)
@@ -0,0 +1,319 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from django.db import transaction
+from workflow.models import (
+    Course, Enrollment, CalendarEvent, Announcement, KanbanBoard, KanbanColumn,
+    KanbanCard, Assignment, Submission
+)
+from workflow.search import rebuild_index
+from datetime import timedelta
+from itertools import islice
+import random
+import time
+import uuid
+
+User = get_user_model()
+
+# Every generated row is tagged with this prefix so the dataset can be wiped and regenerated
+PREFIX = 'load'
+
+DEPARTMENTS = ['Computer Science', 'Mathematics', 'Physics', 'Biology', 'History', 'Economics']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Smith', 'Johnson', 'Lee', 'Brown', 'Garcia', 'Martin', 'Clark', 'Lewis', 'Walker', 'Young']
+
+SCALES = {
+    'small': {
+        'students': 500, 'teachers': 20, 'courses': 40, 'enrollments': 4,
+        'assignments': 3, 'submissions': 5000, 'announcements': 5,
+        'events': 4, 'cards': 1000,
+    },
+    'medium': {
+        'students': 5000, 'teachers': 200, 'courses': 400, 'enrollments': 5,
+        'assignments': 5, 'submissions': 100000, 'announcements': 10,
+        'events': 6, 'cards': 10000,
+    },
+    'large': {
+        'students': 50000, 'teachers': 1000, 'courses': 2000, 'enrollments': 5,
+        'assignments': 10, 'submissions': 1000000, 'announcements': 20,
+        'events': 8, 'cards': 100000,
+    },
+}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Generates a large, deterministic synthetic dataset for load testing and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help='Preset dataset size; individual counts below override it')
+        for name in SCALES['small']:
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides --scale)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk_create batch')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete previously generated load data before generating')
+
+    def handle(self, *args, **options):
+        self.counts = dict(SCALES[options['scale']])
+        for name in self.counts:
+            if options[name] is not None:
+                self.counts[name] = options[name]
+        if self.counts['teachers'] < 1 or self.counts['courses'] < 1:
+            raise CommandError('At least one teacher and one course are required')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        # Hashing is deliberately slow, so every generated user shares one hash
+        self.password = make_password('load1234')
+
+        if options['reset']:
+            self.reset()
+        elif User.objects.filter(username__startswith=f'{PREFIX}_').exists():
+            raise CommandError('Load data already exists; pass --reset to regenerate it')
+
+        started = time.monotonic()
+        self.create_users()
+        self.create_courses()
+        self.create_enrollments()
+        self.create_assignments()
+        self.create_submissions()
+        self.create_announcements()
+        self.create_calendar_events()
+        self.create_kanban()
+
+        # bulk_create skips the signals that maintain the search index
+        with transaction.atomic():
+            self.stdout.write(f'Indexed {rebuild_index(batch_size=self.batch_size)} search entries')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Load data generated in {time.monotonic() - started:.1f}s (seed {options["seed"]})'
+        ))
+        self.stdout.write(f'Log in as {PREFIX}_teacher_0 / {PREFIX}_student_0 with password load1234')
+
+    def uuid(self):
+        """Deterministic UUID drawn from the seeded generator"""
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def bulk_insert(self, model, objects, label):
+        """Insert an iterable of unsaved objects in batches, each in its own transaction"""
+        total = 0
+        for batch in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.stdout.write(f'Created {total} {label}')
+        return total
+
+    def reset(self):
+        self.stdout.write('Removing previous load data...')
+        with transaction.atomic():
+            # Courses cascade to everything else generated here
+            Course.objects.filter(code__startswith=f'{PREFIX.upper()}-').delete()
+            User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+
+    def create_users(self):
+        def users(role, count):
+            for i in range(count):
+                username = f'{PREFIX}_{role.lower()}_{i}'
+                yield User(
+                    username=username,
+                    email=f'{username}@load.university.edu',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    department=self.rng.choice(DEPARTMENTS),
+                    role=role,
+                    is_staff=role == User.Role.TEACHER,
+                    password=self.password,
+                )
+
+        self.bulk_insert(User, users(User.Role.TEACHER, self.counts['teachers']), 'teachers')
+        self.bulk_insert(User, users(User.Role.STUDENT, self.counts['students']), 'students')
+
+        generated = User.objects.filter(username__startswith=f'{PREFIX}_').order_by('pk')
+        self.teacher_ids = list(generated.filter(role=User.Role.TEACHER).values_list('pk', flat=True))
+        self.student_ids = list(generated.filter(role=User.Role.STUDENT).values_list('pk', flat=True))
+
+    def create_courses(self):
+        def courses():
+            for i in range(self.counts['courses']):
+                department = self.rng.choice(DEPARTMENTS)
+                yield Course(
+                    name=f'{department} {100 + i % 400}',
+                    code=f'{PREFIX.upper()}-{i:05d}',
+                    description=f'Synthetic {department} course for load testing.',
+                    teacher_id=self.teacher_ids[i % len(self.teacher_ids)],
+                )
+
+        self.bulk_insert(Course, courses(), 'courses')
+        self.course_ids = list(
+            Course.objects.filter(code__startswith=f'{PREFIX.upper()}-').order_by('pk').values_list('pk', flat=True)
+        )
+        self.course_teacher = dict(
+            Course.objects.filter(pk__in=self.course_ids).values_list('pk', 'teacher_id')
+        )
+
+    def create_enrollments(self):
+        per_student = min(self.counts['enrollments'], len(self.course_ids))
+        self.course_students = {course_id: [] for course_id in self.course_ids}
+
+        def enrollments():
+            for student_id in self.student_ids:
+                for course_id in self.rng.sample(self.course_ids, per_student):
+                    self.course_students[course_id].append(student_id)
+                    yield Enrollment(course_id=course_id, user_id=student_id)
+
+        self.bulk_insert(Enrollment, enrollments(), 'enrollments')
+
+    def create_assignments(self):
+        self.assignments = []
+
+        def assignments():
+            for course_id in self.course_ids:
+                for i in range(self.counts['assignments']):
+                    assignment = Assignment(
+                        id=self.uuid(),
+                        title=f'Assignment {i + 1}',
+                        description='Synthetic assignment for load testing.',
+                        course_id=course_id,
+                        due_date=self.now + timedelta(days=self.rng.randint(-60, 60), hours=23, minutes=59),
+                        max_score=100,
+                    )
+                    self.assignments.append((assignment.id, course_id))
+                    yield assignment
+
+        self.bulk_insert(Assignment, assignments(), 'assignments')
+
+    def create_submissions(self):
+        # Every (assignment, enrolled student) pair can submit once; spread the
+        # requested total round-robin over assignments so each course gets some.
+        candidates = [
+            (assignment_id, self.course_students[course_id])
+            for assignment_id, course_id in self.assignments
+            if self.course_students[course_id]
+        ]
+        statuses = [choice for choice, _ in Submission.Status.choices]
+
+        def submissions():
+            remaining = self.counts['submissions']
+            offset = 0
+            while remaining > 0 and candidates:
+                progressed = False
+                for assignment_id, students in candidates:
+                    if offset >= len(students):
+                        continue
+                    progressed = True
+                    status = self.rng.choice(statuses)
+                    yield Submission(
+                        id=self.uuid(),
+                        assignment_id=assignment_id,
+                        student_id=students[offset],
+                        files=f'submissions/{PREFIX}/{assignment_id}.pdf',
+                        comments='Synthetic submission.',
+                        status=status,
+                        score=self.rng.randint(40, 100) if status in ('GRADED', 'RETURNED') else None,
+                    )
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+                if not progressed:
+                    return
+                offset += 1
+
+        self.bulk_insert(Submission, submissions(), 'submissions')
+
+    def create_announcements(self):
+        def announcements():
+            for course_id in self.course_ids:
+                for i in range(self.counts['announcements']):
+                    yield Announcement(
+                        id=self.uuid(),
+                        title=f'Course update #{i + 1}',
+                        content='Synthetic announcement content for load testing.',
+                        course_id=course_id,
+                        author_id=self.course_teacher[course_id],
+                        important=self.rng.random() < 0.2,
+                    )
+
+        self.bulk_insert(Announcement, announcements(), 'announcements')
+
+    def create_calendar_events(self):
+        event_types = [choice for choice, _ in CalendarEvent.EventType.choices]
+
+        def events():
+            for course_id in self.course_ids:
+                teacher_id = self.course_teacher[course_id]
+                # One weekly recurring lecture per course plus one-off events
+                start = self.now + timedelta(days=self.rng.randint(0, 6), hours=self.rng.randint(8, 17))
+                yield CalendarEvent(
+                    id=self.uuid(), title='Weekly lecture', start_date=start,
+                    end_date=start + timedelta(hours=2), course_id=course_id, created_by_id=teacher_id,
+                    event_type=CalendarEvent.EventType.CLASS, is_recurring=True, recurrence_pattern='WEEKLY',
+                )
+                for i in range(self.counts['events']):
+                    start = self.now + timedelta(days=self.rng.randint(-90, 90), hours=self.rng.randint(8, 17))
+                    yield CalendarEvent(
+                        id=self.uuid(), title=f'Event {i + 1}', start_date=start,
+                        end_date=start + timedelta(hours=self.rng.randint(1, 3)), course_id=course_id,
+                        created_by_id=teacher_id, event_type=self.rng.choice(event_types),
+                    )
+
+        self.bulk_insert(CalendarEvent, events(), 'calendar events')
+
+    def create_kanban(self):
+        boards = [
+            KanbanBoard(
+                id=self.uuid(), name=f'Project board {i + 1}', course_id=course_id,
+                owner_id=self.course_teacher[course_id],
+            )
+            for i, course_id in enumerate(self.course_ids)
+        ]
+        self.bulk_insert(KanbanBoard, boards, 'kanban boards')
+
+        columns = (
+            KanbanColumn(board_id=board.id, title=title, order=order)
+            for board in boards
+            for order, title in enumerate(['To Do', 'In Progress', 'Done'])
+        )
+        self.bulk_insert(KanbanColumn, columns, 'kanban columns')
+
+        column_courses = list(
+            KanbanColumn.objects.filter(board_id__in=[board.id for board in boards])
+            .order_by('pk').values_list('pk', 'board__course_id')
+        )
+        colors = ['white', 'yellow', 'green', 'blue', 'red']
+        card_assignees = []
+
+        def cards():
+            for i in range(self.counts['cards']):
+                column_id, course_id = column_courses[i % len(column_courses)]
+                card = KanbanCard(
+                    id=self.uuid(), title=f'Task {i + 1}', description='Synthetic kanban task.',
+                    column_id=column_id, order=i // len(column_courses),
+                    color=self.rng.choice(colors),
+                    due_date=self.now + timedelta(days=self.rng.randint(-30, 60)),
+                )
+                students = self.course_students[course_id]
+                if students:
+                    card_assignees.append((card.id, self.rng.choice(students)))
+                yield card
+
+        self.bulk_insert(KanbanCard, cards(), 'kanban cards')
+
+        Assignee = KanbanCard.assignees.through
+        self.bulk_insert(
+            Assignee,
+            (Assignee(kanbancard_id=card_id, user_id=user_id) for card_id, user_id in card_assignees),
+            'kanban card assignees'
+        )
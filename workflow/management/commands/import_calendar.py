@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from workflow.models import CalendarEvent, Course, User
+from workflow.ical import DEFAULT_BATCH_SIZE, import_events
+
+
+class Command(BaseCommand):
+    help = 'Imports calendar events from an iCalendar (.ics) file, updating events imported before by UID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ics_path', help='Path to the .ics file')
+        parser.add_argument('--user', required=True, help='Username recorded as the creator of the events')
+        parser.add_argument('--course', help='Course code the events belong to (personal events when omitted)')
+        parser.add_argument(
+            '--event-type', default=CalendarEvent.EventType.OTHER, choices=CalendarEvent.EventType.values,
+            help='Event type for events without a matching CATEGORIES value'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of events validated and written per batch'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=50,
+            help='Maximum number of event errors to print'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' not found")
+        course = None
+        if options['course']:
+            try:
+                course = Course.objects.get(code=options['course'])
+            except Course.DoesNotExist:
+                raise CommandError(f"Course '{options['course']}' not found")
+
+        self.stdout.write(f"Importing events from {options['ics_path']}...")
+
+        try:
+            with open(options['ics_path'], newline='', encoding='utf-8-sig') as calendar:
+                result = import_events(calendar, user, course=course, event_type=options['event_type'],
+                                       batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Could not read calendar: {e}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for error in result.errors[:options['max_errors']]:
+            self.stdout.write(self.style.WARNING(
+                f"Line {error['line']} ({error['uid'] or 'no UID'}): {error['error']}"
+            ))
+        if len(result.errors) > options['max_errors']:
+            self.stdout.write(f"... and {len(result.errors) - options['max_errors']} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result.processed} events: {result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {len(result.errors)} failed"
+        ))
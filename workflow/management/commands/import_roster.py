@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from workflow.models import Course
+from workflow.enrollment import DEFAULT_BATCH_SIZE, enroll_rows, read_roster_csv
+
+
+class Command(BaseCommand):
+    help = 'Bulk enrolls students into courses from a roster CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Path to the roster CSV file')
+        parser.add_argument(
+            '--course',
+            help='Course code to enroll into when the CSV has no course column'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of CSV rows resolved and inserted per batch'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=50,
+            help='Maximum number of row errors to print'
+        )
+
+    def handle(self, *args, **options):
+        default_course = None
+        if options['course']:
+            try:
+                default_course = Course.objects.get(code=options['course'])
+            except Course.DoesNotExist:
+                raise CommandError(f"Course '{options['course']}' not found")
+
+        self.stdout.write(f"Importing roster from {options['csv_path']}...")
+
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as roster:
+                rows = read_roster_csv(roster, default_course=default_course)
+                result = enroll_rows(rows, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Could not read roster: {e}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for error in result.errors[:options['max_errors']]:
+            self.stdout.write(self.style.WARNING(
+                f"Row {error['row']} ({error['value'] or 'empty'}): {error['error']}"
+            ))
+        if len(result.errors) > options['max_errors']:
+            self.stdout.write(f"... and {len(result.errors) - options['max_errors']} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result.processed} rows: {result.enrolled} enrolled, "
+            f"{result.already_enrolled} already enrolled, {len(result.errors)} failed"
+        ))
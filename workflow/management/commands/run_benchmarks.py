@@ -0,0 +1,203 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from pathlib import Path
+import json
+import statistics
+import time
+
+from workflow.urls import router
+
+User = get_user_model()
+
+DEFAULT_BUDGET = Path(__file__).resolve().parents[2] / 'benchmark_budgets.json'
+
+# Server-rendered pages, with the role that is allowed to view each one
+HTML_VIEWS = [
+    ('dashboard', None),
+    ('profile', None),
+    ('courses', None),
+    ('calendar', None),
+    ('announcements', None),
+    ('kanban', None),
+    ('role_demo', None),
+    ('manage_courses', {'TEACHER'}),
+    ('reports', {'TEACHER'}),
+    ('user_management', {'ADMIN'}),
+]
+
+ROLES = [User.Role.ADMIN, User.Role.TEACHER, User.Role.STUDENT]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks every API and HTML endpoint per role and checks the results against a budget file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', default=str(DEFAULT_BUDGET), help='Path to the budget JSON file')
+        parser.add_argument('--iterations', type=int, default=10, help='Timed requests per endpoint')
+        parser.add_argument('--roles', default='ADMIN,TEACHER,STUDENT',
+                            help='Comma separated roles to benchmark')
+        parser.add_argument('--filter', default='', help='Only run endpoints whose name contains this text')
+        parser.add_argument('--output', help='Write the raw results to this JSON file')
+        parser.add_argument('--no-fail', action='store_true',
+                            help='Report budget violations without failing the command')
+
+    def handle(self, *args, **options):
+        budget = self.load_budget(options['budget'])
+        roles = [role.strip().upper() for role in options['roles'].split(',') if role.strip()]
+        iterations = max(1, options['iterations'])
+
+        results = []
+        for role in roles:
+            if role not in ROLES:
+                raise CommandError(f"Unknown role '{role}'")
+            user = self.pick_user(role)
+            if user is None:
+                self.stdout.write(self.style.WARNING(f'No {role.lower()} user found, skipping'))
+                continue
+
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{role} ({user.username})'))
+
+            for name, url in self.endpoints(client, role, options['filter']):
+                result = self.measure(client, name, url, iterations)
+                result['role'] = role
+                result['violations'] = self.check_budget(budget, result)
+                results.append(result)
+                self.report(result)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+        violations = [(r, v) for r in results for v in r['violations']]
+        if not violations:
+            self.stdout.write(self.style.SUCCESS(f'{len(results)} endpoint benchmarks within budget'))
+            return
+
+        self.stdout.write(self.style.ERROR(f'{len(violations)} budget violation(s):'))
+        for result, violation in violations:
+            self.stdout.write(f"  {result['role']} {result['name']}: {violation}")
+        if not options['no_fail']:
+            raise CommandError('Benchmark budget exceeded')
+
+    def load_budget(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except FileNotFoundError:
+            raise CommandError(f'Budget file {path} not found')
+        except json.JSONDecodeError as e:
+            raise CommandError(f'Invalid budget file {path}: {e}')
+
+    def pick_user(self, role):
+        """Pick the most heavily connected user of a role, so the benchmark sees realistic data volumes"""
+        users = User.objects.filter(role=role, is_active=True)
+        if role == User.Role.TEACHER:
+            users = users.annotate(weight=Count('taught_courses')).order_by('-weight', 'pk')
+        elif role == User.Role.STUDENT:
+            users = users.annotate(weight=Count('enrolled_courses')).order_by('-weight', 'pk')
+        else:
+            users = users.order_by('pk')
+        return users.first()
+
+    def endpoints(self, client, role, name_filter):
+        """
+        Yield (name, url) for every router list/detail endpoint and HTML page
+        visible to the role. API endpoints the role may not read are skipped,
+        so every measured endpoint is expected to answer with a 2xx.
+        """
+        first_course_id = None
+        for prefix, viewset, basename in router.registry:
+            list_url = reverse(f'{basename}-list')
+            name = f'api:{basename}-list'
+            response = client.get(list_url)
+            if response.status_code in (401, 403):
+                self.stdout.write(f'  {name:<36} skipped, HTTP {response.status_code} for this role')
+                continue
+            if name_filter in name:
+                yield name, list_url
+
+            payload = response.json() if response.status_code == 200 else {}
+            rows = payload.get('results', payload) if isinstance(payload, dict) else payload
+            if not rows:
+                continue
+            if basename == 'course':
+                first_course_id = rows[0]['id']
+            name = f'api:{basename}-detail'
+            if name_filter not in name:
+                continue
+            try:
+                detail_urls = [reverse(f'{basename}-detail', args=[row['id']]) for row in rows]
+            except NoReverseMatch:
+                # List-only viewsets have no detail route
+                continue
+            # Lists can include rows the role may see but not open (e.g. other students' cards)
+            detail_url = next((url for url in detail_urls if client.get(url).status_code == 200), None)
+            if detail_url is None:
+                self.stdout.write(f'  {name:<36} skipped, no listed object readable by this role')
+                continue
+            yield name, detail_url
+
+        for view_name, allowed_roles in HTML_VIEWS:
+            name = f'html:{view_name}'
+            if (allowed_roles is None or role in allowed_roles) and name_filter in name:
+                yield name, reverse(view_name)
+        if first_course_id is not None and name_filter in 'html:course_detail':
+            yield 'html:course_detail', reverse('course_detail', args=[first_course_id])
+
+    def measure(self, client, name, url, iterations):
+        # Warm up caches and lazy imports before timing
+        client.get(url)
+
+        # The debug query log is capped, so clear it or a full log would hide every new query
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return {
+            'name': name,
+            'url': url,
+            'status': response.status_code,
+            'queries': len(queries),
+            'bytes': len(response.content),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+        }
+
+    def check_budget(self, budget, result):
+        """Merge default, endpoint and role specific limits and return any violations"""
+        limits = dict(budget.get('defaults', {}))
+        endpoint_limits = budget.get('endpoints', {}).get(result['name'], {})
+        limits.update({k: v for k, v in endpoint_limits.items() if not isinstance(v, dict)})
+        limits.update(endpoint_limits.get(result['role'], {}))
+
+        violations = []
+        if not 200 <= result['status'] < 300:
+            violations.append(f"HTTP {result['status']}")
+        checks = [('max_queries', 'queries', ''), ('max_bytes', 'bytes', ' bytes'),
+                  ('p50_ms', 'p50_ms', 'ms p50'), ('p95_ms', 'p95_ms', 'ms p95')]
+        for limit_key, result_key, unit in checks:
+            if limit_key in limits and result[result_key] > limits[limit_key]:
+                violations.append(f'{result[result_key]}{unit} {result_key} > {limits[limit_key]}{unit}')
+        return violations
+
+    def report(self, result):
+        line = (f"  {result['name']:<36} {result['status']:>3}  {result['queries']:>4} queries  "
+                f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  {result['bytes']:>9} bytes")
+        self.stdout.write(self.style.ERROR(line) if result['violations'] else line)
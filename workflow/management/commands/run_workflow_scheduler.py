@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date
+import time
+
+from workflow.schedule import advance_due_instances
+
+
+class Command(BaseCommand):
+    help = 'Advances workflow instances whose current step deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Instances claimed and updated per transaction')
+        parser.add_argument('--date', help='Advance as of this date (YYYY-MM-DD) instead of today')
+        parser.add_argument('--loop', action='store_true', help='Keep running, checking every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['date']}', expected YYYY-MM-DD")
+
+        while True:
+            started = time.monotonic()
+            advanced, completed = advance_due_instances(today=today, chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Advanced {advanced} and completed {completed} workflow instance(s) '
+                f'in {time.monotonic() - started:.2f}s'
+            ))
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Scheduler stopped')
+                return
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from workflow.reminders import DEFAULT_BATCH_SIZE, deliver, upcoming_reminders
+
+
+class Command(BaseCommand):
+    help = 'Emails reminders for assignments, exams and Kanban cards due soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Remind of deadlines within this many hours')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Messages sent per batch')
+        parser.add_argument('--email-backend',
+                            help='Email backend to use instead of EMAIL_BACKEND, '
+                                 'e.g. django.core.mail.backends.locmem.EmailBackend')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the reminders that would be sent')
+
+    def handle(self, *args, **options):
+        reminders = upcoming_reminders(hours=options['hours'])
+
+        if options['dry_run']:
+            counts = {}
+            for reminder in reminders:
+                counts[reminder.kind] = counts.get(reminder.kind, 0) + 1
+            for kind, count in sorted(counts.items()):
+                self.stdout.write(f'{kind.lower()}: {count}')
+            self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} reminder(s) pending'))
+            return
+
+        result = deliver(reminders, batch_size=options['batch_size'], backend=options['email_backend'])
+        if result.failed:
+            self.stdout.write(self.style.WARNING(f'{result.failed} reminder(s) could not be sent'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {result.sent} reminder(s) in {result.seconds:.2f}s ({result.rate:.0f} msgs/sec)'
+        ))
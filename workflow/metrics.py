@@ -0,0 +1,280 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Directory shared by all worker processes; when set, each process writes
+    # its values to its own file and the endpoint sums them (multiprocess mode)
+    'MULTIPROCESS_DIR': os.environ.get('WORKFLOW_METRICS_DIR'),
+    # Seconds between flushes of this process' values in multiprocess mode
+    'FLUSH_INTERVAL': 5,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    # Scrapers from ALLOWED_IPS must also send ``Authorization: Bearer <token>``;
+    # without a token only admin sessions can read the endpoint
+    'AUTH_TOKEN': os.environ.get('WORKFLOW_METRICS_TOKEN'),
+}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_setting(name):
+    return getattr(settings, 'WORKFLOW_METRICS', {}).get(name, DEFAULTS[name])
+
+
+class Metric:
+    """Base class for metrics; values are kept per tuple of label values"""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not get_setting('ENABLED'):
+            return
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        REGISTRY.maybe_flush()
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        if not get_setting('ENABLED'):
+            return
+        key = self._key(labels)
+        with REGISTRY.lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+        REGISTRY.maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    """Holds the metrics of this process and renders the text exposition format"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.metrics = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        # pid alone is not unique: a restarted worker may reuse the pid of a dead one
+        self._process_token = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """Snapshot of this process' values, in the same shape as the multiprocess files"""
+        with self.lock:
+            return {
+                metric.name: {
+                    'type': metric.type,
+                    'help': metric.documentation,
+                    'labelnames': list(metric.labelnames),
+                    'buckets': list(getattr(metric, 'buckets', ())),
+                    'samples': [
+                        [list(key), _copy_value(value)]
+                        for key, value in metric._values.items()
+                    ],
+                }
+                for metric in self.metrics.values()
+            }
+
+    # Multiprocess support
+
+    def _process_file(self, directory):
+        return Path(directory) / f'metrics_{self._process_token}.json'
+
+    def maybe_flush(self):
+        directory = get_setting('MULTIPROCESS_DIR')
+        if directory and time.monotonic() - self._last_flush >= get_setting('FLUSH_INTERVAL'):
+            self.flush()
+
+    def flush(self):
+        """Atomically write this process' values to its file in the multiprocess directory"""
+        directory = get_setting('MULTIPROCESS_DIR')
+        if not directory:
+            return
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            target = self._process_file(directory)
+            temporary = target.with_suffix('.tmp')
+            os.makedirs(directory, exist_ok=True)
+            temporary.write_text(json.dumps(self.collect()))
+            os.replace(temporary, target)
+
+    def aggregate(self):
+        """Values summed over every process file, or this process' values outside multiprocess mode"""
+        directory = get_setting('MULTIPROCESS_DIR')
+        if not directory:
+            return self.collect()
+
+        self.flush()
+        merged = {}
+        for path in Path(directory).glob('metrics_*.json'):
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # A file being replaced mid-read is picked up on the next scrape
+                continue
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, dict(metric, samples={}))
+                for key, value in metric['samples']:
+                    key = tuple(key)
+                    if metric['type'] == 'histogram':
+                        current = target['samples'].setdefault(
+                            key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0}
+                        )
+                        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                        current['sum'] += value['sum']
+                        current['count'] += value['count']
+                    else:
+                        target['samples'][key] = target['samples'].get(key, 0) + value
+        for metric in merged.values():
+            metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+        return merged
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, metric in sorted(self.aggregate().items()):
+            lines.append(f'# HELP {name} {metric["help"]}')
+            lines.append(f'# TYPE {name} {metric["type"]}')
+            for key, value in metric['samples']:
+                labels = list(zip(metric['labelnames'], key))
+                if metric['type'] == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric['buckets'], value['buckets']):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels + [("le", "+Inf")])} {value["count"]}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {value["sum"]}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {value["count"]}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _copy_value(value):
+    if isinstance(value, dict):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+    return value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+
+# Workflow metrics
+
+API_REQUEST_DURATION = Histogram(
+    'workflow_api_request_duration_seconds',
+    'Latency of DRF viewset actions',
+    ['viewset', 'action', 'method', 'status'],
+)
+KANBAN_CARD_MOVES = Counter(
+    'workflow_kanban_card_moves_total',
+    'Kanban cards moved between columns',
+)
+SUBMISSION_TRANSITIONS = Counter(
+    'workflow_submission_transitions_total',
+    'Submission state transitions',
+    ['from_status', 'to_status'],
+)
+WORKFLOW_STEP_CHANGES = Counter(
+    'workflow_step_changes_total',
+    'Workflow instances moved by the scheduler, by result (advanced/completed)',
+    ['result'],
+)
+CALENDAR_IMPORT_EVENTS = Counter(
+    'workflow_calendar_import_events_total',
+    'Events read by iCalendar imports, by result (created/updated/unchanged/failed)',
+    ['result'],
+)
+WORKFLOW_TEMPLATE_APPLICATIONS = Counter(
+    'workflow_template_applications_total',
+    'Courses a workflow template was applied to in bulk, by result (created/skipped/failed)',
+    ['result'],
+)
+ARCHIVED_RECORDS = Counter(
+    'workflow_archived_records_total',
+    'Rows moved from the live tables to the term archive, by kind',
+    ['kind'],
+)
+REPORT_GENERATION_DURATION = Histogram(
+    'workflow_report_generation_seconds',
+    'Time spent regenerating reports',
+)
+ENROLLMENT_BATCH_SIZE = Histogram(
+    'workflow_enrollment_batch_size',
+    'Rows per bulk enrollment batch',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+CACHE_REQUESTS = Counter(
+    'workflow_cache_requests_total',
+    'Cache lookups by cache name and result (hit/miss)',
+    ['cache', 'result'],
+)
+
+
+def record_cache_lookup(cache_name, hit):
+    """Count a cache lookup; the hit ratio is hits / (hits + misses) per cache"""
+    if get_setting('ENABLED'):
+        CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
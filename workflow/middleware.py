@@ -1,5 +1,18 @@
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
 from django.utils.functional import cached_property
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+import random
+import time
+
+from .profiling import QueryRecorder, get_setting, profile_buffer
+from . import metrics
+from . import compression
+from . import assets
 
 class UserRoleMiddleware:
     """
@@ -43,6 +56,141 @@ class UserRoleMiddleware:
             return user.username[0].upper() if user.username else '?'
         return get_initials
 
+class QueryProfilingMiddleware:
+    """
+    Opt-in middleware recording the SQL issued by a sample of requests.
+    Enabled with QUERY_PROFILING['ENABLED']; results are exposed through a
+    Server-Timing header and aggregated in the in-memory profile buffer.
+    """
+    def __init__(self, get_response):
+        if not get_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = get_setting('SAMPLE_RATE')
+    
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_time = (time.perf_counter() - started) * 1000
+        
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else 'unresolved'
+        profile = recorder.build_profile(view_name, request, response, total_time)
+        profile_buffer.add(profile)
+        
+        timing = (f'db;dur={profile["db_ms"]};desc="{profile["query_count"]} queries", '
+                  f'total;dur={profile["total_ms"]}')
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        return response
+
+class MetricsMiddleware:
+    """Records the latency of every DRF viewset action in workflow_api_request_duration_seconds"""
+    def __init__(self, get_response):
+        if not metrics.get_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        
+        labels = getattr(request, '_metrics_labels', None)
+        if labels is not None:
+            metrics.API_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                status=f'{response.status_code // 100}xx',
+                **labels
+            )
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # ViewSet.as_view() exposes the viewset class and the method -> action mapping
+        viewset = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None)
+        if viewset is None or actions is None:
+            return None
+        method = request.method.lower()
+        request._metrics_labels = {
+            'viewset': viewset.__name__,
+            'action': actions.get(method, method),
+            'method': request.method,
+        }
+        return None
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli (when installed) or gzip, negotiated from
+    Accept-Encoding. Only compressible content types above
+    RESPONSE_COMPRESSION['MIN_SIZE'] bytes are compressed. Responses carry
+    CSRF tokens and user data, so unless MAX_RANDOM_BYTES is 0 they are
+    gzipped with random padding against BREACH, like Django's GZipMiddleware.
+    """
+    def __init__(self, get_response):
+        if not compression.get_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = compression.get_setting('MIN_SIZE')
+        self.max_random_bytes = compression.get_setting('MAX_RANDOM_BYTES')
+        # Only gzip output can be padded
+        self.encodings = ['gzip'] if self.max_random_bytes else None
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+        
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+        compressed = compression.compress(response.content, encoding, max_random_bytes=self.max_random_bytes)
+        if len(compressed) >= len(response.content):
+            return response
+        
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity representation, so a
+        # strong ETag must become weak (as Django's GZipMiddleware does)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+class StaticFilesMiddleware:
+    """
+    Serves collected static files from STATIC_ROOT ahead of the rest of the
+    stack, so deployments without a separate web server still get hashed,
+    precompressed and long-cached assets (see workflow/assets.py). Requests
+    outside STATIC_URL pass through with one dictionary lookup.
+    """
+    def __init__(self, get_response):
+        prefix = urlsplit(settings.STATIC_URL or '')
+        # Static files hosted elsewhere (a CDN) are not served here
+        if not assets.get_setting('ENABLED') or not settings.STATIC_ROOT or prefix.netloc:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.index = assets.StaticFileIndex(settings.STATIC_ROOT, prefix.path)
+    
+    def __call__(self, request):
+        static_file = self.index.find(request.path_info)
+        if static_file is None:
+            return self.get_response(request)
+        return assets.serve(request, static_file)
+
 # Define properties instead of directly setting attributes on the User model
 def is_admin(self):
     """Property to check if user is an admin"""
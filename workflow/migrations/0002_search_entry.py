@@ -0,0 +1,111 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE workflow_searchentry_fts USING fts5(
+        title, body, content='workflow_searchentry', content_rowid='id',
+        tokenize='porter unicode61')""",
+    """CREATE TRIGGER workflow_searchentry_ai AFTER INSERT ON workflow_searchentry BEGIN
+        INSERT INTO workflow_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER workflow_searchentry_ad AFTER DELETE ON workflow_searchentry BEGIN
+        INSERT INTO workflow_searchentry_fts(workflow_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER workflow_searchentry_au AFTER UPDATE ON workflow_searchentry BEGIN
+        INSERT INTO workflow_searchentry_fts(workflow_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO workflow_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS workflow_searchentry_au',
+    'DROP TRIGGER IF EXISTS workflow_searchentry_ad',
+    'DROP TRIGGER IF EXISTS workflow_searchentry_ai',
+    'DROP TABLE IF EXISTS workflow_searchentry_fts',
+]
+
+POSTGRES_INDEX = [
+    """ALTER TABLE workflow_searchentry ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'B')
+        ) STORED""",
+    'CREATE INDEX workflow_searchentry_vector_idx ON workflow_searchentry USING GIN (search_vector)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS workflow_searchentry_vector_idx',
+    'ALTER TABLE workflow_searchentry DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def index_existing_rows(apps, schema_editor):
+    SearchEntry = apps.get_model('workflow', 'SearchEntry')
+    Announcement = apps.get_model('workflow', 'Announcement')
+    Course = apps.get_model('workflow', 'Course')
+    KanbanCard = apps.get_model('workflow', 'KanbanCard')
+
+    entries = [
+        SearchEntry(kind='ANNOUNCEMENT', object_id=str(pk), course_id=course_id,
+                    owner_id=owner_id, title=title, body=body)
+        for pk, course_id, owner_id, title, body in Announcement.objects.values_list(
+            'pk', 'course_id', 'author_id', 'title', 'content').iterator()
+    ]
+    entries += [
+        SearchEntry(kind='COURSE', object_id=str(pk), course_id=pk,
+                    owner_id=owner_id, title=f'{code} {name}', body=body)
+        for pk, owner_id, code, name, body in Course.objects.values_list(
+            'pk', 'teacher_id', 'code', 'name', 'description').iterator()
+    ]
+    entries += [
+        SearchEntry(kind='CARD', object_id=str(pk), course_id=course_id,
+                    owner_id=owner_id, title=title, body=body)
+        for pk, course_id, owner_id, title, body in KanbanCard.objects.values_list(
+            'pk', 'column__board__course_id', 'column__board__owner_id', 'title', 'description').iterator()
+    ]
+    SearchEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ANNOUNCEMENT', 'Announcement'), ('COURSE', 'Course'), ('CARD', 'Kanban card')], max_length=20)),
+                ('object_id', models.CharField(max_length=64)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='workflow.course')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
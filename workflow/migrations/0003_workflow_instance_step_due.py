@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:30
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_step_due(apps, schema_editor):
+    """Set current_step_due from the cumulative step durations of each template"""
+    WorkflowStep = apps.get_model('workflow', 'WorkflowStep')
+    WorkflowInstance = apps.get_model('workflow', 'WorkflowInstance')
+
+    end_offsets = {}
+    offsets_by_template = {}
+    for pk, template_id, duration_days in WorkflowStep.objects.order_by('template_id', 'order', 'pk').values_list(
+        'pk', 'template_id', 'duration_days'
+    ):
+        offset = offsets_by_template.get(template_id, 0) + duration_days
+        offsets_by_template[template_id] = offset
+        end_offsets[pk] = offset
+
+    instances = []
+    for instance in WorkflowInstance.objects.filter(current_step__isnull=False).iterator(chunk_size=1000):
+        instance.current_step_due = instance.start_date + timedelta(days=end_offsets[instance.current_step_id])
+        instances.append(instance)
+    WorkflowInstance.objects.bulk_update(instances, ['current_step_due'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0002_search_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflowinstance',
+            name='current_step_due',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_step_due, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0007_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kanbancolumn',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0008_kanban_column_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='external_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='external_uid',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='calendarevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('course__isnull', False), models.Q(('external_uid', ''), _negated=True)), fields=('course', 'external_uid'), name='calendar_event_course_uid'),
+        ),
+        migrations.AddConstraint(
+            model_name='calendarevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('course__isnull', True), models.Q(('external_uid', ''), _negated=True)), fields=('created_by', 'external_uid'), name='calendar_event_personal_uid'),
+        ),
+    ]
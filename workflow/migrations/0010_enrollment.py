@@ -0,0 +1,104 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def copy_enrollments(apps, schema_editor):
+    """Copy the rows of the implicit course/student table into Enrollment, keyset-paginated by id"""
+    Course = apps.get_model('workflow', 'Course')
+    Enrollment = apps.get_model('workflow', 'Enrollment')
+    through = Course._meta.get_field('students').remote_field.through
+    db = schema_editor.connection.alias
+    now = django.utils.timezone.now()
+
+    last = 0
+    while True:
+        rows = list(
+            through.objects.using(db).filter(pk__gt=last).order_by('pk')
+            .values_list('pk', 'course_id', 'user_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        Enrollment.objects.using(db).bulk_create([
+            Enrollment(course_id=course_id, user_id=user_id, enrolled_at=now, updated_at=now)
+            for _, course_id, user_id in rows
+        ])
+        last = rows[-1][0]
+
+
+def copy_enrollments_back(apps, schema_editor):
+    """Restore active enrollments into the implicit table; status, section and dates are lost"""
+    Course = apps.get_model('workflow', 'Course')
+    Enrollment = apps.get_model('workflow', 'Enrollment')
+    through = Course._meta.get_field('students').remote_field.through
+    db = schema_editor.connection.alias
+
+    last = 0
+    while True:
+        rows = list(
+            Enrollment.objects.using(db).filter(pk__gt=last, status='ACTIVE').order_by('pk')
+            .values_list('pk', 'course_id', 'user_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        through.objects.using(db).bulk_create([
+            through(course_id=course_id, user_id=user_id) for _, course_id, user_id in rows
+        ])
+        last = rows[-1][0]
+
+
+def drop_implicit_table(apps, schema_editor):
+    Course = apps.get_model('workflow', 'Course')
+    schema_editor.delete_model(Course._meta.get_field('students').remote_field.through)
+
+
+def create_implicit_table(apps, schema_editor):
+    Course = apps.get_model('workflow', 'Course')
+    schema_editor.create_model(Course._meta.get_field('students').remote_field.through)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0009_calendar_event_external_uid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('DROPPED', 'Dropped'), ('COMPLETED', 'Completed')], default='ACTIVE', max_length=10)),
+                ('section', models.CharField(blank=True, max_length=20)),
+                ('enrolled_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='workflow.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'status', 'course'], name='enrollment_user_status_idx'),
+                    models.Index(fields=['course', 'status', 'user'], name='enrollment_course_status_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('course', 'user'), name='unique_enrollment'),
+                ],
+            },
+        ),
+        migrations.RunPython(copy_enrollments, copy_enrollments_back),
+        migrations.RunPython(drop_implicit_table, create_implicit_table),
+        # The table is replaced above, so switching the field to the through model only changes state
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='course',
+                    name='students',
+                    field=models.ManyToManyField(blank=True, limit_choices_to={'role': 'STUDENT'}, related_name='enrolled_courses', through='workflow.Enrollment', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# The lower() indexes of 0007 use the database collation, which on Postgres
+# usually does not sort by code point, so LIKE 'prefix%' cannot use them.
+# text_pattern_ops indexes compare characters bytewise and can.
+PREFIX_FIELDS = ['username', 'first_name', 'last_name', 'email', 'department']
+
+
+def create_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS user_{field}_lower_pattern_idx ON workflow_user '
+            f'(LOWER({field}::text) text_pattern_ops)'
+        )
+
+
+def drop_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in PREFIX_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_lower_pattern_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0011_term_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_indexes, drop_pattern_indexes),
+    ]
@@ -0,0 +1,366 @@
+import hashlib
+import sys
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Count, Max, QuerySet
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from . import fastpath
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Model fields worth leaving out of the SELECT when the client omits them
+HEAVY_FIELDS = (models.TextField, models.JSONField, models.BinaryField)
+
+FieldSpec = namedtuple('FieldSpec', 'fields omit expand')
+
+
+def _etag_matches(candidates, etag):
+    """Weak comparison: W/"x" matches "x"; ``*`` matches any current representation"""
+    if '*' in candidates:
+        return True
+    return etag.removeprefix('W/') in {candidate.removeprefix('W/') for candidate in candidates}
+
+
+class ConditionalRequestMixin:
+    """
+    ETag / Last-Modified support for model viewsets.
+
+    The validator is computed with one aggregate query before serialization:
+    the max ``updated_at`` and row count of the filtered queryset for lists, or
+    of the single object for detail routes. GETs whose validator matches
+    ``If-None-Match`` / ``If-Modified-Since`` get a 304 without serializing,
+    and writes with a stale ``If-Match`` / ``If-Unmodified-Since`` get a 412.
+
+    Payloads that include related rows list them in ``etag_fields``: paths
+    ending in ``updated_at`` contribute their max, any other relation path
+    contributes its row count (catching additions and deletions).
+
+    Last-Modified is the latest of the object's and the related rows'
+    timestamps. A date cannot reflect a deleted row, so it is only sent (and
+    If-Modified-Since / If-Unmodified-Since only honored) for detail routes
+    whose ``etag_fields`` are all timestamps; lists and count-based payloads
+    are validated by ETag alone.
+    """
+    etag_fields = ()
+    validator_field = 'updated_at'
+
+    def _supports_validators(self, model):
+        return any(field.name == self.validator_field for field in model._meta.get_fields())
+
+    def _aggregates(self):
+        aggregates = {
+            'last_modified': Max(self.validator_field),
+            'count': Count('pk', distinct=True),
+        }
+        for index, path in enumerate(self.etag_fields):
+            if path.endswith('updated_at'):
+                aggregates[f'extra_{index}'] = Max(path)
+            else:
+                aggregates[f'extra_{index}'] = Count(path, distinct=True)
+        return aggregates
+
+    def _dated(self):
+        """Whether every etag_fields aggregate is a timestamp, so a date can stand for the whole validator"""
+        return all(path.endswith('updated_at') for path in self.etag_fields)
+
+    def _validators(self, queryset, single=False):
+        """
+        Return (etag, last_modified) for the rows of ``queryset``; last_modified
+        is None unless ``single`` and the payload is fully described by dates
+        """
+        values = queryset.order_by().aggregate(**self._aggregates())
+        # Responses depend on who is asking (visibility, read state) and on the query string
+        parts = [
+            queryset.model._meta.label,
+            str(self.request.user.pk),
+            self.request.get_full_path(),
+            *(str(values[key]) for key in sorted(values)),
+        ]
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest())
+        if not (single and self._dated()):
+            # The row count and count-based aggregates change without any date moving forward
+            return etag, None
+        dates = [values['last_modified'], *(values[f'extra_{index}'] for index in range(len(self.etag_fields)))]
+        dates = [date for date in dates if date is not None]
+        return etag, int(max(dates).timestamp()) if dates else None
+
+    def _object_validators(self, obj):
+        # Filter by pk rather than reusing obj so etag_fields aggregates see the related rows
+        return self._validators(type(obj)._default_manager.filter(pk=obj.pk), single=True)
+
+    def _conditional(self, etag, last_modified):
+        """
+        The 304/412 response when the request's preconditions say so, otherwise None.
+        Follows the RFC 9110 evaluation order, but compares If-Match weakly: the
+        validator describes the data, and CompressionMiddleware weakens the ETag
+        clients see.
+        """
+        meta = self.request.META
+        if_match = meta.get('HTTP_IF_MATCH')
+        if if_match:
+            if not _etag_matches(parse_etags(if_match), etag):
+                return HttpResponse(status=412)
+        else:
+            unmodified_since = parse_http_date_safe(meta.get('HTTP_IF_UNMODIFIED_SINCE', ''))
+            if unmodified_since and last_modified and last_modified > unmodified_since:
+                return HttpResponse(status=412)
+
+        if_none_match = meta.get('HTTP_IF_NONE_MATCH')
+        safe = self.request.method in SAFE_METHODS
+        if if_none_match:
+            if _etag_matches(parse_etags(if_none_match), etag):
+                if not safe:
+                    return HttpResponse(status=412)
+                return self._with_validators(HttpResponseNotModified(), (etag, last_modified))
+        elif safe:
+            modified_since = parse_http_date_safe(meta.get('HTTP_IF_MODIFIED_SINCE', ''))
+            if modified_since and last_modified and last_modified <= modified_since:
+                return self._with_validators(HttpResponseNotModified(), (etag, last_modified))
+        return None
+
+    def _with_validators(self, response, validators):
+        etag, last_modified = validators
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = None
+        if request.method in SAFE_METHODS and isinstance(queryset, QuerySet) \
+                and self._supports_validators(queryset.model):
+            validators = self._validators(queryset)
+            conditional = self._conditional(*validators)
+            if conditional is not None:
+                return conditional
+
+        response = self.serialize_list(queryset)
+        return self._with_validators(response, validators) if validators else response
+
+    def serialize_list(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        # get_object applies the permission checks before anything is revealed
+        instance = self.get_object()
+        validators = None
+        if self._supports_validators(type(instance)):
+            validators = self._object_validators(instance)
+            conditional = self._conditional(*validators)
+            if conditional is not None:
+                return conditional
+
+        response = Response(self.get_serializer(instance).data)
+        return self._with_validators(response, validators) if validators else response
+
+    def _write(self, write, request, *args, **kwargs):
+        instance = self.get_object()
+        if not self._supports_validators(type(instance)):
+            return write(request, *args, **kwargs)
+
+        conditional = self._conditional(*self._object_validators(instance))
+        if conditional is not None:
+            return conditional
+        response = write(request, *args, **kwargs)
+        if response.status_code == 204:
+            return response
+        return self._with_validators(response, self._object_validators(instance))
+
+    def update(self, request, *args, **kwargs):
+        return self._write(super().update, request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        return self._write(super().destroy, request, *args, **kwargs)
+
+
+# Sparse fieldsets
+
+def _split_paths(paths):
+    """['a', 'b.c', 'b.d'] -> {'a': [], 'b': ['c', 'd']}"""
+    tree = {}
+    for path in paths:
+        name, _, rest = path.strip().partition('.')
+        if name:
+            tree.setdefault(name, [])
+            if rest:
+                tree[name].append(rest)
+    return tree
+
+
+def _query_list(params, name):
+    return [value for param in params.getlist(name) for value in param.split(',') if value.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets. On GET requests the top-level
+    serializer reads ``?fields=`` (keep only these), ``?omit=`` (drop these)
+    and ``?expand=`` (render a related object instead of its id); dotted
+    names such as ``columns.cards.title`` reach into nested serializers.
+    The same filters can be passed as ``fields``/``omit``/``expand`` kwargs.
+
+    ``Meta.expandable_fields`` maps field names to the serializer (or its
+    name in the same module) used when expanded, and ``Meta.field_relations``
+    lists the relations each method field reads, so DynamicQuerysetMixin can
+    load exactly what the rendered fields need.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._field_spec = None
+        if fields is not None or omit or expand:
+            self._field_spec = FieldSpec(fields, omit or [], expand or [])
+        self.dropped_fields = []
+
+    def _is_top_level(self):
+        parent = getattr(self, 'parent', None)
+        return parent is None or (isinstance(parent, serializers.ListSerializer)
+                                  and getattr(parent, 'parent', None) is None)
+
+    def _get_field_spec(self):
+        if self._field_spec is not None or not self._is_top_level():
+            return self._field_spec
+        request = self.context.get('request')
+        # Writes always see every field, so filters never drop submitted data
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        fields = _query_list(params, 'fields')
+        return FieldSpec(fields or None, _query_list(params, 'omit'), _query_list(params, 'expand'))
+
+    def _expand_field(self, name, field):
+        serializer_class = self.Meta.expandable_fields[name]
+        if isinstance(serializer_class, str):
+            serializer_class = getattr(sys.modules[type(self).__module__], serializer_class)
+        kwargs = {'read_only': True, 'many': isinstance(field, serializers.ManyRelatedField)}
+        if field.source not in (None, name):
+            kwargs['source'] = field.source
+        return serializer_class(**kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self._get_field_spec()
+        if spec is None:
+            return fields
+
+        include = _split_paths(spec.fields) if spec.fields is not None else None
+        omit = _split_paths(spec.omit)
+        expand = _split_paths(spec.expand)
+        expandable = getattr(getattr(self, 'Meta', None), 'expandable_fields', {})
+
+        for name in list(fields):
+            # "omit=columns.cards" keeps columns and drops cards inside it
+            if (include is not None and name not in include) or omit.get(name) == []:
+                self.dropped_fields.append(name)
+                del fields[name]
+        for name in expand:
+            if name in fields and name in expandable:
+                fields[name] = self._expand_field(name, fields[name])
+
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                nested._field_spec = FieldSpec(
+                    (include.get(name) or None) if include is not None else None,
+                    omit.get(name, []), expand.get(name, []),
+                )
+        return fields
+
+    def related_lookups(self):
+        """Relation paths from this serializer's model that its remaining fields read"""
+        relations = getattr(getattr(self, 'Meta', None), 'field_relations', {})
+        lookups = []
+        for name, field in self.fields.items():
+            lookups.extend(relations.get(name, ()))
+            if field.source == '*':
+                continue
+            path = field.source.replace('.', '__')
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                lookups.append(path)
+                lookups.extend(f'{path}__{lookup}' for lookup in nested.related_lookups())
+            elif isinstance(field, serializers.ManyRelatedField):
+                lookups.append(path)
+        return lookups
+
+
+def _is_single_valued(model, path):
+    """Whether every hop of a relation path is a foreign key or one-to-one"""
+    for name in path.split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Default reverse accessors (``foo_set``) are only reachable by prefetching
+            return False
+        if not (field.many_to_one or field.one_to_one):
+            return False
+        model = field.related_model
+    return True
+
+
+class DynamicQuerysetMixin:
+    """
+    Load what the response renders and nothing else: relations read by the
+    serializer's remaining fields are select_related (foreign keys) or
+    prefetch_related (to-many), and large text/JSON columns the client
+    omitted are deferred. Applied in filter_queryset, so it covers both
+    list and detail routes.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not isinstance(queryset, QuerySet):
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, DynamicFieldsMixin):
+            return queryset
+
+        lookups = list(dict.fromkeys(serializer.related_lookups()))
+        joined = [lookup for lookup in lookups if _is_single_valued(queryset.model, lookup)]
+        prefetched = [lookup for lookup in lookups if lookup not in joined]
+        # select_related() with no arguments would follow every foreign key
+        if joined:
+            queryset = queryset.select_related(*joined)
+        if prefetched:
+            queryset = queryset.prefetch_related(*prefetched)
+
+        deferred = []
+        for name in serializer.dropped_fields:
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if isinstance(model_field, HEAVY_FIELDS):
+                deferred.append(name)
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+class ValuesListMixin:
+    """
+    Read-only fast path for list routes: when the serializer declares
+    ``Meta.values_fields`` and every requested field can be read from a
+    ``.values()`` row, the page is built from those rows with the same JSON
+    shape, skipping model instantiation and per-object method fields.
+    Goes before ConditionalRequestMixin in the bases.
+    """
+
+    def serialize_list(self, queryset):
+        planned = fastpath.plan(self.get_serializer(), queryset) if isinstance(queryset, QuerySet) else None
+        if planned is None:
+            return super().serialize_list(queryset)
+        rows, columns = planned
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fastpath.represent(page, columns))
+        return Response(fastpath.represent(rows, columns))
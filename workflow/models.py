@@ -1,9 +1,13 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import uuid
 from django.utils.translation import gettext_lazy as _
+from . import fragments
+from . import metrics
 
 # Custom Exceptions
 class WorkflowException(Exception):
@@ -36,6 +40,16 @@ class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     department = models.CharField(max_length=100, blank=True)
     
+    class Meta(AbstractUser.Meta):
+        # Case-insensitive prefix search for user pickers (see workflow/autocomplete.py)
+        indexes = [
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('department'), name='user_department_lower_idx'),
+        ]
+    
     @property
     def is_student(self):
         return self.role == self.Role.STUDENT
@@ -61,9 +75,42 @@ class User(AbstractUser):
             return True
         return False
     
+    def get_enrolled_courses(self):
+        """Courses the user is actively enrolled in"""
+        return Course.objects.filter(enrollments__user=self, enrollments__status=Enrollment.Status.ACTIVE)
+    
+    def is_enrolled_in(self, course):
+        """Check if the user is actively enrolled in a course"""
+        return Enrollment.objects.active().filter(user=self, course=course).exists()
+    
     def __str__(self):
         return f"{self.get_full_name()} ({self.get_role_display()})"
 
+# Term Model
+class Term(models.Model):
+    """An academic term; the courses of a term that has ended can be archived (see workflow/archive.py)"""
+    name = models.CharField(max_length=100)
+    code = models.CharField(max_length=20, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # Set by the last archive run; rows created in the term's courses afterwards are picked up by the next one
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        ordering = ['-start_date']
+    
+    def clean(self):
+        """Validate the term dates"""
+        if self.end_date < self.start_date:
+            raise ValidationError("End date cannot be before start date")
+    
+    def is_closed(self):
+        """Check if the term has ended"""
+        return self.end_date < timezone.localdate()
+    
+    def __str__(self):
+        return f"{self.code}: {self.name}"
+
 # Course Model
 class Course(models.Model):
     """Course model for university classes"""
@@ -72,24 +119,77 @@ class Course(models.Model):
     description = models.TextField(blank=True)
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='taught_courses',
                                limit_choices_to={'role': User.Role.TEACHER})
-    students = models.ManyToManyField(User, related_name='enrolled_courses', 
+    # Every enrollment ever made, including dropped ones; use get_students() for the current roster
+    students = models.ManyToManyField(User, related_name='enrolled_courses', through='Enrollment',
                                     limit_choices_to={'role': User.Role.STUDENT}, blank=True)
+    term = models.ForeignKey(Term, on_delete=models.SET_NULL, related_name='courses', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    def add_student(self, student):
-        """Add a student to the course"""
+    def get_students(self):
+        """Students actively enrolled in the course"""
+        return User.objects.filter(enrollments__course=self, enrollments__status=Enrollment.Status.ACTIVE)
+    
+    def add_student(self, student, section=''):
+        """Add a student to the course, reactivating a dropped enrollment"""
         if not student.is_student:
             raise ValidationError("Only users with student role can be added to courses")
-        self.students.add(student)
+        Enrollment.objects.update_or_create(
+            course=self, user=student,
+            defaults={'status': Enrollment.Status.ACTIVE, 'section': section},
+        )
         
     def remove_student(self, student):
-        """Remove a student from the course"""
-        self.students.remove(student)
+        """Drop a student from the course, keeping the enrollment record"""
+        return self.drop_students([student.pk])
+    
+    def drop_students(self, student_ids):
+        """Mark the active enrollments of ``student_ids`` as dropped; returns how many changed"""
+        dropped = Enrollment.objects.active().filter(course=self, user_id__in=student_ids).update(
+            status=Enrollment.Status.DROPPED, updated_at=timezone.now(),
+        )
+        if dropped:
+            fragments.bump(fragments.COURSE, [self.pk])
+        return dropped
     
     def __str__(self):
         return f"{self.code}: {self.name}"
 
+class EnrollmentQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(status=Enrollment.Status.ACTIVE)
+
+class Enrollment(models.Model):
+    """A student's enrollment in a course, kept after the student drops"""
+    
+    class Status(models.TextChoices):
+        ACTIVE = 'ACTIVE', _('Active')
+        DROPPED = 'DROPPED', _('Dropped')
+        COMPLETED = 'COMPLETED', _('Completed')
+    
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.ACTIVE)
+    section = models.CharField(max_length=20, blank=True)
+    enrolled_at = models.DateTimeField(default=timezone.now)
+    # Indexed so roster sync and analytics can ask for enrollments changed since a point in time
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = EnrollmentQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'user'], name='unique_enrollment'),
+        ]
+        indexes = [
+            # Active enrollments of a user, and the roster of a course, as index-only range scans
+            models.Index(fields=['user', 'status', 'course'], name='enrollment_user_status_idx'),
+            models.Index(fields=['course', 'status', 'user'], name='enrollment_course_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} in {self.course.code} ({self.get_status_display()})"
+
 # Abstract Base Model
 class BaseModel(models.Model):
     """Abstract base model with common fields"""
@@ -119,6 +219,22 @@ class CalendarEvent(BaseModel):
     event_type = models.CharField(max_length=20, choices=EventType.choices, default=EventType.OTHER)
     is_recurring = models.BooleanField(default=False)
     recurrence_pattern = models.CharField(max_length=50, blank=True)
+    # Set for events imported from iCalendar files: the UID (plus RECURRENCE-ID for
+    # overridden occurrences) and a hash of the imported values, so re-imports skip unchanged events
+    external_uid = models.CharField(max_length=255, blank=True, editable=False)
+    external_hash = models.CharField(max_length=64, blank=True, editable=False)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['course', 'external_uid'], name='calendar_event_course_uid',
+                condition=models.Q(course__isnull=False) & ~models.Q(external_uid=''),
+            ),
+            models.UniqueConstraint(
+                fields=['created_by', 'external_uid'], name='calendar_event_personal_uid',
+                condition=models.Q(course__isnull=True) & ~models.Q(external_uid=''),
+            ),
+        ]
     
     def clean(self):
         """Validate the event dates"""
@@ -153,7 +269,7 @@ class CalendarEvent(BaseModel):
                 # Filter by events created by user or for courses they're involved with
                 user_courses = []
                 if hasattr(user, 'is_student') and user.is_student:
-                    user_courses = user.enrolled_courses.all()
+                    user_courses = user.get_enrolled_courses()
                 elif hasattr(user, 'is_teacher') and user.is_teacher:
                     user_courses = user.taught_courses.all()
                 
@@ -185,6 +301,14 @@ class Announcement(BaseModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='announcements')
     important = models.BooleanField(default=False)
     attachment = models.FileField(upload_to='announcements/', null=True, blank=True)
+    # Set for announcements to large courses, which are read from the course stream
+    # instead of being copied into every student's inbox (see workflow/notifications.py)
+    streamed = models.BooleanField(default=False, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'streamed', 'created_at'], name='announcement_stream_idx'),
+        ]
     
     def clean(self):
         """Validate announcement data"""
@@ -217,6 +341,7 @@ class KanbanColumn(models.Model):
     board = models.ForeignKey(KanbanBoard, on_delete=models.CASCADE, related_name='columns')
     title = models.CharField(max_length=100)
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order']
@@ -305,6 +430,7 @@ class Submission(BaseModel):
         if self.status == self.Status.DRAFT:
             self.status = self.Status.SUBMITTED
             self.save()
+            metrics.SUBMISSION_TRANSITIONS.inc(from_status=self.Status.DRAFT, to_status=self.status)
         else:
             raise InvalidWorkflowStateException("Only drafts can be submitted")
     
@@ -316,6 +442,7 @@ class Submission(BaseModel):
         self.feedback = feedback
         self.status = self.Status.GRADED
         self.save()
+        metrics.SUBMISSION_TRANSITIONS.inc(from_status=self.Status.SUBMITTED, to_status=self.status)
     
     def return_to_student(self):
         """Return the graded submission to the student"""
@@ -323,6 +450,7 @@ class Submission(BaseModel):
             raise InvalidWorkflowStateException("Only graded assignments can be returned")
         self.status = self.Status.RETURNED
         self.save()
+        metrics.SUBMISSION_TRANSITIONS.inc(from_status=self.Status.GRADED, to_status=self.status)
     
     def __str__(self):
         return f"{self.student.username}'s submission for {self.assignment.title}"
@@ -406,42 +534,65 @@ class WorkflowInstance(BaseModel):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='workflows')
     current_step = models.ForeignKey(WorkflowStep, on_delete=models.SET_NULL, null=True, blank=True)
     start_date = models.DateField()
+    # Denormalized end date of the current step, so the scheduler can find overdue instances by index
+    current_step_due = models.DateField(null=True, blank=True, db_index=True, editable=False)
     
+    def save(self, *args, **kwargs):
+        self.current_step_due = self.get_current_end_date()
+        super().save(*args, **kwargs)
+
+    @property
+    def schedule(self):
+        """Compiled step schedule of the template, cached across instances"""
+        from .schedule import get_schedule
+
+        cached = getattr(self, '_schedule', None)
+        if cached is None or cached.template_id != self.template_id:
+            cached = self._schedule = get_schedule(self.template_id)
+        return cached
+
     def advance_step(self):
         """Move workflow to the next step"""
         from django.db import transaction
+        from .schedule import step_changed
         
+        previous_step_id = self.current_step_id
         with transaction.atomic():
-            if not self.current_step:
+            if not self.current_step_id:
                 # Initialize with first step
-                try:
-                    self.current_step = self.template.steps.order_by('order').first()
-                    self.save()
-                    return True
-                except WorkflowStep.DoesNotExist:
+                first_step = self.schedule.first()
+                if first_step is None:
                     raise InvalidWorkflowStateException("No steps defined in this workflow")
-            else:
-                # Move to next step
-                try:
-                    next_step = self.template.steps.filter(order__gt=self.current_step.order).order_by('order').first()
-                    if next_step:
-                        self.current_step = next_step
-                        self.save()
-                        return True
-                    else:
-                        # Workflow completed
-                        self.current_step = None
-                        self.save()
-                        return False
-                except WorkflowStep.DoesNotExist:
-                    raise InvalidWorkflowStateException("No next step available")
-    
+                self.current_step_id = first_step.id
+                self.save()
+                step_changed.send(sender=WorkflowInstance, instance=self,
+                                  previous_step_id=previous_step_id, step_id=self.current_step_id)
+                return True
+
+            if self.schedule.get(self.current_step_id) is None:
+                raise InvalidWorkflowStateException("Current step is not part of this workflow")
+            next_step = self.schedule.next(self.current_step_id)
+            # Workflow completed when there is no next step
+            self.current_step_id = next_step.id if next_step else None
+            self.save()
+            step_changed.send(sender=WorkflowInstance, instance=self,
+                              previous_step_id=previous_step_id, step_id=self.current_step_id)
+            return next_step is not None
+    
+    def get_current_start_date(self):
+        """Calculate the start date of the current step"""
+        step = self.schedule.get(self.current_step_id) if self.current_step_id else None
+        return step.start_date(self.start_date) if step else None
+
     def get_current_end_date(self):
-        """Calculate the end date for the current step"""
-        if not self.current_step:
-            return None
-        import datetime
-        return self.start_date + datetime.timedelta(days=self.current_step.duration_days)
+        """Calculate the end date of the current step, counting every step before it"""
+        step = self.schedule.get(self.current_step_id) if self.current_step_id else None
+        return step.end_date(self.start_date) if step else None
+
+    def get_scheduled_step(self, on_date=None):
+        """The step the workflow should be on at ``on_date`` (today by default)"""
+        on_date = on_date or timezone.localdate()
+        return self.schedule.step_at((on_date - self.start_date).days)
     
     def __str__(self):
         return f"{self.template.name} for {self.course.code}"
@@ -470,8 +621,159 @@ class Report(BaseModel):
         """Regenerate the report data"""
         # This would execute the template query and update the data
         # Implementation would depend on the specific querying mechanism
-        self.generated_at = timezone.now()
-        self.save()
+        with metrics.REPORT_GENERATION_DURATION.time():
+            self.generated_at = timezone.now()
+            self.save()
     
     def __str__(self):
         return self.name
+
+# Search Index
+class SearchEntry(models.Model):
+    """
+    Denormalized full-text search document for announcements, courses and Kanban cards.
+    The backend-specific index (SQLite FTS5 table or Postgres tsvector column) is
+    created by migration and kept in sync with this table, see workflow/search.py.
+    """
+    class Kind(models.TextChoices):
+        ANNOUNCEMENT = 'ANNOUNCEMENT', _('Announcement')
+        COURSE = 'COURSE', _('Course')
+        CARD = 'CARD', _('Kanban card')
+    
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.CharField(max_length=64)
+    # Visibility: course members see the entry, as does the owner (author, teacher or board owner)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+# Reminder Models
+class ReminderLog(models.Model):
+    """Record of a deadline reminder sent to a user, so each deadline is only reminded once"""
+    class Kind(models.TextChoices):
+        ASSIGNMENT = 'ASSIGNMENT', _('Assignment')
+        EXAM = 'EXAM', _('Exam')
+        CARD = 'CARD', _('Kanban card')
+    
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.UUIDField()
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminders')
+    # A moved deadline is a new deadline and gets its own reminder
+    due_at = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'recipient', 'due_at'], name='unique_reminder'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for {self.recipient.username}"
+
+# Notification Models
+class Notification(models.Model):
+    """Inbox entry written per recipient for announcements to small courses (fan-out on write)"""
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='notifications')
+    # Copied from the announcement so the inbox can be ordered without a join
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'announcement'], name='unique_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['recipient', 'read_at', 'created_at'], name='notification_inbox_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Notification for {self.recipient.username}: {self.announcement_id}"
+
+class NotificationWatermark(models.Model):
+    """How far a user has read a course's announcement stream (fan-out on read)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_watermarks')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    read_through = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_notification_watermark'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} read {self.course.code} through {self.read_through}"
+
+# Read Receipt Models
+class RosterSlot(models.Model):
+    """Stable, dense per-course index of a student, used as the bit position in read bitmaps"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='roster_slots')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='roster_slots')
+    index = models.PositiveIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'user'], name='unique_roster_slot_user'),
+            models.UniqueConstraint(fields=['course', 'index'], name='unique_roster_slot_index'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} #{self.index} in {self.course.code}"
+
+class AnnouncementReadState(models.Model):
+    """Who has read an announcement, as a compressed bitmap of roster slot indexes"""
+    announcement = models.OneToOneField(Announcement, on_delete=models.CASCADE, related_name='read_state')
+    bitmap = models.BinaryField(default=b'')
+    read_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.read_count} read {self.announcement_id}"
+
+# Archive
+class ArchivedRecord(models.Model):
+    """
+    A submission, calendar event, announcement or Kanban card moved out of its
+    live table when its term was archived. The row is kept as serialized fields,
+    next to the columns needed to list and authorize it (see workflow/archive.py).
+    """
+    class Kind(models.TextChoices):
+        SUBMISSION = 'SUBMISSION', _('Submission')
+        CALENDAR_EVENT = 'CALENDAR_EVENT', _('Calendar event')
+        ANNOUNCEMENT = 'ANNOUNCEMENT', _('Announcement')
+        CARD = 'CARD', _('Kanban card')
+    
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.UUIDField()
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name='archived_records')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='archived_records')
+    # Student of a submission, creator of an event, author of an announcement, owner of a card's board
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    title = models.CharField(max_length=255)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_archived_record'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'kind', 'created_at'], name='archived_course_kind_idx'),
+            models.Index(fields=['owner', 'kind', 'created_at'], name='archived_owner_kind_idx'),
+            models.Index(fields=['term', 'kind'], name='archived_term_kind_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
@@ -0,0 +1,188 @@
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Announcement, Enrollment, Notification, NotificationWatermark
+from . import metrics
+
+DEFAULTS = {
+    # Announcements to courses with more students than this are streamed (fan-out
+    # on read) instead of copied into every student's inbox (fan-out on write)
+    'FANOUT_THRESHOLD': 200,
+    # Streamed announcements older than this never show up as unread
+    'HISTORY_DAYS': 30,
+    'UNREAD_CACHE_TIMEOUT': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _stream_key(course_id):
+    return f'notifications:stream:{course_id}'
+
+
+def _enrolled_course_ids(user):
+    return list(Enrollment.objects.active().filter(user=user).values_list('course_id', flat=True))
+
+
+# Publishing
+
+def publish(announcement):
+    """
+    Deliver an announcement to its course's students. Small audiences get one
+    inbox row each; larger ones only mark the announcement as streamed, so the
+    cost of posting does not grow with enrollment.
+    """
+    threshold = get_setting('FANOUT_THRESHOLD')
+    recipients = list(
+        Enrollment.objects.active().filter(course_id=announcement.course_id)
+        .exclude(user_id=announcement.author_id)
+        .values_list('user_id', flat=True)[:threshold + 1]
+    )
+
+    if len(recipients) > threshold:
+        Announcement.objects.filter(pk=announcement.pk).update(streamed=True)
+        announcement.streamed = True
+        # Changing the stream version invalidates the cached unread counts of its readers
+        cache.set(_stream_key(announcement.course_id), str(announcement.pk), None)
+        return 0
+
+    Notification.objects.bulk_create([
+        Notification(recipient_id=user_id, announcement=announcement, created_at=announcement.created_at)
+        for user_id in recipients
+    ], ignore_conflicts=True)
+    cache.delete_many([_unread_key(user_id) for user_id in recipients])
+    return len(recipients)
+
+
+# Reading
+
+def _stream(user, course_ids):
+    """Streamed announcements of the user's courses, annotated with the user's watermark"""
+    watermark = NotificationWatermark.objects.filter(user=user, course=OuterRef('course')).values('read_through')[:1]
+    since = timezone.now() - timedelta(days=get_setting('HISTORY_DAYS'))
+    return (
+        Announcement.objects.filter(streamed=True, course_id__in=course_ids, created_at__gte=since)
+        .exclude(author=user)
+        .annotate(read_through=Subquery(watermark))
+    )
+
+
+_UNREAD_STREAM = Q(read_through__isnull=True) | Q(created_at__gt=F('read_through'))
+
+
+def inbox(user, unread_only=False, limit=20, offset=0):
+    """The user's notifications, newest first, merging inbox rows with course streams"""
+    course_ids = _enrolled_course_ids(user)
+    written = Notification.objects.filter(recipient=user).select_related('announcement__course')
+    streamed = _stream(user, course_ids).select_related('course')
+    if unread_only:
+        written = written.filter(read_at__isnull=True)
+        streamed = streamed.filter(_UNREAD_STREAM)
+
+    window = offset + limit
+    written_items = (
+        _item(notification.announcement, notification.read_at is not None)
+        for notification in written.order_by('-created_at')[:window]
+    )
+    streamed_items = (
+        _item(announcement, announcement.read_through is not None
+              and announcement.created_at <= announcement.read_through)
+        for announcement in streamed.order_by('-created_at')[:window]
+    )
+    merged = heapq.merge(written_items, streamed_items, key=lambda item: item['created_at'], reverse=True)
+    return list(merged)[offset:window]
+
+
+def _item(announcement, read):
+    return {
+        'id': announcement.pk,
+        'title': announcement.title,
+        'course': announcement.course_id,
+        'course_code': announcement.course.code,
+        'important': announcement.important,
+        'created_at': announcement.created_at,
+        'read': read,
+    }
+
+
+def _count_unread(user, course_ids):
+    written = Notification.objects.filter(recipient=user, read_at__isnull=True).count()
+    return written + _stream(user, course_ids).filter(_UNREAD_STREAM).count()
+
+
+def unread_count(user):
+    """
+    Unread notifications of a user. The count is cached together with the
+    stream versions of the user's courses, so a new streamed announcement
+    invalidates it without touching every reader's cache entry.
+    """
+    key = _unread_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        count, versions = cached
+        current = cache.get_many(list(versions))
+        if all(current.get(stream) == version for stream, version in versions.items()):
+            metrics.record_cache_lookup('notifications_unread', True)
+            return count
+    metrics.record_cache_lookup('notifications_unread', False)
+
+    course_ids = _enrolled_course_ids(user)
+    streams = [_stream_key(course_id) for course_id in course_ids]
+    current = cache.get_many(streams)
+    versions = {stream: current.get(stream) for stream in streams}
+    count = _count_unread(user, course_ids)
+    cache.set(key, (count, versions), get_setting('UNREAD_CACHE_TIMEOUT'))
+    return count
+
+
+# Marking as read
+
+def _advance_watermarks(user, positions):
+    """Move the user's stream watermarks forward to the given {course_id: datetime}"""
+    existing = dict(
+        NotificationWatermark.objects.filter(user=user, course_id__in=positions)
+        .values_list('course_id', 'read_through')
+    )
+    watermarks = [
+        NotificationWatermark(user=user, course_id=course_id, read_through=read_through)
+        for course_id, read_through in positions.items()
+        if course_id not in existing or existing[course_id] < read_through
+    ]
+    NotificationWatermark.objects.bulk_create(
+        watermarks, update_conflicts=True, unique_fields=['user', 'course'], update_fields=['read_through'],
+    )
+
+
+def mark_read(user, announcement_ids):
+    """
+    Mark announcements as read. For streamed announcements this moves the
+    course watermark, which also marks older announcements of that course read.
+    """
+    updated = Notification.objects.filter(
+        recipient=user, announcement_id__in=announcement_ids, read_at__isnull=True
+    ).update(read_at=timezone.now())
+    positions = dict(
+        Announcement.objects.filter(pk__in=announcement_ids, streamed=True, course_id__in=_enrolled_course_ids(user))
+        .values('course_id').annotate(latest=Max('created_at')).values_list('course_id', 'latest')
+    )
+    _advance_watermarks(user, positions)
+    cache.delete(_unread_key(user.pk))
+    return updated + len(positions)
+
+
+def mark_all_read(user):
+    now = timezone.now()
+    Notification.objects.filter(recipient=user, read_at__isnull=True).update(read_at=now)
+    _advance_watermarks(user, {course_id: now for course_id in _enrolled_course_ids(user)})
+    cache.delete(_unread_key(user.pk))
@@ -0,0 +1,150 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+logger = logging.getLogger('workflow.profiling')
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Fraction of requests that are profiled
+    'SAMPLE_RATE': 0.05,
+    # Number of request profiles kept in memory
+    'BUFFER_SIZE': 1000,
+    # Statements slower than this are logged as warnings
+    'SLOW_QUERY_MS': 100,
+    # Slowest statements / duplicate fingerprints kept per request
+    'TOP_QUERIES': 5,
+}
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+
+def get_setting(name):
+    return getattr(settings, 'QUERY_PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """Normalize a statement so queries differing only in parameters group together"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable that times every statement of a request"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def build_profile(self, view_name, request, response, total_time):
+        top = get_setting('TOP_QUERIES')
+        slow_threshold = get_setting('SLOW_QUERY_MS')
+
+        fingerprints = Counter(fingerprint(sql) for sql, _ in self.queries)
+        duplicates = [
+            {'fingerprint': fp, 'count': count}
+            for fp, count in fingerprints.most_common(top) if count > 1
+        ]
+        slowest = sorted(self.queries, key=lambda query: query[1], reverse=True)[:top]
+
+        for sql, duration in slowest:
+            if duration >= slow_threshold:
+                logger.warning("Slow query in %s (%.1fms): %s", view_name, duration, sql)
+
+        return {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timestamp': time.time(),
+            'total_ms': round(total_time, 2),
+            'db_ms': round(self.db_time, 2),
+            'query_count': len(self.queries),
+            'duplicates': duplicates,
+            'slowest': [{'sql': sql, 'ms': round(duration, 2)} for sql, duration in slowest],
+        }
+
+
+class ProfileBuffer:
+    """Thread-safe ring buffer of recent request profiles"""
+
+    def __init__(self, size):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def summary(self):
+        """Aggregate the buffered profiles per view name, most expensive views first"""
+        views = {}
+        for profile in self.snapshot():
+            stats = views.setdefault(profile['view'], {
+                'view': profile['view'],
+                'requests': 0,
+                'total_queries': 0,
+                'max_queries': 0,
+                'total_db_ms': 0.0,
+                'total_ms': 0.0,
+                'duplicates': Counter(),
+                'slowest': [],
+            })
+            stats['requests'] += 1
+            stats['total_queries'] += profile['query_count']
+            stats['max_queries'] = max(stats['max_queries'], profile['query_count'])
+            stats['total_db_ms'] += profile['db_ms']
+            stats['total_ms'] += profile['total_ms']
+            for duplicate in profile['duplicates']:
+                stats['duplicates'][duplicate['fingerprint']] += duplicate['count']
+            stats['slowest'].extend(profile['slowest'])
+
+        top = get_setting('TOP_QUERIES')
+        results = []
+        for stats in views.values():
+            requests = stats.pop('requests')
+            results.append({
+                'view': stats['view'],
+                'requests': requests,
+                'avg_queries': round(stats['total_queries'] / requests, 1),
+                'max_queries': stats['max_queries'],
+                'avg_db_ms': round(stats['total_db_ms'] / requests, 2),
+                'avg_total_ms': round(stats['total_ms'] / requests, 2),
+                'total_db_ms': round(stats['total_db_ms'], 2),
+                'duplicates': [
+                    {'fingerprint': fp, 'count': count}
+                    for fp, count in stats['duplicates'].most_common(top)
+                ],
+                'slowest': sorted(stats['slowest'], key=lambda query: query['ms'], reverse=True)[:top],
+            })
+        return sorted(results, key=lambda view: view['total_db_ms'], reverse=True)
+
+
+profile_buffer = ProfileBuffer(get_setting('BUFFER_SIZE'))
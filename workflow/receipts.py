@@ -0,0 +1,122 @@
+import zlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Announcement, AnnouncementReadState, Enrollment, RosterSlot, User
+
+
+class Bitmap:
+    """Set of small non-negative integers stored as a zlib-compressed bit string"""
+
+    def __init__(self, data=b''):
+        self._bits = bytearray(zlib.decompress(data)) if data else bytearray()
+
+    def encode(self):
+        # Level 1: runs of unread students compress well and it keeps updates cheap
+        return zlib.compress(bytes(self._bits.rstrip(b'\x00')), 1) if any(self._bits) else b''
+
+    def __contains__(self, index):
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (index & 7)))
+
+    def add(self, index):
+        """Set a bit, returning False when it was already set"""
+        if index in self:
+            return False
+        byte = index >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(b'\x00' * (byte + 1 - len(self._bits)))
+        self._bits[byte] |= 1 << (index & 7)
+        return True
+
+    def __iter__(self):
+        for byte, value in enumerate(self._bits):
+            while value:
+                low = value & -value
+                yield (byte << 3) + low.bit_length() - 1
+                value ^= low
+
+    def __len__(self):
+        return sum(bin(value).count('1') for value in self._bits)
+
+
+# Roster slots
+
+def slot_index(user, course_id):
+    """The user's bit position in the course's read bitmaps, allocated on first use"""
+    index = RosterSlot.objects.filter(course_id=course_id, user=user).values_list('index', flat=True).first()
+    if index is not None:
+        return index
+    for _ in range(5):
+        top = RosterSlot.objects.filter(course_id=course_id).aggregate(top=Max('index'))['top']
+        next_index = 0 if top is None else top + 1
+        try:
+            with transaction.atomic():
+                return RosterSlot.objects.create(course_id=course_id, user=user, index=next_index).index
+        except IntegrityError:
+            # Another request took this index (or created the user's slot) first
+            index = RosterSlot.objects.filter(course_id=course_id, user=user).values_list('index', flat=True).first()
+            if index is not None:
+                return index
+    raise IntegrityError(f"Could not allocate a roster slot in course {course_id}")
+
+
+def slot_indexes(user):
+    """{course_id: index} of every roster slot of a user"""
+    return dict(RosterSlot.objects.filter(user=user).values_list('course_id', 'index'))
+
+
+# Read tracking
+
+def _set_read(state, index):
+    bitmap = Bitmap(bytes(state.bitmap))
+    if not bitmap.add(index):
+        return False
+    state.bitmap = bitmap.encode()
+    state.read_count += 1
+    return True
+
+
+def mark_read(announcement, user):
+    """Record that ``user`` read the announcement; returns False if it was already read"""
+    index = slot_index(user, announcement.course_id)
+    with transaction.atomic():
+        state, _ = AnnouncementReadState.objects.select_for_update().get_or_create(announcement=announcement)
+        if not _set_read(state, index):
+            return False
+        state.save(update_fields=['bitmap', 'read_count', 'updated_at'])
+    return True
+
+
+def mark_all_read(user, course):
+    """Mark every announcement of a course as read by ``user``; returns how many were newly read"""
+    index = slot_index(user, course.pk)
+    announcement_ids = list(Announcement.objects.filter(course=course).values_list('pk', flat=True))
+    with transaction.atomic():
+        AnnouncementReadState.objects.bulk_create(
+            [AnnouncementReadState(announcement_id=pk) for pk in announcement_ids], ignore_conflicts=True,
+        )
+        states = AnnouncementReadState.objects.select_for_update().filter(announcement_id__in=announcement_ids)
+        changed = [state for state in states if _set_read(state, index)]
+        # bulk_update skips auto_now, and updated_at feeds the announcement ETags
+        now = timezone.now()
+        for state in changed:
+            state.updated_at = now
+        AnnouncementReadState.objects.bulk_update(changed, ['bitmap', 'read_count', 'updated_at'], batch_size=500)
+    return len(changed)
+
+
+def readers(announcement):
+    """Enrolled students who have read the announcement, decoded from its bitmap"""
+    state = AnnouncementReadState.objects.filter(announcement=announcement).first()
+    indexes = list(Bitmap(bytes(state.bitmap))) if state else []
+    return User.objects.filter(
+        roster_slots__course_id=announcement.course_id, roster_slots__index__in=indexes,
+        enrollments__course_id=announcement.course_id, enrollments__status=Enrollment.Status.ACTIVE,
+    ).order_by('last_name', 'first_name', 'username')
+
+
+def is_read(state, index):
+    return state is not None and index is not None and index in Bitmap(bytes(state.bitmap))
@@ -0,0 +1,168 @@
+import time
+from collections import namedtuple
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import CalendarEvent, Enrollment, KanbanCard, ReminderLog, Submission
+
+DEFAULT_BATCH_SIZE = 100
+
+Reminder = namedtuple('Reminder', 'kind object_id title due_at course_code recipient_id email first_name username')
+
+# Submissions in these states need no reminder
+DONE_STATUSES = [Submission.Status.SUBMITTED, Submission.Status.GRADED, Submission.Status.RETURNED]
+
+SUBJECTS = {
+    ReminderLog.Kind.ASSIGNMENT: 'Assignment due: {title}',
+    ReminderLog.Kind.EXAM: 'Upcoming exam: {title}',
+    ReminderLog.Kind.CARD: 'Task due: {title}',
+}
+
+
+class DeliveryResult:
+    """Counts and throughput of a reminder run"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+
+# Collecting reminders
+
+def _pending(kind, rows, object_field, title_field, due_field, course_field, user_field):
+    """
+    Annotate recipient rows with the deadline they are reminded of and drop
+    those already reminded, as a single query.
+    """
+    already_sent = ReminderLog.objects.filter(
+        kind=kind, object_id=OuterRef('reminder_object_id'),
+        recipient_id=OuterRef(f'{user_field}_id'), due_at=OuterRef('reminder_due_at'),
+    )
+    return (
+        rows.filter(**{f'{user_field}__is_active': True})
+        .annotate(
+            reminder_object_id=F(object_field),
+            reminder_title=F(title_field),
+            reminder_due_at=F(due_field),
+            reminder_course=F(course_field),
+        )
+        .exclude(Exists(already_sent))
+    ), [
+        'reminder_object_id', 'reminder_title', 'reminder_due_at', 'reminder_course',
+        f'{user_field}_id', f'{user_field}__email', f'{user_field}__first_name', f'{user_field}__username',
+    ]
+
+
+def assignment_reminders(start, end):
+    """Enrolled students with an assignment due in [start, end) that they have not submitted"""
+    rows, fields = _pending(
+        ReminderLog.Kind.ASSIGNMENT,
+        Enrollment.objects.active().filter(course__assignments__due_date__gte=start, course__assignments__due_date__lt=end),
+        'course__assignments__id', 'course__assignments__title', 'course__assignments__due_date',
+        'course__code', 'user',
+    )
+    submitted = Submission.objects.filter(
+        assignment_id=OuterRef('reminder_object_id'), student_id=OuterRef('user_id'), status__in=DONE_STATUSES,
+    )
+    rows = rows.exclude(Exists(submitted))
+    for row in rows.values_list(*fields).iterator(chunk_size=2000):
+        yield Reminder(ReminderLog.Kind.ASSIGNMENT, *row)
+
+
+def exam_reminders(start, end):
+    """Enrolled students with an exam of their course starting in [start, end)"""
+    rows, fields = _pending(
+        ReminderLog.Kind.EXAM,
+        Enrollment.objects.active().filter(
+            course__events__event_type=CalendarEvent.EventType.EXAM,
+            course__events__start_date__gte=start, course__events__start_date__lt=end,
+        ),
+        'course__events__id', 'course__events__title', 'course__events__start_date', 'course__code', 'user',
+    )
+    for row in rows.values_list(*fields).iterator(chunk_size=2000):
+        yield Reminder(ReminderLog.Kind.EXAM, *row)
+
+
+def card_reminders(start, end):
+    """Assignees of Kanban cards due in [start, end)"""
+    Assignee = KanbanCard.assignees.through
+    rows, fields = _pending(
+        ReminderLog.Kind.CARD,
+        Assignee.objects.filter(kanbancard__due_date__gte=start, kanbancard__due_date__lt=end),
+        'kanbancard__id', 'kanbancard__title', 'kanbancard__due_date',
+        'kanbancard__column__board__course__code', 'user',
+    )
+    for row in rows.values_list(*fields).iterator(chunk_size=2000):
+        yield Reminder(ReminderLog.Kind.CARD, *row)
+
+
+def upcoming_reminders(hours=24, now=None):
+    """Every reminder that is due for deadlines in the next ``hours``, without duplicates"""
+    start = now or timezone.now()
+    end = start + timedelta(hours=hours)
+    seen = set()
+    for source in (assignment_reminders, exam_reminders, card_reminders):
+        for reminder in source(start, end):
+            key = (reminder.kind, reminder.object_id, reminder.recipient_id, reminder.due_at)
+            if key not in seen and reminder.email:
+                seen.add(key)
+                yield reminder
+
+
+# Delivery
+
+def build_message(reminder, connection=None):
+    due = timezone.localtime(reminder.due_at).strftime('%Y-%m-%d %H:%M')
+    course = f" ({reminder.course_code})" if reminder.course_code else ''
+    body = (
+        f"Hi {reminder.first_name or reminder.username},\n\n"
+        f"This is a reminder that \"{reminder.title}\"{course} is due on {due}.\n"
+    )
+    return EmailMessage(
+        subject=SUBJECTS[reminder.kind].format(title=reminder.title),
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[reminder.email],
+        connection=connection,
+    )
+
+
+def deliver(reminders, batch_size=DEFAULT_BATCH_SIZE, backend=None):
+    """
+    Send reminders over one reused email connection and log the delivered
+    ones, one bulk insert per batch, so a rerun never sends the same reminder
+    twice. Messages are sent one at a time so that only the reminders that
+    actually went out are logged; failed ones are retried by the next run.
+    """
+    result = DeliveryResult()
+    started = time.perf_counter()
+    reminders = iter(reminders)
+    # fail_silently: a rejected address is counted as failed instead of aborting the run
+    with get_connection(backend, fail_silently=True) as connection:
+        while True:
+            batch = list(islice(reminders, batch_size))
+            if not batch:
+                break
+            delivered = [
+                reminder for reminder in batch
+                if connection.send_messages([build_message(reminder, connection)])
+            ]
+            result.sent += len(delivered)
+            result.failed += len(batch) - len(delivered)
+            ReminderLog.objects.bulk_create([
+                ReminderLog(kind=reminder.kind, object_id=reminder.object_id,
+                            recipient_id=reminder.recipient_id, due_at=reminder.due_at)
+                for reminder in delivered
+            ], ignore_conflicts=True)
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,302 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import metrics
+
+CACHE_PREFIX = 'workflow_schedule'
+# Schedules are invalidated explicitly when steps change, the timeout only bounds staleness
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Sent with ``instance``, ``previous_step_id`` and ``step_id`` (None once completed)
+# whenever a workflow instance moves to another step
+step_changed = Signal()
+
+
+class ScheduledStep:
+    """A workflow step with its offsets, in days, from the instance start date"""
+    __slots__ = ('id', 'name', 'order', 'duration_days', 'start_offset', 'end_offset')
+
+    def __init__(self, id, name, order, duration_days, start_offset):
+        self.id = id
+        self.name = name
+        self.order = order
+        self.duration_days = duration_days
+        self.start_offset = start_offset
+        self.end_offset = start_offset + duration_days
+
+    def __getstate__(self):
+        return (self.id, self.name, self.order, self.duration_days, self.start_offset)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def start_date(self, start_date):
+        return start_date + timedelta(days=self.start_offset)
+
+    def end_date(self, start_date):
+        return start_date + timedelta(days=self.end_offset)
+
+
+class CompiledSchedule:
+    """
+    The ordered steps of a workflow template with cumulative offsets, so
+    deadlines and the step due on a given day need no step queries.
+    """
+
+    def __init__(self, template_id, steps):
+        self.template_id = template_id
+        self.steps = tuple(steps)
+        self._positions = {step.id: position for position, step in enumerate(self.steps)}
+        self._end_offsets = [step.end_offset for step in self.steps]
+
+    def __getstate__(self):
+        return (self.template_id, self.steps)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def total_days(self):
+        return self._end_offsets[-1] if self.steps else 0
+
+    def first(self):
+        return self.steps[0] if self.steps else None
+
+    def get(self, step_id):
+        position = self._positions.get(step_id)
+        return None if position is None else self.steps[position]
+
+    def next(self, step_id):
+        """The step after ``step_id``, or None when it is the last one"""
+        position = self._positions.get(step_id)
+        if position is None or position + 1 >= len(self.steps):
+            return None
+        return self.steps[position + 1]
+
+    def step_at(self, days):
+        """The step running ``days`` after the start date, or None outside the schedule"""
+        if days < 0:
+            return None
+        position = bisect_right(self._end_offsets, days)
+        return self.steps[position] if position < len(self.steps) else None
+
+
+def _cache_key(template_id):
+    return f'{CACHE_PREFIX}:{template_id}'
+
+
+def _compile(template_id, rows):
+    steps = []
+    offset = 0
+    for pk, name, order, duration_days in rows:
+        step = ScheduledStep(pk, name, order, duration_days, offset)
+        steps.append(step)
+        offset = step.end_offset
+    return CompiledSchedule(template_id, steps)
+
+
+def compile_schedule(template_id):
+    """Build the schedule of a template from its steps with a single query"""
+    from .models import WorkflowStep
+
+    rows = WorkflowStep.objects.filter(template_id=template_id).order_by('order', 'pk').values_list(
+        'pk', 'name', 'order', 'duration_days'
+    )
+    return _compile(template_id, rows)
+
+
+def compile_schedules(template_ids):
+    """Build the schedules of several templates with a single query"""
+    from .models import WorkflowStep
+
+    rows = {template_id: [] for template_id in template_ids}
+    for template_id, *step in WorkflowStep.objects.filter(template_id__in=rows).order_by(
+        'template_id', 'order', 'pk'
+    ).values_list('template_id', 'pk', 'name', 'order', 'duration_days'):
+        rows[template_id].append(step)
+    return {template_id: _compile(template_id, steps) for template_id, steps in rows.items()}
+
+
+def get_schedule(template_id):
+    """Return the cached compiled schedule of a template, compiling it on a miss"""
+    key = _cache_key(template_id)
+    schedule = cache.get(key)
+    metrics.record_cache_lookup(CACHE_PREFIX, schedule is not None)
+    if schedule is None:
+        schedule = compile_schedule(template_id)
+        cache.set(key, schedule, CACHE_TIMEOUT)
+    return schedule
+
+
+def get_schedules(template_ids):
+    """Return compiled schedules for several templates with one cache round trip"""
+    template_ids = set(template_ids)
+    found = cache.get_many([_cache_key(pk) for pk in template_ids])
+    schedules = {}
+    missing = []
+    for template_id in template_ids:
+        schedule = found.get(_cache_key(template_id))
+        metrics.record_cache_lookup(CACHE_PREFIX, schedule is not None)
+        if schedule is None:
+            missing.append(template_id)
+        else:
+            schedules[template_id] = schedule
+    if missing:
+        compiled = compile_schedules(missing)
+        cache.set_many({_cache_key(pk): schedule for pk, schedule in compiled.items()}, CACHE_TIMEOUT)
+        schedules.update(compiled)
+    return schedules
+
+
+def invalidate_schedule(template_id):
+    cache.delete(_cache_key(template_id))
+
+
+def refresh_due_dates(template_id, batch_size=500):
+    """Recompute ``current_step_due`` of a template's active instances after its steps change"""
+    from .models import WorkflowInstance
+
+    schedule = get_schedule(template_id)
+    instances = WorkflowInstance.objects.filter(
+        template_id=template_id, current_step__isnull=False
+    ).only('pk', 'start_date', 'current_step_id', 'current_step_due')
+    changed = []
+    for instance in instances.iterator(chunk_size=batch_size):
+        step = schedule.get(instance.current_step_id)
+        due = step.end_date(instance.start_date) if step else None
+        if due != instance.current_step_due:
+            instance.current_step_due = due
+            changed.append(instance)
+    WorkflowInstance.objects.bulk_update(changed, ['current_step_due'], batch_size=batch_size)
+    return len(changed)
+
+
+def advance_due_instances(today=None, chunk_size=500):
+    """
+    Move every instance whose current step has ended to the step scheduled for
+    ``today``, completing those past their last step. Instances are claimed in
+    chunks with ``SKIP LOCKED`` so several schedulers can run concurrently.
+    Returns the number of instances advanced and completed.
+    """
+    from .models import WorkflowInstance
+
+    today = today or timezone.localdate()
+    advanced = completed = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                WorkflowInstance.objects.select_for_update(skip_locked=True)
+                .filter(current_step_due__lte=today)
+                .order_by('current_step_due', 'pk')
+                .only('pk', 'template_id', 'start_date', 'current_step_id', 'current_step_due')[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            schedules = get_schedules(instance.template_id for instance in chunk)
+            now = timezone.now()
+            changes = []
+            for instance in chunk:
+                step = schedules[instance.template_id].step_at((today - instance.start_date).days)
+                changes.append((instance, instance.current_step_id))
+                instance.current_step_id = step.id if step else None
+                instance.current_step_due = step.end_date(instance.start_date) if step else None
+                instance.updated_at = now
+            WorkflowInstance.objects.bulk_update(
+                chunk, ['current_step', 'current_step_due', 'updated_at'], batch_size=chunk_size
+            )
+
+        # Receivers run once the chunk is committed and its row locks are released
+        for instance, previous_step_id in changes:
+            if instance.current_step_id is None:
+                completed += 1
+            else:
+                advanced += 1
+            metrics.WORKFLOW_STEP_CHANGES.inc(result='advanced' if instance.current_step_id else 'completed')
+            step_changed.send(sender=WorkflowInstance, instance=instance,
+                              previous_step_id=previous_step_id, step_id=instance.current_step_id)
+    return advanced, completed
+
+
+# Bulk instantiation
+
+class ApplyResult:
+    """Summary of applying a workflow template to many courses"""
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.skipped = 0
+        self.instances = []
+        self.errors = []
+
+    def add_error(self, course, message):
+        self.errors.append({'course': course, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'skipped': self.skipped,
+            'failed': len(self.errors),
+            'instances': self.instances,
+            'errors': self.errors,
+        }
+
+
+def apply_template(template_id, course_ids, start_date, courses=None, skip_existing=True, batch_size=500):
+    """
+    Start the template on each of ``course_ids`` in one transaction. Instances
+    are created with bulk_create already on the first step, taken from the
+    compiled schedule, instead of save() and advance_step() per course.
+    Courses outside ``courses`` (default: all) are reported as not found and,
+    unless ``skip_existing`` is False, courses already running the template
+    are skipped. Raises InvalidWorkflowStateException when the template has
+    no steps.
+    """
+    from .models import Course, WorkflowInstance, InvalidWorkflowStateException
+
+    first_step = get_schedule(template_id).first()
+    if first_step is None:
+        raise InvalidWorkflowStateException("No steps defined in this workflow")
+
+    result = ApplyResult()
+    course_ids = list(dict.fromkeys(course_ids))
+    result.processed = len(course_ids)
+    courses = Course.objects.all() if courses is None else courses
+    with transaction.atomic():
+        found = set(courses.filter(pk__in=course_ids).values_list('pk', flat=True))
+        running = set()
+        if skip_existing:
+            running = set(WorkflowInstance.objects.filter(template_id=template_id, course_id__in=found)
+                          .values_list('course_id', flat=True))
+        instances = []
+        for course_id in course_ids:
+            if course_id not in found:
+                result.add_error(course_id, "Course not found")
+            elif course_id in running:
+                result.skipped += 1
+            else:
+                instances.append(WorkflowInstance(
+                    template_id=template_id, course_id=course_id, start_date=start_date,
+                    current_step_id=first_step.id, current_step_due=first_step.end_date(start_date),
+                ))
+        WorkflowInstance.objects.bulk_create(instances, batch_size=batch_size)
+
+    result.created = len(instances)
+    result.instances = [str(instance.pk) for instance in instances]
+    metrics.WORKFLOW_TEMPLATE_APPLICATIONS.inc(result.created, result='created')
+    metrics.WORKFLOW_TEMPLATE_APPLICATIONS.inc(result.skipped, result='skipped')
+    metrics.WORKFLOW_TEMPLATE_APPLICATIONS.inc(len(result.errors), result='failed')
+    # Same notification advance_step() sends when an instance starts
+    for instance in instances:
+        step_changed.send(sender=WorkflowInstance, instance=instance, previous_step_id=None, step_id=first_step.id)
+    return result
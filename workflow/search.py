@@ -0,0 +1,302 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Q, UUIDField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Replace
+from django.utils.html import escape
+from rest_framework import filters
+
+from .models import Course, SearchEntry, Announcement, KanbanCard, KanbanColumn
+
+FTS_TABLE = 'workflow_searchentry_fts'
+
+# Highlight markers are control characters so user content can be escaped safely
+# before they are turned into <mark> tags
+_START, _STOP = '\x02', '\x03'
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+KIND_ALIASES = {
+    'announcement': SearchEntry.Kind.ANNOUNCEMENT,
+    'course': SearchEntry.Kind.COURSE,
+    'card': SearchEntry.Kind.CARD,
+}
+
+
+# Index maintenance
+
+def document_for(instance):
+    """Return the SearchEntry field values for an indexed model instance"""
+    if isinstance(instance, Announcement):
+        return SearchEntry.Kind.ANNOUNCEMENT, {
+            'course_id': instance.course_id,
+            'owner_id': instance.author_id,
+            'title': instance.title,
+            'body': instance.content,
+        }
+    if isinstance(instance, Course):
+        return SearchEntry.Kind.COURSE, {
+            'course_id': instance.pk,
+            'owner_id': instance.teacher_id,
+            'title': f"{instance.code} {instance.name}",
+            'body': instance.description,
+        }
+    if isinstance(instance, KanbanCard):
+        board = KanbanColumn.objects.select_related('board').get(pk=instance.column_id).board
+        return SearchEntry.Kind.CARD, {
+            'course_id': board.course_id,
+            'owner_id': board.owner_id,
+            'title': instance.title,
+            'body': instance.description,
+        }
+    raise TypeError(f"{type(instance).__name__} is not indexed for search")
+
+
+def index_object(instance):
+    kind, values = document_for(instance)
+    SearchEntry.objects.update_or_create(kind=kind, object_id=str(instance.pk), defaults=values)
+
+
+INDEXED_MODELS = {
+    Announcement: SearchEntry.Kind.ANNOUNCEMENT,
+    Course: SearchEntry.Kind.COURSE,
+    KanbanCard: SearchEntry.Kind.CARD,
+}
+
+
+def remove_object(instance):
+    SearchEntry.objects.filter(kind=INDEXED_MODELS[type(instance)], object_id=str(instance.pk)).delete()
+
+
+def index_cards(cards, boards, batch_size=1000):
+    """
+    Index cards created with bulk_create, which skips the post_save handler.
+    ``boards`` maps each card's column_id to its board.
+    """
+    SearchEntry.objects.bulk_create([
+        SearchEntry(
+            kind=SearchEntry.Kind.CARD, object_id=str(card.pk),
+            course_id=boards[card.column_id].course_id, owner_id=boards[card.column_id].owner_id,
+            title=card.title, body=card.description,
+        )
+        for card in cards
+    ], batch_size=batch_size)
+
+
+def update_board_cards(board):
+    """Propagate a board's course and owner to the entries of its cards"""
+    card_ids = KanbanCard.objects.filter(column__board=board).values_list('pk', flat=True)
+    SearchEntry.objects.filter(
+        kind=SearchEntry.Kind.CARD, object_id__in=[str(pk) for pk in card_ids]
+    ).update(course_id=board.course_id, owner_id=board.owner_id)
+
+
+def rebuild_index(batch_size=1000):
+    """Recreate every search entry from the source tables"""
+    SearchEntry.objects.all().delete()
+    total = 0
+
+    sources = [
+        (SearchEntry.Kind.ANNOUNCEMENT, Announcement.objects.values_list(
+            'pk', 'course_id', 'author_id', 'title', 'content')),
+        (SearchEntry.Kind.COURSE, Course.objects.values_list(
+            'pk', 'pk', 'teacher_id', 'code', 'name', 'description')),
+        (SearchEntry.Kind.CARD, KanbanCard.objects.values_list(
+            'pk', 'column__board__course_id', 'column__board__owner_id', 'title', 'description')),
+    ]
+    for kind, rows in sources:
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            if kind == SearchEntry.Kind.COURSE:
+                pk, course_id, owner_id, code, name, body = row
+                title = f"{code} {name}"
+            else:
+                pk, course_id, owner_id, title, body = row
+            batch.append(SearchEntry(
+                kind=kind, object_id=str(pk), course_id=course_id,
+                owner_id=owner_id, title=title, body=body,
+            ))
+            if len(batch) >= batch_size:
+                SearchEntry.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+# Querying
+
+def _terms(query):
+    return _WORD.findall(query.lower())[:16]
+
+
+def _visibility(user):
+    """SQL condition (and params) restricting entries to what the user may see"""
+    if user.is_admin:
+        return '', []
+    if user.is_teacher:
+        courses = Course.objects.filter(teacher=user).values('pk')
+        sql, params = courses.query.sql_with_params()
+        return f'(e.owner_id = %s OR e.course_id IN ({sql}))', [user.pk, *params]
+    courses = user.get_enrolled_courses().values('pk')
+    sql, params = courses.query.sql_with_params()
+    return f'e.course_id IN ({sql})', list(params)
+
+
+def _highlight(text):
+    return escape(text or '').replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _sqlite_search(terms, conditions, params, limit, offset):
+    # Every term is a quoted prefix match, so user input can't inject FTS syntax
+    match = ' '.join(f'"{term}"*' for term in terms)
+    where = ' AND '.join([f'{FTS_TABLE} MATCH %s', *conditions])
+    sql = f"""
+        SELECT e.kind, e.object_id, e.course_id,
+               highlight({FTS_TABLE}, 0, %s, %s),
+               snippet({FTS_TABLE}, 1, %s, %s, '...', 24),
+               -bm25({FTS_TABLE}, 10.0, 1.0) AS score
+        FROM {FTS_TABLE}
+        JOIN workflow_searchentry e ON e.id = {FTS_TABLE}.rowid
+        WHERE {where}
+        ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+        LIMIT %s OFFSET %s
+    """
+    return sql, [_START, _STOP, _START, _STOP, match, *params, limit, offset]
+
+
+def _postgres_search(terms, conditions, params, limit, offset):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    where = ' AND '.join(['e.search_vector @@ q', *conditions])
+    options = f'StartSel={_START}, StopSel={_STOP}, MaxFragments=1, MaxWords=24, MinWords=8'
+    sql = f"""
+        SELECT e.kind, e.object_id, e.course_id,
+               ts_headline('english', e.title, q, %s),
+               ts_headline('english', e.body, q, %s),
+               ts_rank(e.search_vector, q) AS score
+        FROM workflow_searchentry e, to_tsquery('english', %s) q
+        WHERE {where}
+        ORDER BY score DESC
+        LIMIT %s OFFSET %s
+    """
+    return sql, [options + ', HighlightAll=true', options, tsquery, *params, limit, offset]
+
+
+def search(user, query, kinds=None, limit=20, offset=0):
+    """
+    Ranked full-text search over the entries visible to ``user``.
+    Returns dicts with the kind, object id, course, highlighted title and snippet.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    conditions, params = [], []
+    visibility, visibility_params = _visibility(user)
+    if visibility:
+        conditions.append(visibility)
+        params.extend(visibility_params)
+    if kinds:
+        conditions.append(f"e.kind IN ({', '.join(['%s'] * len(kinds))})")
+        params.extend(kinds)
+
+    if connection.vendor == 'sqlite':
+        sql, params = _sqlite_search(terms, conditions, params, limit, offset)
+    elif connection.vendor == 'postgresql':
+        sql, params = _postgres_search(terms, conditions, params, limit, offset)
+    else:
+        return _fallback_search(user, terms, kinds, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            'type': kind.lower(),
+            'id': object_id,
+            'course': course_id,
+            'title': _highlight(title),
+            'snippet': _highlight(snippet),
+            'score': round(score, 4),
+        }
+        for kind, object_id, course_id, title, snippet, score in rows
+    ]
+
+
+def _fallback_search(user, terms, kinds, limit, offset):
+    """Unindexed substring search for database backends without full-text support"""
+    entries = SearchEntry.objects.all()
+    if user.is_teacher:
+        entries = entries.filter(Q(owner=user) | Q(course__in=Course.objects.filter(teacher=user)))
+    elif not user.is_admin:
+        entries = entries.filter(course__in=user.get_enrolled_courses())
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    entries = _filter_terms(entries, terms)
+    return [
+        {
+            'type': entry.kind.lower(),
+            'id': entry.object_id,
+            'course': entry.course_id,
+            'title': escape(entry.title),
+            'snippet': escape(entry.body[:160]),
+            'score': 0,
+        }
+        for entry in entries.order_by('-updated_at')[offset:offset + limit]
+    ]
+
+
+def _filter_terms(entries, terms):
+    for term in terms:
+        entries = entries.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return entries
+
+
+def matching_entries(query, kind):
+    """
+    Entries of ``kind`` matching the query, as a lazy queryset so callers can
+    use it as a subquery instead of loading every matching id
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    entries = SearchEntry.objects.filter(kind=kind)
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return entries.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return entries.filter(RawSQL("search_vector @@ to_tsquery('english', %s)", [tsquery],
+                                     output_field=BooleanField()))
+    return _filter_terms(entries, terms)
+
+
+def _object_pk(model):
+    """SearchEntry.object_id (str(pk)) converted to the database value of ``model``'s primary key"""
+    pk = model._meta.pk
+    if not isinstance(pk, UUIDField):
+        return Cast('object_id', pk)
+    if connection.vendor == 'postgresql':
+        return Cast('object_id', UUIDField())
+    # Other backends store UUIDs as 32 hex digits without dashes
+    return Replace('object_id', Value('-'), Value(''))
+
+
+def filter_matching(queryset, query, kind):
+    """``queryset`` restricted to the objects of ``kind`` matching the query, with a single subquery"""
+    entries = matching_entries(query, kind)
+    if entries is None:
+        return queryset
+    return queryset.filter(pk__in=entries.values(object_pk=_object_pk(queryset.model)))
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter answering ``?search=`` from the full-text index instead of
+    ``icontains`` scans. The view sets ``search_kind`` to a SearchEntry kind.
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return filter_matching(queryset, query, view.search_kind)
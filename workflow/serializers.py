@@ -1,14 +1,22 @@
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.utils import html
 from .models import (
-    User, Course, CalendarEvent, Announcement,
+    User, Term, Course, Enrollment, CalendarEvent, Announcement,
     KanbanBoard, KanbanColumn, KanbanCard,
     Assignment, Submission, Timeline, TimelineEvent,
     WorkflowTemplate, WorkflowStep, WorkflowInstance,
-    ReportTemplate, Report
+    ReportTemplate, Report, AnnouncementReadState, ArchivedRecord
 )
+from . import receipts
+from .enrollment import set_students
+from .mixins import DynamicFieldsMixin
+from .fastpath import Computed, full_name, related_count
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for the custom User model"""
     full_name = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
@@ -51,24 +59,123 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class CourseSerializer(serializers.ModelSerializer):
+def _active_student_ids(course):
+    # Filtered in Python so the prefetched enrollments (dropped ones included) are reused
+    return [enrollment.user_id for enrollment in course.enrollments.all()
+            if enrollment.status == Enrollment.Status.ACTIVE]
+
+
+class ActiveStudentsField(serializers.Field):
+    """
+    Ids of a course's active students. A written list replaces the active
+    roster through Enrollment rows (see enrollment.set_students), so every
+    id must belong to a student.
+    """
+    default_error_messages = {
+        'not_a_list': 'Expected a list of student ids but got "{input_type}".',
+        'invalid_id': 'Invalid student id "{value}".',
+        'not_found': 'Students not found: {ids}.',
+        'not_students': 'Users are not students: {ids}.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        super().__init__(source='*', **kwargs)
+
+    def get_value(self, dictionary):
+        # Form and multipart data repeat the key, like ListField
+        if html.is_html_input(dictionary):
+            return dictionary.getlist(self.field_name) if self.field_name in dictionary else empty
+        return dictionary.get(self.field_name, empty)
+
+    def to_representation(self, course):
+        return _active_student_ids(course)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (str, dict)) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        ids = []
+        for value in data:
+            if isinstance(value, bool) or not str(value).strip().isdigit():
+                self.fail('invalid_id', value=value)
+            ids.append(int(value))
+        roles = dict(User.objects.filter(pk__in=ids).values_list('pk', 'role'))
+        missing = sorted(set(ids) - set(roles))
+        if missing:
+            self.fail('not_found', ids=', '.join(map(str, missing)))
+        not_students = sorted(pk for pk, role in roles.items() if role != User.Role.STUDENT)
+        if not_students:
+            self.fail('not_students', ids=', '.join(map(str, not_students)))
+        return {'students': list(dict.fromkeys(ids))}
+
+
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Course model"""
     teacher_name = serializers.SerializerMethodField()
+    students = ActiveStudentsField()
     student_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Course
         fields = ['id', 'name', 'code', 'description', 'teacher', 'teacher_name', 
-                 'students', 'student_count', 'created_at', 'updated_at']
+                 'students', 'student_count', 'term', 'created_at', 'updated_at']
+        expandable_fields = {'teacher': 'UserSerializer', 'term': 'TermSerializer'}
+        field_relations = {'teacher_name': ['teacher'], 'students': ['enrollments'], 'student_count': ['enrollments']}
+        # SQL for the method fields, used by list routes built from .values() rows (see workflow.fastpath)
+        values_fields = {
+            'teacher_name': full_name('teacher'),
+            'student_count': related_count(Enrollment, 'course_id', status=Enrollment.Status.ACTIVE),
+        }
+        # Plain inputs in the browsable API; a select would list every user
+        extra_kwargs = {
+            'teacher': {'style': {'base_template': 'input.html'}},
+        }
     
     def get_teacher_name(self, obj):
         return obj.teacher.get_full_name() if obj.teacher else None
     
     def get_student_count(self, obj):
-        return obj.students.count()
+        return len(_active_student_ids(obj))
+    
+    def create(self, validated_data):
+        students = validated_data.pop('students', None)
+        course = super().create(validated_data)
+        if students is not None:
+            set_students(course, students)
+        return course
+    
+    def update(self, instance, validated_data):
+        students = validated_data.pop('students', None)
+        course = super().update(instance, validated_data)
+        if students is not None:
+            set_students(course, students)
+        return course
 
 
-class CalendarEventSerializer(serializers.ModelSerializer):
+class TermSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Term model"""
+    
+    class Meta:
+        model = Term
+        fields = ['id', 'name', 'code', 'start_date', 'end_date', 'archived_at']
+
+
+class EnrollmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Enrollment model"""
+    user_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Enrollment
+        fields = ['id', 'course', 'user', 'user_name', 'status', 'section', 'enrolled_at', 'updated_at']
+        expandable_fields = {'user': 'UserSerializer', 'course': 'CourseSerializer'}
+        field_relations = {'user_name': ['user']}
+        values_fields = {'user_name': full_name('user')}
+    
+    def get_user_name(self, obj):
+        return obj.user.get_full_name() if obj.user else None
+
+
+class CalendarEventSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for CalendarEvent model"""
     created_by_name = serializers.SerializerMethodField()
     course_name = serializers.SerializerMethodField()
@@ -79,6 +186,9 @@ class CalendarEventSerializer(serializers.ModelSerializer):
                  'course', 'course_name', 'created_by', 'created_by_name',
                  'event_type', 'is_recurring', 'recurrence_pattern', 
                  'created_at', 'updated_at']
+        expandable_fields = {'course': 'CourseSerializer', 'created_by': 'UserSerializer'}
+        field_relations = {'created_by_name': ['created_by'], 'course_name': ['course']}
+        values_fields = {'created_by_name': full_name('created_by'), 'course_name': F('course__name')}
     
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
@@ -87,26 +197,82 @@ class CalendarEventSerializer(serializers.ModelSerializer):
         return obj.course.name if obj.course else None
 
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Announcement model"""
     author_name = serializers.SerializerMethodField()
     course_name = serializers.SerializerMethodField()
+    read_count = serializers.SerializerMethodField()
+    read_percent = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = Announcement
         fields = ['id', 'title', 'content', 'course', 'course_name', 
                  'author', 'author_name', 'important', 'attachment',
+                 'read_count', 'read_percent', 'is_read',
                  'created_at', 'updated_at']
+        expandable_fields = {'course': 'CourseSerializer', 'author': 'UserSerializer'}
+        field_relations = {
+            'author_name': ['author'], 'course_name': ['course'],
+            'read_count': ['read_state'], 'read_percent': ['read_state'], 'is_read': ['read_state'],
+        }
+        values_fields = {
+            'author_name': full_name('author'),
+            'course_name': F('course__name'),
+            'read_count': Coalesce('read_state__read_count', 0),
+            'read_percent': Computed(
+                'read_percent_of', read_count=Coalesce('read_state__read_count', 0),
+                audience=related_count(Enrollment, 'course_id', 'course_id', status=Enrollment.Status.ACTIVE),
+            ),
+            'is_read': Computed('is_read_in', course_id=F('course'), bitmap=F('read_state__bitmap')),
+        }
     
     def get_author_name(self, obj):
         return obj.author.get_full_name() if obj.author else None
     
     def get_course_name(self, obj):
         return obj.course.name if obj.course else None
+    
+    def _read_state(self, obj):
+        # AnnouncementViewSet select_related()s the state, so this needs no query
+        try:
+            return obj.read_state
+        except AnnouncementReadState.DoesNotExist:
+            return None
+    
+    def get_read_count(self, obj):
+        state = self._read_state(obj)
+        return state.read_count if state else 0
+    
+    def get_read_percent(self, obj):
+        audience = getattr(obj, 'audience_size', None)
+        if audience is None:
+            audience = obj.course.get_students().count()
+        return self.read_percent_of(self.get_read_count(obj), audience)
+    
+    def read_percent_of(self, read_count, audience):
+        # Students who read it and later left the course still count in read_count
+        return min(100.0, round(100 * read_count / audience, 1)) if audience else 0.0
+    
+    def _roster_slot(self, course_id):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        # Roster slots of the requesting user, loaded once per response
+        if 'roster_slots' not in self.context:
+            self.context['roster_slots'] = receipts.slot_indexes(request.user)
+        return self.context['roster_slots'].get(course_id)
+    
+    def get_is_read(self, obj):
+        return receipts.is_read(self._read_state(obj), self._roster_slot(obj.course_id))
+    
+    def is_read_in(self, course_id, bitmap):
+        index = self._roster_slot(course_id)
+        return index is not None and bitmap is not None and index in receipts.Bitmap(bytes(bitmap))
 
 
 # Kanban Serializers
-class KanbanCardSerializer(serializers.ModelSerializer):
+class KanbanCardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for KanbanCard model"""
     assignees_names = serializers.SerializerMethodField()
     
@@ -115,12 +281,16 @@ class KanbanCardSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'column', 'assignees', 
                  'assignees_names', 'due_date', 'order', 'color', 
                  'attachment', 'created_at', 'updated_at']
+        expandable_fields = {'assignees': 'UserSerializer'}
+        field_relations = {'assignees_names': ['assignees']}
+        # Pick assignees with /api/users/autocomplete/?course=<id> instead of a select of every user
+        extra_kwargs = {'assignees': {'style': {'base_template': 'input.html'}}}
         
     def get_assignees_names(self, obj):
         return [user.get_full_name() for user in obj.assignees.all()]
 
 
-class KanbanColumnSerializer(serializers.ModelSerializer):
+class KanbanColumnSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for KanbanColumn model with nested cards"""
     cards = KanbanCardSerializer(many=True, read_only=True)
     
@@ -129,7 +299,7 @@ class KanbanColumnSerializer(serializers.ModelSerializer):
         fields = ['id', 'board', 'title', 'order', 'cards']
 
 
-class KanbanBoardSerializer(serializers.ModelSerializer):
+class KanbanBoardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for KanbanBoard model with nested columns and cards"""
     columns = KanbanColumnSerializer(many=True, read_only=True)
     owner_name = serializers.SerializerMethodField()
@@ -140,6 +310,9 @@ class KanbanBoardSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'course', 'course_name',
                  'owner', 'owner_name', 'is_template', 'columns',
                  'created_at', 'updated_at']
+        expandable_fields = {'course': 'CourseSerializer', 'owner': 'UserSerializer'}
+        field_relations = {'owner_name': ['owner'], 'course_name': ['course']}
+        values_fields = {'owner_name': full_name('owner'), 'course_name': F('course__name')}
     
     def get_owner_name(self, obj):
         return obj.owner.get_full_name() if obj.owner else None
@@ -149,7 +322,7 @@ class KanbanBoardSerializer(serializers.ModelSerializer):
 
 
 # Assignment Serializers
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Submission model"""
     student_name = serializers.SerializerMethodField()
     assignment_title = serializers.SerializerMethodField()
@@ -159,6 +332,9 @@ class SubmissionSerializer(serializers.ModelSerializer):
         fields = ['id', 'assignment', 'assignment_title', 'student', 
                  'student_name', 'submitted_at', 'files', 'comments', 
                  'score', 'feedback', 'status', 'created_at', 'updated_at']
+        expandable_fields = {'assignment': 'AssignmentSerializer', 'student': 'UserSerializer'}
+        field_relations = {'student_name': ['student'], 'assignment_title': ['assignment']}
+        values_fields = {'student_name': full_name('student'), 'assignment_title': F('assignment__title')}
     
     def get_student_name(self, obj):
         return obj.student.get_full_name() if obj.student else None
@@ -167,7 +343,7 @@ class SubmissionSerializer(serializers.ModelSerializer):
         return obj.assignment.title if obj.assignment else None
 
 
-class AssignmentSerializer(serializers.ModelSerializer):
+class AssignmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Assignment model"""
     submissions = SubmissionSerializer(many=True, read_only=True)
     course_name = serializers.SerializerMethodField()
@@ -177,13 +353,16 @@ class AssignmentSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'course', 'course_name',
                  'due_date', 'max_score', 'weight', 'files', 'submissions',
                  'created_at', 'updated_at']
+        expandable_fields = {'course': 'CourseSerializer'}
+        field_relations = {'course_name': ['course']}
+        values_fields = {'course_name': F('course__name')}
     
     def get_course_name(self, obj):
         return obj.course.name if obj.course else None
 
 
 # Timeline Serializers
-class TimelineEventSerializer(serializers.ModelSerializer):
+class TimelineEventSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for TimelineEvent model"""
     class Meta:
         model = TimelineEvent
@@ -191,7 +370,7 @@ class TimelineEventSerializer(serializers.ModelSerializer):
                  'color', 'icon', 'created_at', 'updated_at']
 
 
-class TimelineSerializer(serializers.ModelSerializer):
+class TimelineSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Timeline model with nested events"""
     events = TimelineEventSerializer(many=True, read_only=True)
     course_name = serializers.SerializerMethodField()
@@ -200,20 +379,23 @@ class TimelineSerializer(serializers.ModelSerializer):
         model = Timeline
         fields = ['id', 'title', 'description', 'course', 'course_name',
                  'start_date', 'end_date', 'events', 'created_at', 'updated_at']
+        expandable_fields = {'course': 'CourseSerializer'}
+        field_relations = {'course_name': ['course']}
+        values_fields = {'course_name': F('course__name')}
     
     def get_course_name(self, obj):
         return obj.course.name if obj.course else None
 
 
 # Workflow Serializers
-class WorkflowStepSerializer(serializers.ModelSerializer):
+class WorkflowStepSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for WorkflowStep model"""
     class Meta:
         model = WorkflowStep
         fields = ['id', 'template', 'name', 'description', 'order', 'duration_days']
 
 
-class WorkflowTemplateSerializer(serializers.ModelSerializer):
+class WorkflowTemplateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for WorkflowTemplate model with nested steps"""
     steps = WorkflowStepSerializer(many=True, read_only=True)
     created_by_name = serializers.SerializerMethodField()
@@ -222,23 +404,30 @@ class WorkflowTemplateSerializer(serializers.ModelSerializer):
         model = WorkflowTemplate
         fields = ['id', 'name', 'description', 'created_by', 'created_by_name',
                  'steps', 'created_at', 'updated_at']
+        read_only_fields = ['created_by']
+        expandable_fields = {'created_by': 'UserSerializer'}
+        field_relations = {'created_by_name': ['created_by']}
+        values_fields = {'created_by_name': full_name('created_by')}
     
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
 
 
-class WorkflowInstanceSerializer(serializers.ModelSerializer):
+class WorkflowInstanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for WorkflowInstance model"""
     template_name = serializers.SerializerMethodField()
     course_name = serializers.SerializerMethodField()
     current_step_name = serializers.SerializerMethodField()
     current_end_date = serializers.SerializerMethodField()
+    scheduled_step = serializers.SerializerMethodField()
     
     class Meta:
         model = WorkflowInstance
         fields = ['id', 'template', 'template_name', 'course', 'course_name',
                  'current_step', 'current_step_name', 'start_date', 
-                 'current_end_date', 'created_at', 'updated_at']
+                 'current_end_date', 'scheduled_step', 'created_at', 'updated_at']
+        expandable_fields = {'template': 'WorkflowTemplateSerializer', 'course': 'CourseSerializer'}
+        field_relations = {'template_name': ['template'], 'course_name': ['course']}
     
     def get_template_name(self, obj):
         return obj.template.name if obj.template else None
@@ -247,14 +436,20 @@ class WorkflowInstanceSerializer(serializers.ModelSerializer):
         return obj.course.name if obj.course else None
     
     def get_current_step_name(self, obj):
-        return obj.current_step.name if obj.current_step else None
+        # Read from the cached schedule rather than loading the step row
+        step = obj.schedule.get(obj.current_step_id) if obj.current_step_id else None
+        return step.name if step else None
     
     def get_current_end_date(self, obj):
         return obj.get_current_end_date()
 
+    def get_scheduled_step(self, obj):
+        step = obj.get_scheduled_step()
+        return step.id if step else None
+
 
 # Report Serializers
-class ReportTemplateSerializer(serializers.ModelSerializer):
+class ReportTemplateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for ReportTemplate model"""
     created_by_name = serializers.SerializerMethodField()
     
@@ -262,12 +457,15 @@ class ReportTemplateSerializer(serializers.ModelSerializer):
         model = ReportTemplate
         fields = ['id', 'name', 'description', 'created_by', 'created_by_name',
                  'query', 'created_at', 'updated_at']
+        expandable_fields = {'created_by': 'UserSerializer'}
+        field_relations = {'created_by_name': ['created_by']}
+        values_fields = {'created_by_name': full_name('created_by')}
     
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Report model"""
     template_name = serializers.SerializerMethodField()
     created_by_name = serializers.SerializerMethodField()
@@ -278,6 +476,16 @@ class ReportSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'template', 'template_name', 'created_by',
                  'created_by_name', 'course', 'course_name', 'generated_at',
                  'data', 'created_at', 'updated_at']
+        expandable_fields = {
+            'template': 'ReportTemplateSerializer', 'created_by': 'UserSerializer', 'course': 'CourseSerializer',
+        }
+        field_relations = {
+            'template_name': ['template'], 'created_by_name': ['created_by'], 'course_name': ['course'],
+        }
+        values_fields = {
+            'template_name': F('template__name'), 'created_by_name': full_name('created_by'),
+            'course_name': F('course__name'),
+        }
     
     def get_template_name(self, obj):
         return obj.template.name if obj.template else None
@@ -287,3 +495,37 @@ class ReportSerializer(serializers.ModelSerializer):
     
     def get_course_name(self, obj):
         return obj.course.name if obj.course else None
+
+
+# Archive Serializers
+class ArchivedRecordSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serializer for rows moved to the term archive; ``data`` holds the archived fields"""
+    course_name = serializers.SerializerMethodField()
+    owner_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedRecord
+        fields = ['id', 'kind', 'object_id', 'term', 'course', 'course_name', 'owner', 'owner_name',
+                  'title', 'created_at', 'archived_at', 'data']
+        read_only_fields = fields
+        expandable_fields = {'term': 'TermSerializer', 'course': 'CourseSerializer', 'owner': 'UserSerializer'}
+        field_relations = {'course_name': ['course'], 'owner_name': ['owner']}
+        values_fields = {'course_name': F('course__name'), 'owner_name': full_name('owner')}
+    
+    def get_course_name(self, obj):
+        return obj.course.name if obj.course else None
+    
+    def get_owner_name(self, obj):
+        return obj.owner.get_full_name() if obj.owner else None
+
+
+# Notification Serializers
+class NotificationSerializer(DynamicFieldsMixin, serializers.Serializer):
+    """Serializer for inbox items built by workflow.notifications.inbox"""
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    course = serializers.IntegerField()
+    course_code = serializers.CharField()
+    important = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+    read = serializers.BooleanField()
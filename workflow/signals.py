@@ -0,0 +1,88 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Announcement, CalendarEvent, Course, Enrollment, KanbanBoard, KanbanCard, User, WorkflowStep,
+    WorkflowTemplate,
+)
+from . import fragments
+from . import search
+from . import notifications
+from .schedule import invalidate_schedule, refresh_due_dates
+
+
+# Notify students of new announcements
+@receiver(post_save, sender=Announcement)
+def publish_announcement(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        notifications.publish(instance)
+
+
+# Keep the full-text search index up to date
+@receiver(post_save, sender=Announcement)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=KanbanCard)
+def index_search_entry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_object(instance)
+
+
+@receiver(post_delete, sender=Announcement)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=KanbanCard)
+def remove_search_entry(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=KanbanBoard)
+def update_card_search_entries(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        search.update_board_cards(instance)
+
+
+# Drop compiled workflow schedules when their steps change
+@receiver(post_save, sender=WorkflowStep)
+@receiver(post_delete, sender=WorkflowStep)
+def invalidate_workflow_schedule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_schedule(instance.template_id)
+    refresh_due_dates(instance.template_id)
+    # Steps have no timestamp of their own; the template's feeds its ETag
+    WorkflowTemplate.objects.filter(pk=instance.template_id).update(updated_at=timezone.now())
+
+
+# Re-render cached page fragments showing changed rows
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.COURSE, [instance.pk])
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def bump_parent_course_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.COURSE, [instance.course_id])
+
+
+@receiver(post_save, sender=KanbanBoard)
+@receiver(post_delete, sender=KanbanBoard)
+def bump_board_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.BOARD, [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def bump_user_fragments(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no fragment shows
+    if created or raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    # Names and departments are shown on the courses a user teaches or posted to, and on their boards
+    course_ids = set(instance.taught_courses.values_list('pk', flat=True))
+    course_ids.update(Announcement.objects.filter(author=instance).values_list('course_id', flat=True).distinct())
+    fragments.bump(fragments.COURSE, course_ids)
+    fragments.bump(fragments.BOARD, instance.boards.values_list('pk', flat=True))
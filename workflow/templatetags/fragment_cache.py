@@ -0,0 +1,43 @@
+from django import template
+
+from workflow import fragments
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, fragment_version):
+        self.nodelist = nodelist
+        self.name = name
+        self.fragment_version = fragment_version
+
+    def render(self, context):
+        fragment_version = self.fragment_version.resolve(context)
+        # No version (e.g. a view that does not compute one) means no caching
+        if not fragment_version:
+            return self.nodelist.render(context)
+        return fragments.render(self.name, fragment_version, lambda: self.nodelist.render(context))
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    """
+    Cache the enclosed template fragment under a version computed by the view
+    with workflow.fragments.version()::
+
+        {% load fragment_cache %}
+        {% cachefragment 'course_list' fragment_version %}
+            .. expensive rendering ..
+        {% endcachefragment %}
+
+    Querysets used only inside the fragment are never evaluated on a hit.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and a version")
+    name = bits[1]
+    if not (name[0] == name[-1] and name[0] in ('"', "'")):
+        raise template.TemplateSyntaxError(f"'{bits[0]}' fragment name must be a quoted string")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return FragmentCacheNode(nodelist, name[1:-1], parser.compile_filter(bits[2]))
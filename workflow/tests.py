@@ -1,3 +1,717 @@
-from django.test import TestCase
+import gzip
+import io
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.checks import Error
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .autocomplete import search_users
+from .boards import clone_board
+from .checks import check_shared_caches
+from .compression import compress
+from .enrollment import enroll_rows, enroll_students
+from .management.commands.run_benchmarks import Command as BenchmarkCommand
+from .models import (
+    User, Term, Course, Enrollment, Announcement, AnnouncementReadState, ArchivedRecord, CalendarEvent,
+    KanbanBoard, KanbanColumn, KanbanCard, Notification, ReminderLog,
+    WorkflowTemplate, WorkflowStep, WorkflowInstance, InvalidWorkflowStateException,
+)
+from .reminders import Reminder, deliver
+from .schedule import advance_due_instances, apply_template
+from .serializers import AnnouncementSerializer, CalendarEventSerializer, EnrollmentSerializer
+from . import archive, fastpath, gantt, ical, notifications, receipts
+
+
+def make_user(username, role=User.Role.STUDENT, email=None):
+    # No password: tests log in with force_login, and hashing would dominate the run time
+    return User.objects.create(
+        username=username, email=email if email is not None else f'{username}@example.edu', role=role,
+    )
+
+
+class EnrollmentTests(TestCase):
+    """Bulk enrollment (workflow/enrollment.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+        cls.other_course = Course.objects.create(name='Geometry', code='GEO1', teacher=cls.teacher)
+        cls.student = make_user('student')
+
+    def active_ids(self, course):
+        return set(Enrollment.objects.active().filter(course=course).values_list('user_id', flat=True))
+
+    def test_enrolls_by_id_username_and_email(self):
+        by_id, by_email = make_user('by_id'), make_user('by_email')
+        result = enroll_students(self.course, [str(by_id.pk), 'student', 'BY_EMAIL@example.edu'])
+        self.assertEqual(result.enrolled, 3)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(self.active_ids(self.course), {by_id.pk, self.student.pk, by_email.pk})
+
+    def test_emails_match_regardless_of_stored_case(self):
+        stored = make_user('alice', email='Alice@Uni.edu')
+        result = enroll_students(self.course, ['alice@uni.edu'])
+        self.assertEqual((result.enrolled, result.errors), (1, []))
+        self.assertEqual(self.active_ids(self.course), {stored.pk})
+
+    def test_blank_student_cell_is_not_found(self):
+        # A user without an email must not be matched by an empty cell
+        no_email = make_user('noemail_stu', email='')
+        result = enroll_rows([(1, 'ALG1', 'noemail_stu'), (2, 'GEO1', '')])
+        self.assertEqual(result.enrolled, 1)
+        self.assertEqual(result.errors, [{'row': 2, 'value': '', 'error': 'Student not found'}])
+        self.assertEqual(self.active_ids(self.course), {no_email.pk})
+        self.assertEqual(self.active_ids(self.other_course), set())
+
+    def test_all_digit_values_are_ids(self):
+        # A username that looks like another user's id resolves as that id only
+        make_user(str(self.student.pk))
+        result = enroll_students(self.course, [str(self.student.pk)])
+        self.assertEqual(result.enrolled, 1)
+        self.assertEqual(self.active_ids(self.course), {self.student.pk})
+
+    def test_rejects_non_students_and_unknown_courses(self):
+        result = enroll_rows([(1, 'ALG1', 'teacher'), (2, 'NOPE', 'student')])
+        self.assertEqual(result.enrolled, 0)
+        self.assertEqual([error['error'] for error in result.errors],
+                         ['User is not a student', "Course 'NOPE' not found"])
+
+    def test_reactivates_dropped_enrollments(self):
+        enroll_students(self.course, ['student'])
+        self.course.drop_students([self.student.pk])
+        result = enroll_students(self.course, ['student'])
+        self.assertEqual((result.enrolled, result.already_enrolled), (1, 0))
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 1)
+        self.assertEqual(self.active_ids(self.course), {self.student.pk})
+
+
+class BenchmarkBudgetTests(TestCase):
+    """run_benchmarks budget checks"""
+
+    def test_non_2xx_responses_violate_the_budget(self):
+        result = {'name': 'api:course-detail', 'role': 'STUDENT', 'status': 403, 'queries': 3,
+                  'bytes': 60, 'p50_ms': 1.0, 'p95_ms': 1.0}
+        self.assertEqual(BenchmarkCommand().check_budget({}, result), ['HTTP 403'])
+        self.assertEqual(BenchmarkCommand().check_budget({}, {**result, 'status': 200}), [])
+
+
+class MetricsAccessTests(TestCase):
+    """/metrics/ access control"""
+
+    def test_local_requests_need_a_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    @override_settings(WORKFLOW_METRICS={'AUTH_TOKEN': 'secret'})
+    def test_token_from_allowed_ip(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret',
+                                         REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    def test_admins_can_read_metrics(self):
+        self.client.force_login(make_user('admin', User.Role.ADMIN))
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+
+class SearchFilterTests(TestCase):
+    """?search= on Kanban cards through the full-text index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', User.Role.ADMIN)
+        board = KanbanBoard.objects.create(name='Board', owner=cls.admin)
+        column = KanbanColumn.objects.create(board=board, title='To do')
+        cls.card = KanbanCard.objects.create(title='Grade midterm papers', column=column)
+        KanbanCard.objects.create(title='Book a room', column=column)
+
+    def test_returns_matching_cards(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/kanban-cards/', {'search': 'midter'})
+        self.assertEqual([card['id'] for card in response.json()['results']], [str(self.card.pk)])
+
+
+class SchedulerTests(TestCase):
+    """advance_due_instances (workflow/schedule.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', User.Role.ADMIN)
+        teacher = make_user('teacher', User.Role.TEACHER)
+        cls.template = WorkflowTemplate.objects.create(name='Review', created_by=cls.admin)
+        cls.steps = [
+            WorkflowStep.objects.create(template=cls.template, name='Draft', order=1, duration_days=3),
+            WorkflowStep.objects.create(template=cls.template, name='Review', order=2, duration_days=2),
+        ]
+        cls.courses = [Course.objects.create(name=f'Course {index}', code=f'C{index}', teacher=teacher)
+                       for index in range(3)]
+        cls.start = date(2026, 9, 1)
+
+    def start_on(self, course, start_date):
+        apply_template(self.template.pk, [course.pk], start_date)
+        return WorkflowInstance.objects.get(course=course)
+
+    def test_advances_and_completes_as_of_the_given_day(self):
+        running = self.start_on(self.courses[0], self.start)
+        finished = self.start_on(self.courses[1], self.start - timedelta(days=10))
+        not_due = self.start_on(self.courses[2], self.start + timedelta(days=2))
+
+        self.assertEqual(advance_due_instances(today=self.start + timedelta(days=4)), (1, 1))
+
+        running.refresh_from_db()
+        self.assertEqual(running.current_step_id, self.steps[1].pk)
+        self.assertEqual(running.current_step_due, self.start + timedelta(days=5))
+        finished.refresh_from_db()
+        self.assertEqual((finished.current_step_id, finished.current_step_due), (None, None))
+        not_due.refresh_from_db()
+        self.assertEqual(not_due.current_step_id, self.steps[0].pk)
+
+    def test_second_run_changes_nothing(self):
+        self.start_on(self.courses[0], self.start)
+        today = self.start + timedelta(days=4)
+        advance_due_instances(today=today)
+        updated_at = WorkflowInstance.objects.get().updated_at
+
+        self.assertEqual(advance_due_instances(today=today), (0, 0))
+        self.assertEqual(WorkflowInstance.objects.get().updated_at, updated_at)
+
+
+class ReminderDeliveryTests(TestCase):
+    """Logging of delivered reminders (workflow/reminders.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [make_user(f'student{index}') for index in range(3)]
+
+    def test_failed_reminders_are_not_logged(self):
+        due_at = timezone.now() + timedelta(hours=2)
+        reminders = [
+            Reminder(ReminderLog.Kind.CARD, KanbanCard().pk, 'Task', due_at, 'ALG1',
+                     student.pk, student.email, '', student.username)
+            for student in self.students
+        ]
+        FlakyEmailBackend.rejected = {self.students[1].email}
+
+        result = deliver(reminders, backend='workflow.tests.FlakyEmailBackend')
+
+        self.assertEqual((result.sent, result.failed), (2, 1))
+        self.assertEqual(set(ReminderLog.objects.values_list('recipient_id', flat=True)),
+                         {self.students[0].pk, self.students[2].pk})
+
+
+class FlakyEmailBackend(BaseEmailBackend):
+    """Email backend that fails for the addresses in ``rejected``"""
+    rejected = set()
+
+    def send_messages(self, email_messages):
+        return sum(1 for message in email_messages if message.to[0] not in self.rejected)
+
+
+@override_settings(NOTIFICATIONS={'FANOUT_THRESHOLD': 2})
+class NotificationTests(TestCase):
+    """Fan-out on write and on read (workflow/notifications.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.students = [make_user(f'student{index}') for index in range(3)]
+        cls.large = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+        cls.small = Course.objects.create(name='Geometry', code='GEO1', teacher=cls.teacher)
+        enroll_students(cls.large, [student.username for student in cls.students])
+        enroll_students(cls.small, [cls.students[0].username])
+
+    def announce(self, course, title='Notice'):
+        return Announcement.objects.create(title=title, content='Please read this notice', course=course,
+                                           author=self.teacher)
+
+    def test_large_courses_are_read_from_the_stream(self):
+        announcement = self.announce(self.large)
+        announcement.refresh_from_db()
+        self.assertTrue(announcement.streamed)
+        self.assertFalse(Notification.objects.filter(announcement=announcement).exists())
+
+        items = notifications.inbox(self.students[1])
+        self.assertEqual([(item['id'], item['read']) for item in items], [(announcement.pk, False)])
+        self.assertEqual(notifications.unread_count(self.students[1]), 1)
+
+    def test_small_courses_get_inbox_rows(self):
+        announcement = self.announce(self.small)
+        self.assertEqual(list(Notification.objects.values_list('recipient_id', 'announcement_id')),
+                         [(self.students[0].pk, announcement.pk)])
+
+    def test_unread_count_follows_mark_read_and_new_announcements(self):
+        student = self.students[0]
+        streamed, written = self.announce(self.large), self.announce(self.small)
+        self.assertEqual(notifications.unread_count(student), 2)
+
+        notifications.mark_read(student, [streamed.pk])
+        self.assertEqual(notifications.unread_count(student), 1)
+        notifications.mark_read(student, [written.pk])
+        self.assertEqual(notifications.unread_count(student), 0)
+
+        # A new streamed announcement changes the stream version behind the cached count
+        self.announce(self.large, 'Second notice')
+        self.assertEqual(notifications.unread_count(student), 1)
+        notifications.mark_all_read(student)
+        self.assertEqual(notifications.unread_count(student), 0)
+
+
+class ReadReceiptTests(TestCase):
+    """Announcement read bitmaps (workflow/receipts.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.students = [make_user(f'student{index}') for index in range(3)]
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+        enroll_students(cls.course, [student.username for student in cls.students])
+        cls.announcements = [
+            Announcement.objects.create(title=f'Notice {index}', content='Please read this notice', course=cls.course,
+                                        author=cls.teacher)
+            for index in range(2)
+        ]
+
+    def test_bitmap_round_trips(self):
+        bitmap = receipts.Bitmap()
+        for index in (0, 7, 8, 1000):
+            self.assertTrue(bitmap.add(index))
+        self.assertFalse(bitmap.add(7))
+
+        decoded = receipts.Bitmap(bitmap.encode())
+        self.assertEqual(list(decoded), [0, 7, 8, 1000])
+        self.assertEqual(len(decoded), 4)
+        self.assertNotIn(9, decoded)
+        self.assertEqual(receipts.Bitmap().encode(), b'')
+
+    def test_read_count_and_is_read(self):
+        announcement = self.announcements[0]
+        self.assertTrue(receipts.mark_read(announcement, self.students[0]))
+        self.assertFalse(receipts.mark_read(announcement, self.students[0]))
+        self.assertTrue(receipts.mark_read(announcement, self.students[2]))
+
+        state = AnnouncementReadState.objects.get(announcement=announcement)
+        self.assertEqual(state.read_count, 2)
+        indexes = [receipts.slot_index(student, self.course.pk) for student in self.students]
+        self.assertEqual([receipts.is_read(state, index) for index in indexes], [True, False, True])
+        self.assertEqual(list(receipts.readers(announcement)), [self.students[0], self.students[2]])
+
+    def test_mark_all_read_counts_new_reads_only(self):
+        receipts.mark_read(self.announcements[0], self.students[1])
+        self.assertEqual(receipts.mark_all_read(self.students[1], self.course), 1)
+        self.assertEqual(receipts.mark_all_read(self.students[1], self.course), 0)
+        self.assertEqual(
+            list(AnnouncementReadState.objects.order_by('read_count').values_list('read_count', flat=True)), [1, 1],
+        )
+
+    def test_mark_all_read_changes_the_etag(self):
+        # The read states exist before mark_all_read, so it updates rather than creates them
+        for announcement in self.announcements:
+            receipts.mark_read(announcement, self.students[1])
+        self.client.force_login(self.students[0])
+        url = f'/api/announcements/?course={self.course.pk}'
+        etag = self.client.get(url)['ETag']
+        self.client.post('/api/announcements/mark_all_read/', {'course': self.course.pk},
+                         content_type='application/json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CourseStudentsPageTests(TestCase):
+    """The course students page and its autocomplete picker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.student = make_user('student')
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+
+    def test_enrolls_students_picked_through_autocomplete(self):
+        self.client.force_login(self.teacher)
+        url = f'/course/{self.course.pk}/students/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        options = self.client.get(response.context['student_search_url'], {'q': 'stu'}).json()['results']
+        self.assertEqual([option['id'] for option in options], [self.student.pk])
+        self.client.post(url, {'action': 'enroll', 'student_id': [self.student.pk]})
+        self.assertEqual(list(self.course.get_students()), [self.student])
+        self.assertEqual(self.client.get(response.context['student_search_url']).json()['results'], [])
+
+
+class AutocompleteTests(TestCase):
+    """Prefix search of workflow/autocomplete.py"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ada = User.objects.create(username='alovelace', first_name='Ada', last_name='Lovelace',
+                                      email='ada@example.edu')
+        cls.adam = User.objects.create(username='asmith', first_name='Adam', last_name='Smith',
+                                       email='Adam.Smith@example.edu')
+        User.objects.create(username='bruce', first_name='Bruce', last_name='Adams', email='b@example.edu')
+
+    def search(self, query):
+        return [user.username for user in search_users(User.objects.all(), query)[0]]
+
+    def test_every_term_must_prefix_a_field(self):
+        self.assertEqual(self.search('ADA'), ['alovelace', 'asmith', 'bruce'])
+        self.assertEqual(self.search('ada lov'), ['alovelace'])
+        self.assertEqual(self.search('adam.s'), ['asmith'])
+        self.assertEqual(self.search('a%'), [])
+
+
+class ConditionalRequestTests(TestCase):
+    """ETag / Last-Modified validators (workflow/mixins.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', User.Role.ADMIN)
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.student = make_user('student')
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+        enroll_students(cls.course, ['student'])
+        cls.announcements = [
+            Announcement.objects.create(title=f'Notice {index}', content='Please read this notice', course=cls.course,
+                                        author=cls.teacher)
+            for index in range(2)
+        ]
+
+    def assertChanged(self, url, change):
+        etag = self.client.get(url)['ETag']
+        change()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unchanged_list_is_not_modified(self):
+        self.client.force_login(self.student)
+        url = f'/api/announcements/?course={self.course.pk}'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_dropping_a_student_changes_the_announcement_etag(self):
+        self.client.force_login(self.teacher)
+        self.assertChanged(f'/api/announcements/{self.announcements[0].pk}/',
+                           lambda: self.course.drop_students([self.student.pk]))
+
+    def test_step_edit_changes_the_template_etag(self):
+        self.client.force_login(self.admin)
+        template = WorkflowTemplate.objects.create(name='Review', created_by=self.admin)
+        step = WorkflowStep.objects.create(template=template, name='Draft', order=1, duration_days=3)
+
+        def edit_step():
+            step.duration_days = 5
+            step.save()
+
+        self.assertChanged(f'/api/workflow-templates/{template.pk}/', edit_step)
+
+    def test_count_based_payloads_have_no_last_modified(self):
+        # Enrollments are counted, and a date cannot reflect a removed row
+        self.client.force_login(self.admin)
+        response = self.client.get(f'/api/courses/{self.course.pk}/')
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        last_modified = self.client.get(f'/api/announcements/{self.announcements[0].pk}/')['Last-Modified']
+        response = self.client.get(f'/api/announcements/?course={self.course.pk}',
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+class CompressionTests(TestCase):
+    """BREACH padding of dynamic responses"""
+
+    def test_padded_gzip_decompresses_to_the_original(self):
+        data = b'{"csrf": "token"}' * 200
+        sizes = {len(compress(data, 'gzip', max_random_bytes=100)) for _ in range(20)}
+        self.assertGreater(len(sizes), 1)
+        self.assertEqual(gzip.decompress(compress(data, 'gzip', max_random_bytes=100)), data)
+
+    def test_api_responses_are_padded_gzip(self):
+        admin = make_user('admin', User.Role.ADMIN)
+        for index in range(12):
+            make_user(f'user{index}')
+        self.client.force_login(admin)
+        response = self.client.get('/api/users/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(response.content).startswith(b'{'))
+
+
+class FastpathTests(TestCase):
+    """values() list responses (workflow/fastpath.py) match the serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username='teacher', first_name='Grace', last_name='Hopper',
+                                          email='teacher@example.edu', role=User.Role.TEACHER)
+        cls.students = [make_user(f'student{index}') for index in range(3)]
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+        enroll_students(cls.course, [student.username for student in cls.students])
+        announcements = [
+            Announcement.objects.create(title=f'Notice {index}', content='Please read this notice', course=cls.course,
+                                        author=cls.teacher, important=index == 0)
+            for index in range(3)
+        ]
+        receipts.mark_read(announcements[0], cls.students[0])
+        receipts.mark_read(announcements[0], cls.students[1])
+        receipts.mark_read(announcements[1], cls.students[1])
+        start = timezone.now()
+        CalendarEvent.objects.create(title='Lecture', start_date=start, end_date=start + timedelta(hours=1),
+                                     course=cls.course, created_by=cls.teacher)
+        CalendarEvent.objects.create(title='Personal', start_date=start, end_date=start + timedelta(hours=2),
+                                     created_by=cls.students[0])
+
+    def assertSameAsSerializer(self, serializer_class, queryset):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.students[1]
+        serializer = serializer_class(context={'request': request})
+        planned = fastpath.plan(serializer, queryset)
+        self.assertIsNotNone(planned)
+        rows, columns = planned
+        expected = serializer_class(queryset, many=True, context={'request': request}).data
+        # Compared as rendered, since UUIDs stay UUID objects until the renderer
+        self.assertEqual(JSONRenderer().render(fastpath.represent(rows, columns)), JSONRenderer().render(expected))
+
+    def test_announcements(self):
+        self.assertSameAsSerializer(
+            AnnouncementSerializer,
+            Announcement.objects.select_related('author', 'course', 'read_state').order_by('pk'),
+        )
+
+    def test_calendar_events_and_enrollments(self):
+        self.assertSameAsSerializer(CalendarEventSerializer, CalendarEvent.objects.order_by('pk'))
+        self.assertSameAsSerializer(EnrollmentSerializer, Enrollment.objects.order_by('pk'))
+
+
+class CalendarImportTests(TestCase):
+    """iCalendar parsing and re-import (workflow/ical.py)"""
+
+    CALENDAR = '\r\n'.join([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'BEGIN:VEVENT',
+        'UID:lecture-1',
+        'SUMMARY:Weekly',
+        '  lecture',
+        'DESCRIPTION:Room 4\\, building B\\nBring notes',
+        'DTSTART;TZID=Europe/Berlin:20260901T100000',
+        'DURATION:PT1H30M',
+        'RRULE:FREQ=WEEKLY;BYDAY=MO,WE',
+        'CATEGORIES:CLASS',
+        'BEGIN:VALARM',
+        'SUMMARY:Ignored',
+        'END:VALARM',
+        'END:VEVENT',
+        'BEGIN:VEVENT',
+        'UID:exam-1',
+        'SUMMARY:Final exam',
+        'DTSTART;VALUE=DATE:20261215',
+        'RRULE:FREQ=YEARLY',
+        'END:VEVENT',
+        'END:VCALENDAR',
+        '',
+    ])
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+
+    def import_calendar(self, text):
+        return ical.import_events(io.StringIO(text), self.teacher, course=self.course)
+
+    def test_parses_folded_lines_timezones_durations_and_rules(self):
+        result = self.import_calendar(self.CALENDAR)
+        self.assertEqual((result.created, result.errors), (2, []))
+
+        lecture = CalendarEvent.objects.get(external_uid='lecture-1')
+        self.assertEqual(lecture.title, 'Weekly lecture')
+        self.assertEqual(lecture.description, 'Room 4, building B\nBring notes')
+        self.assertEqual(lecture.start_date, datetime(2026, 9, 1, 8, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(lecture.end_date - lecture.start_date, timedelta(hours=1, minutes=30))
+        self.assertEqual((lecture.event_type, lecture.is_recurring), (CalendarEvent.EventType.CLASS, True))
+        self.assertEqual(lecture.recurrence_pattern, 'FREQ=WEEKLY;BYDAY=MO,WE')
+
+        exam = CalendarEvent.objects.get(external_uid='exam-1')
+        self.assertEqual(exam.end_date - exam.start_date, timedelta(days=1))
+        self.assertEqual((exam.event_type, exam.recurrence_pattern), (CalendarEvent.EventType.OTHER, 'YEARLY'))
+
+    def test_reimport_skips_unchanged_events(self):
+        self.import_calendar(self.CALENDAR)
+        updated_at = dict(CalendarEvent.objects.values_list('external_uid', 'updated_at'))
+
+        result = self.import_calendar(self.CALENDAR)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 2))
+        self.assertEqual(dict(CalendarEvent.objects.values_list('external_uid', 'updated_at')), updated_at)
+
+        result = self.import_calendar(self.CALENDAR.replace('Final exam', 'Final exam (hall A)'))
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 1))
+        self.assertEqual(CalendarEvent.objects.get(external_uid='exam-1').title, 'Final exam (hall A)')
+
+
+class GanttTests(TestCase):
+    """Cached Gantt layouts (workflow/gantt.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', User.Role.ADMIN)
+        teacher = make_user('teacher', User.Role.TEACHER)
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=teacher)
+        cls.template = WorkflowTemplate.objects.create(name='Review', created_by=cls.admin)
+        WorkflowStep.objects.create(template=cls.template, name='Draft', order=1, duration_days=3)
+        apply_template(cls.template.pk, [cls.course.pk], date(2026, 9, 1))
+
+    def test_renaming_a_template_changes_the_layout(self):
+        layout, version = gantt.get_layout(self.course.pk)
+        self.assertEqual([row['label'] for row in layout['rows']], ['Review'])
+
+        WorkflowTemplate.objects.filter(pk=self.template.pk).update(name='Peer review')
+        layout, renamed = gantt.get_layout(self.course.pk)
+        self.assertNotEqual(renamed, version)
+        self.assertEqual([row['label'] for row in layout['rows']], ['Peer review'])
+
+
+class BoardCloneTests(TestCase):
+    """Bulk board cloning (workflow/boards.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.students = [make_user(f'student{index}') for index in range(2)]
+        cls.courses = [Course.objects.create(name=f'Course {index}', code=f'C{index}', teacher=cls.teacher)
+                       for index in range(3)]
+        cls.template = KanbanBoard.objects.create(name='Project', owner=cls.teacher, is_template=True)
+        todo = KanbanColumn.objects.create(board=cls.template, title='To do', order=0)
+        done = KanbanColumn.objects.create(board=cls.template, title='Done', order=1)
+        KanbanCard.objects.create(title='Proposal', column=todo).assignees.set(cls.students)
+        KanbanCard.objects.create(title='Kickoff', column=done)
+
+    def cards_by_column(self, board):
+        return {(card.column.title, card.title): set(card.assignees.values_list('pk', flat=True))
+                for card in KanbanCard.objects.filter(column__board=board)}
+
+    def test_copies_columns_cards_and_assignees_per_target(self):
+        targets = [(course, f'Project {course.code}') for course in self.courses]
+        result = clone_board(self.template, targets, self.teacher, include_assignees=True)
+
+        self.assertEqual(result.as_dict()['created'], 3)
+        self.assertEqual((result.columns, result.cards, result.assignments), (6, 6, 6))
+        expected = self.cards_by_column(self.template)
+        for board, course in zip(result.boards, self.courses):
+            board.refresh_from_db()
+            self.assertEqual((board.course, board.name, board.is_template), (course, f'Project {course.code}', False))
+            self.assertEqual(list(board.columns.values_list('title', 'order')), [('To do', 0), ('Done', 1)])
+            self.assertEqual(self.cards_by_column(board), expected)
+        self.assertEqual(KanbanCard.objects.filter(column__board=self.template).count(), 2)
+
+    def test_assignees_are_only_copied_on_request(self):
+        result = clone_board(self.template, [(None, '')], self.teacher)
+        self.assertEqual(result.assignments, 0)
+        self.assertEqual(result.boards[0].name, 'Project')
+        self.assertEqual(self.cards_by_column(result.boards[0]),
+                         {('To do', 'Proposal'): set(), ('Done', 'Kickoff'): set()})
+
+
+class CourseStudentsApiTests(TestCase):
+    """Writing CourseSerializer.students"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', User.Role.ADMIN)
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.students = [make_user(f'student{index}') for index in range(3)]
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_students_replace_the_active_roster(self):
+        first, second, third = (student.pk for student in self.students)
+        url = f'/api/courses/{self.course.pk}/'
+        response = self.client.patch(url, {'students': [first, second]}, content_type='application/json')
+        self.assertEqual(sorted(response.json()['students']), [first, second])
+
+        response = self.client.patch(url, {'students': [second, third]}, content_type='application/json')
+        self.assertEqual(sorted(response.json()['students']), [second, third])
+        self.assertEqual(Enrollment.objects.get(course=self.course, user_id=first).status,
+                         Enrollment.Status.DROPPED)
+
+    def test_rejects_users_who_are_not_students(self):
+        response = self.client.patch(f'/api/courses/{self.course.pk}/', {'students': [self.teacher.pk]},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('students', response.json())
+
+
+class ArchiveTests(TestCase):
+    """Moving closed-term rows to ArchivedRecord (workflow/archive.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', User.Role.TEACHER)
+        cls.term = Term.objects.create(name='Spring 2025', code='SP25', start_date=date(2025, 1, 10),
+                                       end_date=date(2025, 5, 30))
+        cls.course = Course.objects.create(name='Algebra', code='ALG1', teacher=cls.teacher, term=cls.term)
+        start = timezone.now() - timedelta(days=400)
+        cls.event_ids = {
+            CalendarEvent.objects.create(title=f'Lecture {index}', start_date=start, end_date=start,
+                                         course=cls.course, created_by=cls.teacher).pk
+            for index in range(5)
+        }
+
+    def assertEveryEventInOnePlace(self):
+        live = set(CalendarEvent.objects.values_list('pk', flat=True))
+        archived = list(ArchivedRecord.objects.values_list('object_id', flat=True))
+        self.assertEqual(live & set(archived), set())
+        self.assertEqual(len(archived), len(set(archived)))
+        self.assertEqual(live | set(archived), self.event_ids)
+
+    def test_interrupted_run_can_be_restarted(self):
+        bulk_create = ArchivedRecord.objects.bulk_create
+        calls = []
+
+        def crash_on_second_batch(records, *args, **kwargs):
+            calls.append(len(records))
+            created = bulk_create(records, *args, **kwargs)
+            if len(calls) == 2:
+                raise RuntimeError('interrupted')
+            return created
+
+        with mock.patch.object(ArchivedRecord.objects, 'bulk_create', side_effect=crash_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                archive.archive_kind(self.term, ArchivedRecord.Kind.CALENDAR_EVENT, batch_size=2)
+        self.assertEqual(ArchivedRecord.objects.count(), 2)
+        self.assertEveryEventInOnePlace()
+
+        self.assertEqual(archive.archive_kind(self.term, ArchivedRecord.Kind.CALENDAR_EVENT, batch_size=2), 3)
+        self.assertEqual(CalendarEvent.objects.count(), 0)
+        self.assertEveryEventInOnePlace()
+
+    def test_dry_run_only_counts(self):
+        result = archive.archive_term(self.term, dry_run=True)
+        self.assertEqual(result.counts[ArchivedRecord.Kind.CALENDAR_EVENT], 5)
+        self.assertEqual(result.as_dict()['total'], 5)
+        self.assertEqual(CalendarEvent.objects.count(), 5)
+        self.assertFalse(ArchivedRecord.objects.exists())
+        self.term.refresh_from_db()
+        self.assertIsNone(self.term.archived_at)
+
+    def test_open_terms_are_rejected(self):
+        self.term.end_date = timezone.localdate()
+        with self.assertRaises(InvalidWorkflowStateException):
+            archive.archive_term(self.term)
+
+
+class SharedCacheCheckTests(TestCase):
+    """workflow/checks.py"""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_rejects_per_process_cache(self):
+        errors = check_shared_caches(None)
+        self.assertEqual([error.id for error in errors], ['workflow.E002'])
+        self.assertIsInstance(errors[0], Error)
+
+    def test_accepts_configured_cache(self):
+        self.assertEqual(check_shared_caches(None), [])
@@ -12,6 +12,10 @@ router.register(r'announcements', views.AnnouncementViewSet)
 router.register(r'kanban-boards', views.KanbanBoardViewSet)
 router.register(r'kanban-columns', views.KanbanColumnViewSet)
 router.register(r'kanban-cards', views.KanbanCardViewSet)
+router.register(r'workflow-templates', views.WorkflowTemplateViewSet)
+router.register(r'terms', views.TermViewSet)
+router.register(r'archive', views.ArchivedRecordViewSet)
+router.register(r'notifications', views.NotificationViewSet, basename='notification')
 
 urlpatterns = [
     # API endpoints
@@ -22,6 +26,9 @@ urlpatterns = [
     path('api/logout/', views.logout_api, name='logout_api'),
     path('api/user/', views.current_user_api, name='current_user_api'),
     path('api/register/', views.register_api, name='register_api'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/profiling/queries/', views.query_profiles_api, name='query_profiles_api'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
     # Django original views
     path('', RedirectView.as_view(url='/login/', permanent=False), name='home'),  # Redirect root to login
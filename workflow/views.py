@@ -1,7 +1,10 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import HttpResponse, JsonResponse
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
 from rest_framework import viewsets, status, permissions, filters
@@ -10,23 +13,40 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.middleware.csrf import get_token
+import hmac
+import io
 import json
 from django.contrib.auth.forms import UserCreationForm
 from .models import (
-    User, Course, CalendarEvent, Announcement,
+    User, Term, Course, Enrollment, CalendarEvent, Announcement,
     KanbanBoard, KanbanColumn, KanbanCard,
     Assignment, Submission, Timeline, TimelineEvent,
     WorkflowTemplate, WorkflowStep, WorkflowInstance,
-    ReportTemplate, Report, WorkflowException, InvalidWorkflowStateException
+    ReportTemplate, Report, WorkflowException, InvalidWorkflowStateException,
+    SearchEntry, ArchivedRecord
 )
 from .serializers import (
     UserSerializer, CourseSerializer, CalendarEventSerializer,
     AnnouncementSerializer, KanbanBoardSerializer, KanbanColumnSerializer,
     KanbanCardSerializer, AssignmentSerializer, SubmissionSerializer,
-    TimelineSerializer, TimelineEventSerializer, WorkflowTemplateSerializer,
+    TimelineSerializer, TimelineEventSerializer, WorkflowTemplateSerializer, EnrollmentSerializer,
     WorkflowStepSerializer, WorkflowInstanceSerializer, ReportTemplateSerializer,
-    ReportSerializer
+    ReportSerializer, NotificationSerializer, TermSerializer, ArchivedRecordSerializer
 )
+from .enrollment import enroll_students, enroll_rows, read_roster_csv
+from .profiling import profile_buffer, get_setting as get_profiling_setting
+from . import metrics
+from . import search
+from . import notifications
+from . import receipts
+from . import autocomplete
+from . import ical
+from . import gantt
+from . import boards
+from . import fragments
+from .schedule import apply_template
+from .mixins import ConditionalRequestMixin, DynamicQuerysetMixin, ValuesListMixin
+from .fastpath import related_count
 
 # Custom exceptions
 class PermissionDeniedException(Exception):
@@ -37,6 +57,10 @@ class DueDatePassedException(Exception):
     """Exception raised when attempting to submit an assignment after the due date"""
     pass
 
+def _flag(data, name, default):
+    """A boolean request field, accepting JSON booleans and form strings"""
+    return str(data.get(name, default)).lower() not in ('false', '0', 'no')
+
 # Custom permissions
 class IsTeacherOrAdmin(permissions.BasePermission):
     """
@@ -69,7 +93,7 @@ class IsOwnerOrTeacherOrAdmin(permissions.BasePermission):
         
         if request.user.is_teacher:
             # Check if the teacher is related to this object
-            if hasattr(obj, 'course') and obj.course.teacher == request.user:
+            if getattr(obj, 'course', None) is not None and obj.course.teacher == request.user:
                 return True
             if hasattr(obj, 'teacher') and obj.teacher == request.user:
                 return True
@@ -87,7 +111,7 @@ class IsOwnerOrTeacherOrAdmin(permissions.BasePermission):
         return False
 
 # User views
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for users
     """
@@ -118,11 +142,11 @@ class UserViewSet(viewsets.ModelViewSet):
         if user.is_teacher:
             # Teachers can see themselves and their students
             teacher_courses = Course.objects.filter(teacher=user)
-            students = User.objects.filter(enrolled_courses__in=teacher_courses)
+            students = Enrollment.objects.active().filter(course__in=teacher_courses).values('user_id')
             return User.objects.filter(Q(id=user.id) | Q(id__in=students))
         
         # Students can only see themselves and their teachers
-        student_courses = user.enrolled_courses.all()
+        student_courses = user.get_enrolled_courses()
         teachers = User.objects.filter(taught_courses__in=student_courses)
         return User.objects.filter(Q(id=user.id) | Q(id__in=teachers))
     
@@ -131,15 +155,53 @@ class UserViewSet(viewsets.ModelViewSet):
         """Endpoint to get current user info"""
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Prefix search for user pickers, paginated with ``after`` cursors.
+        Query params: q, role, course (members only), exclude_course
+        (not enrolled in it), after, limit.
+        Teachers and admins search every user; students only the users they can see.
+        """
+        user = request.user
+        params = request.query_params
+        base = User.objects.all() if user.is_admin or user.is_teacher else self.get_queryset()
+        
+        role = params.get('role', '').upper() or None
+        if role and role not in User.Role.values:
+            return Response({"detail": f"Unknown role '{role}'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(params.get('limit', 20))
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        courses = {}
+        for param in ('course', 'exclude_course'):
+            if params.get(param):
+                course = Course.objects.filter(pk=params[param]).first() if params[param].isdigit() else None
+                if course is None:
+                    return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+                courses[param] = course
+        
+        users, next_cursor = autocomplete.search_users(
+            base, params.get('q', ''), role=role, course=courses.get('course'),
+            exclude_course=courses.get('exclude_course'), after=params.get('after'), limit=limit,
+        )
+        return Response({
+            'results': [autocomplete.as_option(option) for option in users],
+            'next': next_cursor,
+        })
 
 # Course views
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ValuesListMixin, ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for courses
     """
-    queryset = Course.objects.select_related('teacher')
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    etag_fields = ['enrollments', 'enrollments__updated_at']
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'code', 'description']
     
@@ -159,18 +221,23 @@ class CourseViewSet(viewsets.ModelViewSet):
         - Admin: All courses
         - Teacher: Their own courses
         - Student: Enrolled courses
+        and by ``term`` id when given
         """
         user = self.request.user
-        base_queryset = Course.objects.select_related('teacher')
+        base_queryset = Course.objects.all()
         
         if user.is_admin:
-            return base_queryset
-        
-        if user.is_teacher:
-            return base_queryset.filter(teacher=user)
+            queryset = base_queryset
+        elif user.is_teacher:
+            queryset = base_queryset.filter(teacher=user)
+        else:
+            # Student: enrolled courses
+            queryset = user.get_enrolled_courses()
         
-        # Student: enrolled courses
-        return user.enrolled_courses.select_related('teacher').all()
+        term_id = self.request.query_params.get('term')
+        if term_id:
+            queryset = queryset.filter(term_id=term_id) if term_id.isdigit() else queryset.none()
+        return queryset
     
     @action(detail=True, methods=['post'])
     def enroll_student(self, request, pk=None):
@@ -194,6 +261,113 @@ class CourseViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'])
+    def bulk_enroll(self, request, pk=None):
+        """
+        Enroll many students at once.
+        Accepts either a JSON list of ``students`` (ids, usernames or emails)
+        or a ``roster`` CSV upload with a ``student`` column.
+        """
+        course = self.get_object()
+        
+        if not request.user.can_manage_course(course):
+            return Response(
+                {"detail": "You don't have permission to manage students for this course"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        roster = request.FILES.get('roster')
+        students = request.data.get('students') or request.data.get('student_ids')
+        
+        try:
+            if roster:
+                rows = read_roster_csv(io.TextIOWrapper(roster.file, encoding='utf-8-sig', newline=''),
+                                       default_course=course)
+                result = enroll_rows(rows, allowed_course_ids={course.pk})
+            elif isinstance(students, list):
+                result = enroll_students(course, students)
+            else:
+                return Response(
+                    {"detail": "Provide a 'students' list or a 'roster' CSV file"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result.as_dict())
+    
+    @action(detail=True, methods=['get'])
+    def roster(self, request, pk=None):
+        """
+        Enrollments of the course, active ones unless ``status`` names another
+        status or ``all``. With ``updated_since`` (an ISO datetime) every
+        enrollment changed since then is returned, dropped ones included, in
+        change order for incremental roster sync.
+        """
+        course = self.get_object()
+        if not request.user.can_manage_course(course):
+            return Response(
+                {"detail": "You don't have permission to view the roster of this course"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        enrollments = Enrollment.objects.filter(course=course).select_related('user')
+        updated_since = request.query_params.get('updated_since')
+        enrollment_status = request.query_params.get('status', Enrollment.Status.ACTIVE).upper()
+        if updated_since:
+            since = parse_datetime(updated_since.replace(' ', '+'))
+            if since is None:
+                return Response({"detail": "'updated_since' must be an ISO 8601 datetime"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            enrollments = enrollments.filter(updated_at__gte=since).order_by('updated_at', 'pk')
+        else:
+            if enrollment_status != 'ALL':
+                if enrollment_status not in Enrollment.Status.values:
+                    return Response({"detail": f"Unknown status '{enrollment_status}'"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                enrollments = enrollments.filter(status=enrollment_status)
+            enrollments = enrollments.order_by('user__last_name', 'user__first_name', 'user__username')
+        
+        page = self.paginate_queryset(enrollments)
+        serializer = EnrollmentSerializer(page if page is not None else enrollments, many=True,
+                                          context=self.get_serializer_context())
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def gantt(self, request, pk=None):
+        """Gantt layout of the course's timelines and workflow steps"""
+        course = self.get_object()
+        layout, version = gantt.get_layout(course.pk)
+        etag = quote_etag(version)
+        conditional = self._conditional(etag, None)
+        if conditional is not None:
+            return conditional
+        response = Response(layout)
+        response['ETag'] = etag
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def timeline_events(self, request, pk=None):
+        """Create many timeline events at once from an ``events`` list; all or nothing"""
+        course = self.get_object()
+        if not request.user.can_manage_course(course):
+            return Response(
+                {"detail": "You don't have permission to manage timelines for this course"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        events = request.data.get('events')
+        if not isinstance(events, list) or not events:
+            return Response({"detail": "Provide a non-empty 'events' list"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = gantt.import_timeline_events(course, events)
+        if result.errors:
+            return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def unenroll_student(self, request, pk=None):
         course = self.get_object()
@@ -213,11 +387,11 @@ class CourseViewSet(viewsets.ModelViewSet):
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 # Calendar Event views
-class CalendarEventViewSet(viewsets.ModelViewSet):
+class CalendarEventViewSet(ValuesListMixin, ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for calendar events
     """
-    queryset = CalendarEvent.objects.select_related('course', 'created_by')
+    queryset = CalendarEvent.objects.all()
     serializer_class = CalendarEventSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrTeacherOrAdmin]
     filter_backends = [filters.SearchFilter]
@@ -235,7 +409,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
         course_id = self.request.query_params.get('course')
         
         # Base queryset - filter by user access
-        base_queryset = CalendarEvent.objects.select_related('course', 'created_by')
+        base_queryset = CalendarEvent.objects.all()
         
         if user.is_admin:
             queryset = base_queryset
@@ -247,7 +421,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
             )
         else:
             # Students see events for courses they're enrolled in
-            student_courses = user.enrolled_courses.all()
+            student_courses = user.get_enrolled_courses()
             queryset = base_queryset.filter(
                 Q(course__in=student_courses)
             )
@@ -273,15 +447,52 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Set the created_by field to current user when creating an event"""
         serializer.save(created_by=self.request.user)
+    
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsTeacherOrAdmin])
+    def import_calendar(self, request):
+        """
+        Import events from an iCalendar (.ics) upload in ``calendar``.
+        With a ``course`` id the events belong to that course, otherwise they are
+        the user's own events. Re-imports update changed events by UID.
+        """
+        upload = request.FILES.get('calendar')
+        if upload is None:
+            return Response({"detail": "Provide a 'calendar' .ics file"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        course = None
+        course_id = str(request.data.get('course') or '')
+        if course_id:
+            course = Course.objects.filter(pk=course_id).first() if course_id.isdigit() else None
+            if course is None:
+                return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+            if not request.user.can_manage_course(course):
+                return Response(
+                    {"detail": "You don't have permission to add events to this course"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        event_type = str(request.data.get('event_type') or CalendarEvent.EventType.OTHER).upper()
+        if event_type not in CalendarEvent.EventType.values:
+            return Response({"detail": f"Unknown event type '{event_type}'"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = ical.import_events(
+                io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''),
+                request.user, course=course, event_type=event_type,
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
 
 # Announcement views
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(ValuesListMixin, ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for announcements
     """
-    queryset = Announcement.objects.select_related('course', 'author')
+    queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrTeacherOrAdmin]
+    etag_fields = ['read_state__updated_at', 'course__enrollments__updated_at']
     filter_backends = [filters.SearchFilter]
     search_fields = ['title', 'content']
     
@@ -294,7 +505,9 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         course_id = self.request.query_params.get('course')
-        base_queryset = Announcement.objects.select_related('course', 'author')
+        base_queryset = Announcement.objects.annotate(
+            audience_size=related_count(Enrollment, 'course_id', 'course_id', status=Enrollment.Status.ACTIVE)
+        )
         
         if user.is_admin:
             queryset = base_queryset
@@ -304,7 +517,7 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
                 Q(author=user) | Q(course__in=teacher_courses)
             )
         else:
-            student_courses = user.enrolled_courses.all()
+            student_courses = user.get_enrolled_courses()
             queryset = base_queryset.filter(course__in=student_courses)
         
         if course_id:
@@ -319,15 +532,107 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Set the author field to current user when creating an announcement"""
         serializer.save(author=self.request.user)
+    
+    # Visibility comes from get_queryset, which limits students to their enrolled courses
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def mark_read(self, request, pk=None):
+        """Record that the current student has read this announcement"""
+        announcement = self.get_object()
+        if not request.user.is_student:
+            return Response({"detail": "Only students' reads are tracked"}, status=status.HTTP_400_BAD_REQUEST)
+        newly_read = receipts.mark_read(announcement, request.user)
+        notifications.mark_read(request.user, [announcement.pk])
+        return Response({"read": True, "newly_read": newly_read})
+    
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """Mark every announcement of the ``course`` as read by the current student"""
+        if not request.user.is_student:
+            return Response({"detail": "Only students' reads are tracked"}, status=status.HTTP_400_BAD_REQUEST)
+        course = get_object_or_404(request.user.get_enrolled_courses(), pk=request.data.get('course'))
+        count = receipts.mark_all_read(request.user, course)
+        notifications.mark_read(
+            request.user, list(Announcement.objects.filter(course=course).values_list('pk', flat=True))
+        )
+        return Response({"marked_read": count})
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def read_receipts(self, request, pk=None):
+        """Who has and hasn't read this announcement, for the course teacher or author"""
+        announcement = self.get_object()
+        if announcement.author_id != request.user.pk and not request.user.can_manage_course(announcement.course):
+            return Response(
+                {"detail": "You don't have permission to view read receipts for this announcement"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        read = list(receipts.readers(announcement).values('id', 'username', 'first_name', 'last_name'))
+        unread = list(
+            announcement.course.get_students().exclude(pk__in=[reader['id'] for reader in read])
+            .order_by('last_name', 'first_name', 'username').values('id', 'username', 'first_name', 'last_name')
+        )
+        audience = len(read) + len(unread)
+        return Response({
+            "read_count": len(read),
+            "audience": audience,
+            "read_percent": round(100 * len(read) / audience, 1) if audience else 0.0,
+            "read": read,
+            "unread": unread,
+        })
+
+# Notification views
+class NotificationViewSet(viewsets.ViewSet):
+    """
+    API endpoint for the current user's announcement notifications
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request):
+        """List notifications, newest first; ``?unread=true`` limits to unread ones"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({"detail": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        unread_only = request.query_params.get('unread', '').lower() in ('1', 'true', 'yes')
+        items = notifications.inbox(request.user, unread_only=unread_only, limit=limit, offset=offset)
+        return Response({
+            'unread': notifications.unread_count(request.user),
+            'results': NotificationSerializer(items, many=True, context={'request': request}).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': notifications.unread_count(request.user)})
+    
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark the announcements listed in ``ids`` as read"""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({"detail": "Provide a non-empty 'ids' list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            notifications.mark_read(request.user, ids)
+        except ValidationError:
+            return Response({"detail": "ids must be announcement ids"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'unread': notifications.unread_count(request.user)})
+    
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        notifications.mark_all_read(request.user)
+        return Response({'unread': 0})
 
 # Kanban Board views
-class KanbanBoardViewSet(viewsets.ModelViewSet):
+class KanbanBoardViewSet(ValuesListMixin, ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for Kanban boards
     """
-    queryset = KanbanBoard.objects.select_related('course', 'owner')
+    queryset = KanbanBoard.objects.all()
     serializer_class = KanbanBoardSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrTeacherOrAdmin]
+    etag_fields = ['columns', 'columns__updated_at', 'columns__cards', 'columns__cards__updated_at',
+                   'columns__cards__assignees']
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
     
@@ -340,7 +645,7 @@ class KanbanBoardViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         course_id = self.request.query_params.get('course')
-        base_queryset = KanbanBoard.objects.select_related('course', 'owner')
+        base_queryset = KanbanBoard.objects.all()
         
         if user.is_admin:
             queryset = base_queryset
@@ -350,7 +655,7 @@ class KanbanBoardViewSet(viewsets.ModelViewSet):
                 Q(owner=user) | Q(course__in=teacher_courses)
             )
         else:
-            student_courses = user.enrolled_courses.all()
+            student_courses = user.get_enrolled_courses()
             queryset = base_queryset.filter(course__in=student_courses)
         
         if course_id:
@@ -360,6 +665,10 @@ class KanbanBoardViewSet(viewsets.ModelViewSet):
             except Course.DoesNotExist:
                 pass
         
+        is_template = self.request.query_params.get('is_template')
+        if is_template is not None:
+            queryset = queryset.filter(is_template=is_template.lower() in ('true', '1', 'yes'))
+        
         return queryset
     
     def perform_create(self, serializer):
@@ -378,25 +687,60 @@ class KanbanBoardViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create default columns
-        columns = [
-            {"title": "To Do", "order": 0},
-            {"title": "In Progress", "order": 1},
-            {"title": "Done", "order": 2}
-        ]
+        boards.create_default_columns(board)
         
-        for column_data in columns:
-            KanbanColumn.objects.create(board=board, **column_data)
-        
-        serializer = self.get_serializer(board)
+        # Reload: the board's columns were prefetched before they were created
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsTeacherOrAdmin, IsOwnerOrTeacherOrAdmin])
+    def clone(self, request, pk=None):
+        """
+        Copy this board's columns and cards into new boards, one per entry of
+        ``targets`` (``{"course": id or null, "name": optional}``) or, for a
+        ``courses`` list of ids, one per course. Assignees are copied when
+        ``include_assignees`` is true, cards are skipped when ``include_cards``
+        is false.
+        """
+        board = self.get_object()
+        targets = request.data.get('targets')
+        if targets is None and isinstance(request.data.get('courses'), list):
+            targets = [{'course': course_id} for course_id in request.data['courses']]
+        if not isinstance(targets, list) or not targets or not all(isinstance(t, dict) for t in targets):
+            return Response({"detail": "Provide a non-empty 'targets' list or a 'courses' list"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        course_ids = set()
+        for target in targets:
+            course_id = target.get('course')
+            if course_id is not None:
+                if not str(course_id).isdigit():
+                    return Response({"detail": f"Invalid course id '{course_id}'"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                course_ids.add(int(course_id))
+        courses = Course.objects.all() if request.user.is_admin else Course.objects.filter(teacher=request.user)
+        courses = courses.in_bulk(course_ids)
+        missing = course_ids - set(courses)
+        if missing:
+            return Response({"detail": f"Courses not found: {sorted(missing)}"}, status=status.HTTP_404_NOT_FOUND)
+        
+        result = boards.clone_board(
+            board,
+            [(courses[int(t['course'])] if t.get('course') is not None else None, str(t.get('name') or '').strip()[:100])
+             for t in targets],
+            request.user,
+            include_cards=_flag(request.data, 'include_cards', True),
+            include_assignees=_flag(request.data, 'include_assignees', False),
+        )
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
 
-class KanbanColumnViewSet(viewsets.ModelViewSet):
+class KanbanColumnViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for Kanban columns
     """
     queryset = KanbanColumn.objects.all()
     serializer_class = KanbanColumnSerializer
+    etag_fields = ['cards', 'cards__updated_at', 'cards__assignees']
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrTeacherOrAdmin]
     
     def get_permissions(self):
@@ -423,22 +767,23 @@ class KanbanColumnViewSet(viewsets.ModelViewSet):
                     Q(owner=user) | Q(course__in=teacher_courses)
                 )
             else:
-                student_courses = user.enrolled_courses.all()
+                student_courses = user.get_enrolled_courses()
                 accessible_boards = KanbanBoard.objects.filter(course__in=student_courses)
             
             queryset = queryset.filter(board__in=accessible_boards)
         
         return queryset
 
-class KanbanCardViewSet(viewsets.ModelViewSet):
+class KanbanCardViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for Kanban cards
     """
     queryset = KanbanCard.objects.all()
     serializer_class = KanbanCardSerializer
+    etag_fields = ['assignees']
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrTeacherOrAdmin]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'description']
+    filter_backends = [search.IndexedSearchFilter]
+    search_kind = SearchEntry.Kind.CARD
     
     def get_queryset(self):
         """Filter cards by column if specified"""
@@ -457,7 +802,7 @@ class KanbanCardViewSet(viewsets.ModelViewSet):
                     Q(owner=user) | Q(course__in=teacher_courses)
                 )
             else:
-                student_courses = user.enrolled_courses.all()
+                student_courses = user.get_enrolled_courses()
                 accessible_boards = KanbanBoard.objects.filter(course__in=student_courses)
             
             accessible_columns = KanbanColumn.objects.filter(board__in=accessible_boards)
@@ -487,6 +832,7 @@ class KanbanCardViewSet(viewsets.ModelViewSet):
                 )
             
             card.move_to_column(column)
+            metrics.KANBAN_CARD_MOVES.inc()
             serializer = self.get_serializer(card)
             return Response(serializer.data)
         
@@ -509,11 +855,131 @@ class KanbanCardViewSet(viewsets.ModelViewSet):
             if column.board.course and column.board.course.teacher == user:
                 return True
         
-        if column.board.course and column.board.course in user.enrolled_courses.all():
+        if column.board.course and user.is_enrolled_in(column.board.course):
             return True
         
         return False
 
+# Workflow template views
+class WorkflowTemplateViewSet(ConditionalRequestMixin, DynamicQuerysetMixin, viewsets.ModelViewSet):
+    """
+    API endpoint for workflow templates
+    """
+    queryset = WorkflowTemplate.objects.all()
+    serializer_class = WorkflowTemplateSerializer
+    permission_classes = [IsTeacherOrAdmin, IsOwnerOrTeacherOrAdmin]
+    etag_fields = ['steps']
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['name', 'description']
+    
+    def get_queryset(self):
+        """Admins see every template, teachers the ones they created"""
+        return WorkflowTemplate.get_available_templates(self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def apply(self, request, pk=None):
+        """
+        Start this workflow on many courses at once, given a ``courses`` list of
+        ids or a ``department`` whose teachers' courses all get it. Teachers can
+        only apply it to their own courses. ``start_date`` defaults to today and
+        courses already running the template are skipped unless
+        ``skip_existing`` is false.
+        """
+        template = self.get_object()
+        user = request.user
+        courses = Course.objects.all() if user.is_admin else Course.objects.filter(teacher=user)
+        
+        course_ids = request.data.get('courses')
+        department = str(request.data.get('department') or '').strip()
+        if isinstance(course_ids, list) and course_ids:
+            try:
+                course_ids = [int(course_id) for course_id in course_ids]
+            except (TypeError, ValueError):
+                return Response({"detail": "'courses' must be a list of course ids"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        elif department:
+            course_ids = list(courses.filter(teacher__department__iexact=department).values_list('pk', flat=True))
+        else:
+            return Response({"detail": "Provide a 'courses' list or a 'department'"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        start_date = timezone.localdate()
+        if request.data.get('start_date'):
+            try:
+                start_date = parse_date(str(request.data['start_date']))
+            except ValueError:
+                start_date = None
+            if start_date is None:
+                return Response({"detail": "'start_date' must be a YYYY-MM-DD date"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = apply_template(template.pk, course_ids, start_date, courses=courses,
+                                    skip_existing=_flag(request.data, 'skip_existing', True))
+        except InvalidWorkflowStateException as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+# Term and archive views
+class TermViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for academic terms; terms are created in the admin
+    """
+    queryset = Term.objects.all()
+    serializer_class = TermSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class ArchivedRecordViewSet(ValuesListMixin, ConditionalRequestMixin, DynamicQuerysetMixin,
+                            viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only API endpoint for submissions, events, announcements and Kanban
+    cards of archived terms (see workflow/archive.py)
+    """
+    queryset = ArchivedRecord.objects.all()
+    serializer_class = ArchivedRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # ConditionalRequestMixin defines the write handlers, so they are switched off here
+    http_method_names = ['get', 'head', 'options']
+    # Archived rows never change; new ones carry the time they were archived
+    validator_field = 'archived_at'
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['title']
+    
+    def get_queryset(self):
+        """
+        Filter archived rows based on user role:
+        - Admin: All rows
+        - Teacher: Rows of courses they teach and rows they own
+        - Student: Their own rows, and everything but other students'
+          submissions in courses they were enrolled in
+        and by the optional ``term``, ``course`` and ``kind`` parameters
+        """
+        user = self.request.user
+        queryset = ArchivedRecord.objects.all()
+        
+        if user.is_teacher and not user.is_admin:
+            queryset = queryset.filter(Q(course__teacher=user) | Q(owner=user))
+        elif not user.is_admin:
+            # The term is over, so dropped and completed enrollments count as well
+            courses = Enrollment.objects.filter(user=user).values('course_id')
+            queryset = queryset.filter(
+                Q(owner=user) | (Q(course__in=courses) & ~Q(kind=ArchivedRecord.Kind.SUBMISSION))
+            )
+        
+        params = self.request.query_params
+        for name in ('term', 'course'):
+            value = params.get(name)
+            if value:
+                queryset = queryset.filter(**{f'{name}_id': value}) if value.isdigit() else queryset.none()
+        kind = params.get('kind', '').upper()
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        
+        return queryset.order_by('-created_at')
+
 # Frontend views
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
@@ -564,6 +1030,10 @@ def admin_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def _fragment_ids(user, courses):
+    """Ids of the courses a cached fragment lists; admins' pages list every course"""
+    return fragments.ALL if user.is_admin else list(courses.values_list('pk', flat=True))
+
 # Frontend view functions
 @require_http_methods(["GET", "POST"])
 def login_view(request):
@@ -619,7 +1089,7 @@ def dashboard(request):
             Q(author=user) | Q(course__in=teacher_courses)
         ).order_by('-created_at')[:5]
     else:
-        student_courses = user.enrolled_courses.all()
+        student_courses = user.get_enrolled_courses()
         recent_announcements = Announcement.objects.select_related('course', 'author').filter(
             course__in=student_courses
         ).order_by('-created_at')[:5]
@@ -640,7 +1110,7 @@ def dashboard(request):
             start_date__lte=one_week_later
         ).order_by('start_date')[:5]
     else:
-        student_courses = user.enrolled_courses.all()
+        student_courses = user.get_enrolled_courses()
         upcoming_events = CalendarEvent.objects.select_related('course', 'created_by').filter(
             course__in=student_courses,
             start_date__gte=now,
@@ -660,7 +1130,7 @@ def dashboard(request):
             Q(author=user) | Q(course__in=teaching_courses)
         ).count()
     else:
-        enrolled_courses = user.enrolled_courses.all()
+        enrolled_courses = user.get_enrolled_courses()
         context['enrolled_course_count'] = enrolled_courses.count()
         context['announcement_count'] = Announcement.objects.filter(
             course__in=enrolled_courses
@@ -678,10 +1148,11 @@ def courses(request):
     elif user.is_teacher:
         courses = Course.objects.select_related('teacher').filter(teacher=user)
     else:
-        courses = user.enrolled_courses.select_related('teacher').all()
+        courses = user.get_enrolled_courses().select_related('teacher')
     
     context = {
-        'courses': courses
+        'courses': courses,
+        'fragment_version': fragments.version(user, courses=_fragment_ids(user, courses)),
     }
     
     return render(request, 'workflow/courses.html', context)
@@ -694,9 +1165,14 @@ def manage_courses(request):
         courses = Course.objects.select_related('teacher').all()
     else:
         courses = Course.objects.select_related('teacher').filter(teacher=request.user)
+    fragment_version = fragments.version(request.user, courses=_fragment_ids(request.user, courses))
+    courses = courses.annotate(
+        student_count=Count('enrollments', filter=Q(enrollments__status=Enrollment.Status.ACTIVE))
+    )
     
     context = {
-        'courses': courses
+        'courses': courses,
+        'fragment_version': fragment_version,
     }
     
     return render(request, 'workflow/manage_courses.html', context)
@@ -757,7 +1233,7 @@ def announcements(request):
             Q(author=user) | Q(course__in=teacher_courses)
         )
     else:
-        student_courses = user.enrolled_courses.all()
+        student_courses = user.get_enrolled_courses()
         announcements = Announcement.objects.select_related('course', 'author').filter(
             course__in=student_courses
         )
@@ -789,14 +1265,19 @@ def announcements(request):
     elif user.is_teacher:
         available_courses = Course.objects.filter(teacher=user)
     else:
-        available_courses = user.enrolled_courses.all()
+        available_courses = user.get_enrolled_courses()
     
     # Store course info in session for reference in create_announcement
     session_courses = []
     
+    # The list depends on the filters (and on the day for date filters) besides the courses' announcements
+    filters = (course_filter, importance_filter, date_filter, timezone.localdate() if date_filter else None)
+    announcements = announcements.order_by('-created_at')
     context = {
         'announcements': announcements,
+        'recent_announcements': announcements,
         'available_courses': available_courses,
+        'fragment_version': fragments.version(user, *filters, courses=_fragment_ids(user, available_courses)),
     }
     
     return render(request, 'workflow/announcements.html', context)
@@ -815,13 +1296,20 @@ def kanban(request):
             Q(owner=user) | Q(course__in=teacher_courses)
         )
     else:
-        student_courses = user.enrolled_courses.all()
+        student_courses = user.get_enrolled_courses()
         boards = KanbanBoard.objects.select_related('course', 'owner').filter(
             course__in=student_courses
         )
     
+    if user.is_admin:
+        board_ids = course_ids = fragments.ALL
+    else:
+        rows = list(boards.values_list('pk', 'course_id'))
+        board_ids = [board_id for board_id, _ in rows]
+        course_ids = [course_id for _, course_id in rows if course_id is not None]
     context = {
-        'boards': boards
+        'boards': boards,
+        'fragment_version': fragments.version(user, courses=course_ids, boards=board_ids),
     }
     
     return render(request, 'workflow/kanban.html', context)
@@ -850,18 +1338,23 @@ def course_detail(request, pk):
     
     # Check if user has access to this course
     user = request.user
-    if not user.is_admin and not (user.is_teacher and course.teacher == user) and course not in user.enrolled_courses.all():
+    if not user.is_admin and not (user.is_teacher and course.teacher == user) and not user.is_enrolled_in(course):
         messages.error(request, "You don't have access to this course.")
         return redirect('courses')
     
-    # Get course-related data
-    announcements = Announcement.objects.filter(course=course).order_by('-created_at')[:5]
+    # Get course-related data; the querysets are only evaluated when the fragment is not cached
+    announcements = Announcement.objects.filter(course=course).select_related('author').order_by('-created_at')[:5]
     events = CalendarEvent.objects.filter(course=course).order_by('start_date')[:5]
     
     context = {
         'course': course,
         'announcements': announcements,
         'events': events,
+        'upcoming_events': events,
+        'is_teacher': user.is_teacher and course.teacher_id == user.pk,
+        'is_admin': user.is_admin,
+        'enrolled_students_count': course.get_students().count,
+        'fragment_version': fragments.version(user, courses=[course.pk]),
     }
     
     return render(request, 'workflow/course_detail.html', context)
@@ -931,37 +1424,32 @@ def course_students(request, pk):
         messages.error(request, "You don't have permission to manage students for this course.")
         return redirect('courses')
     
-    # Get all students and those enrolled in this course
-    enrolled_students = course.students.all()
-    all_students = User.objects.filter(is_student=True)
-    available_students = all_students.exclude(pk__in=enrolled_students.values_list('pk', flat=True))
+    # Students to enroll are picked through the user autocomplete API rather than
+    # rendering every student in the university
+    enrolled_students = course.get_students().order_by('last_name', 'first_name', 'username')
     
     if request.method == 'POST':
         action = request.POST.get('action')
-        student_id = request.POST.get('student_id')
+        student_ids = [sid for sid in request.POST.getlist('student_id') if sid.isdigit()]
         
-        if not student_id:
+        if not student_ids:
             messages.error(request, "No student selected.")
-        else:
-            try:
-                student = User.objects.get(pk=student_id)
-                
-                if action == 'enroll':
-                    course.add_student(student)
-                    messages.success(request, f"{student.get_full_name() or student.username} enrolled successfully.")
-                elif action == 'unenroll':
-                    course.remove_student(student)
-                    messages.success(request, f"{student.get_full_name() or student.username} unenrolled successfully.")
-                
-            except User.DoesNotExist:
-                messages.error(request, "Student not found.")
-            except Exception as e:
-                messages.error(request, f"Error: {str(e)}")
+        elif action == 'enroll':
+            result = enroll_students(course, student_ids)
+            if result.enrolled or result.already_enrolled:
+                messages.success(request, f"{result.enrolled} student(s) enrolled successfully.")
+            for error in result.errors:
+                messages.error(request, f"Error: {error['value']}: {error['error']}")
+        elif action == 'unenroll':
+            removed = course.drop_students(student_ids)
+            messages.success(request, f"{removed} student(s) unenrolled successfully.")
     
     context = {
         'course': course,
         'enrolled_students': enrolled_students,
-        'available_students': available_students,
+        'student_search_url': (
+            f"{reverse('user-autocomplete')}?role={User.Role.STUDENT}&exclude_course={course.pk}"
+        ),
     }
     
     return render(request, 'workflow/course_students.html', context)
@@ -994,7 +1482,7 @@ def announcement_detail(request, pk):
     # Check if user has access to this announcement's course
     user = request.user
     if not user.is_admin and not (user.is_teacher and announcement.course.teacher == user) \
-            and announcement.course not in user.enrolled_courses.all():
+            and not user.is_enrolled_in(announcement.course):
         messages.error(request, "You don't have access to this announcement.")
         return redirect('announcements')
     
@@ -1150,6 +1638,82 @@ def register_api(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdmin])
+def query_profiles_api(request):
+    """
+    Admin-only view of the SQL profiles collected by QueryProfilingMiddleware.
+    GET returns per-view aggregates (``?recent=N`` adds the latest raw profiles),
+    DELETE clears the buffer.
+    """
+    if request.method == 'DELETE':
+        profile_buffer.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    data = {
+        'enabled': get_profiling_setting('ENABLED'),
+        'sample_rate': get_profiling_setting('SAMPLE_RATE'),
+        'views': profile_buffer.summary(),
+    }
+    
+    try:
+        recent = int(request.query_params.get('recent', 0))
+    except ValueError:
+        recent = 0
+    if recent > 0:
+        data['recent'] = profile_buffer.snapshot()[-recent:][::-1]
+    
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_api(request):
+    """
+    Full-text search across announcements, courses and Kanban cards visible to the user.
+    Query parameters: ``q``, ``type`` (comma separated announcement/course/card),
+    ``limit`` (max 100) and ``offset``.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"detail": "Query parameter 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    kinds = []
+    for name in filter(None, request.query_params.get('type', '').split(',')):
+        if name.strip() not in search.KIND_ALIASES:
+            return Response({"detail": f"Unknown type '{name}'"}, status=status.HTTP_400_BAD_REQUEST)
+        kinds.append(search.KIND_ALIASES[name.strip()])
+    
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response({"detail": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = search.search(request.user, query, kinds=kinds, limit=limit, offset=offset)
+    return Response({'query': query, 'limit': limit, 'offset': offset, 'results': results})
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the workflow metrics, for admins and for
+    scrapers that send the configured bearer token from an allowed IP. The IP
+    check alone is not enough: behind a local reverse proxy every client
+    appears as 127.0.0.1.
+    """
+    is_admin = request.user.is_authenticated and request.user.is_admin
+    token = metrics.get_setting('AUTH_TOKEN')
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    is_scraper = (
+        bool(token) and scheme.lower() == 'bearer'
+        and hmac.compare_digest(credentials.strip().encode(), token.encode())
+        and request.META.get('REMOTE_ADDR') in metrics.get_setting('ALLOWED_IPS')
+    )
+    if not (is_admin or is_scraper):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        metrics.REGISTRY.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 @require_http_methods(["GET", "POST"])
 def register_view(request):
     """View for user registration"""